@@ -0,0 +1,10 @@
+import logging
+
+from classes.GameAdapters import AudioTripAdapter
+from classes.LyricsOverlayApp import main
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    main([AudioTripAdapter], "Shows the lyrics of the song playing in AudioTrip, read from a websocket of your own (--url) that sends Synth Riders mod events.")
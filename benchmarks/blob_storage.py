@@ -0,0 +1,66 @@
+"""Benchmark comparing lyrics_lines rows with packed lyrics_blobs.
+
+Fills a database through LyricsManager in row mode, measures its size and the time
+to load songs, converts it with convert_lines_to_blobs and measures again. Run from
+the repository root:
+
+    python -m benchmarks.blob_storage --songs 5000 --lines-per-song 60
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from classes.LyricsLine import LyricsLine
+from classes.LyricsManager import LyricsManager
+from classes.Song import Song
+
+def synthetic_song(i: int, lines_per_song: int) -> Song:
+    lines = []
+    for j in range(lines_per_song):
+        start = 5000 + j * 3170
+        lines.append(LyricsLine(text=f"line {j} of song {i}, la la la", startMs=start, endMs=start + 3170, durationMs=3170))
+    return Song(lines=lines, title=f"Title {i}", artist=f"Artist {i}")
+
+def database_size(manager: LyricsManager) -> float:
+    conn = manager._connection()
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(manager.db_path) / 1e6
+
+def time_loads(manager: LyricsManager, queries: list) -> float:
+    samples = []
+    for i in queries:
+        start = time.perf_counter()
+        manager.search_in_database(f"title {i}", f"artist {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument("--lines-per-song", type=int, default=60)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--no-compress", action="store_true", help="store the blobs without zlib")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark-lyrics.db")
+    manager = LyricsManager("", "", "", db_path=path, compress_blobs=not args.no_compress)
+    for i in range(args.songs):
+        manager.save_song_to_database(synthetic_song(i, args.lines_per_song), f"title {i}", f"artist {i}")
+    queries = [random.randrange(args.songs) for _ in range(args.lookups)]
+
+    print(f"{args.songs} songs with {args.lines_per_song} lines each")
+    print(f"rows   {database_size(manager):8.2f} MB   median load {time_loads(manager, queries):8.3f} ms")
+    start = time.perf_counter()
+    manager.convert_lines_to_blobs()
+    converted_in = time.perf_counter() - start
+    print(f"blobs  {database_size(manager):8.2f} MB   median load {time_loads(manager, queries):8.3f} ms   (converted in {converted_in:.1f} s)")
+    manager.close()
+
+if __name__ == "__main__":
+    main()
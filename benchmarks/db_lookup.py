@@ -0,0 +1,92 @@
+"""Benchmark for song lookups in lyrics.db before and after the indexed schema.
+
+Builds an unversioned (version 1) database with synthetic songs, times lookups with
+the queries the old code used, migrates it by opening it with LyricsManager and times
+LyricsManager.search_in_database. Run from the repository root:
+
+    python -m benchmarks.db_lookup --songs 100000 --lines-per-song 100
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from classes.DatabaseMigrations import _initial_schema
+from classes.LyricsManager import LyricsManager
+
+def build_database(path: str, songs: int, lines_per_song: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    _initial_schema(conn.cursor())
+    for first in range(1, songs + 1, 1000):
+        ids = range(first, min(first + 1000, songs + 1))
+        conn.executemany("INSERT INTO songs (id, title, artist, cover_link) VALUES (?, ?, ?, ?)",
+                         ((i, f"Title {i}", f"Artist {i}", None) for i in ids))
+        conn.executemany("INSERT INTO querys (query_title, query_main_artist, song_id) VALUES (?, ?, ?)",
+                         ((f"title {i}", f"artist {i}", i) for i in ids))
+        conn.executemany("INSERT INTO lyrics_lines (song_id, text, startMs, endMs, durationMs) VALUES (?, ?, ?, ?, ?)",
+                         ((i, f"line {j}", j * 2000, j * 2000 + 2000, 2000) for i in ids for j in range(lines_per_song)))
+        conn.commit()
+    conn.close()
+
+def old_lookup(cursor: sqlite3.Cursor, title: str, artist: str) -> None:
+    cursor.execute("SELECT * FROM querys WHERE query_title = ? AND query_main_artist = ?", (title, artist))
+    song_id = cursor.fetchone()[3]
+    cursor.execute("SELECT * FROM songs WHERE id = ?", (song_id,))
+    cursor.fetchone()
+    cursor.execute("SELECT * FROM lyrics_lines WHERE song_id = ? ORDER BY startMs ASC", (song_id,))
+    cursor.fetchall()
+
+def report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:<28} median {statistics.median(samples):10.3f} ms   p95 {p95:10.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=100000)
+    parser.add_argument("--lines-per-song", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=20, help="lookups per schema, the unindexed ones scan every table")
+    parser.add_argument("--dir", default=None, help="directory for the benchmark database (default: a temporary directory)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = args.dir or tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark-lyrics.db")
+    if os.path.exists(path):
+        os.remove(path)
+
+    start = time.perf_counter()
+    build_database(path, args.songs, args.lines_per_song)
+    print(f"built {args.songs} songs / {args.songs * args.lines_per_song} lines in {time.perf_counter() - start:.1f} s, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
+    queries = [random.randint(1, args.songs) for _ in range(args.lookups)]
+
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    samples = []
+    for i in queries:
+        start = time.perf_counter()
+        old_lookup(cursor, f"title {i}", f"artist {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    report("version 1 (no indexes)", samples)
+
+    start = time.perf_counter()
+    manager = LyricsManager("", "", "", db_path=path)
+    print(f"migration took {time.perf_counter() - start:.1f} s")
+    samples = []
+    for i in queries:
+        start = time.perf_counter()
+        manager.search_in_database(f"Title {i}", f"Artist {i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    manager.close()
+    report("latest (search_in_database)", samples)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Headless replay benchmark for the lyrics display.
+
+Plays a synthetic song through LyricsPlayer on a RecordingBackend driven by a VirtualClock,
+so no display, Tk main loop or game is needed and a song replays as fast as the CPU allows.
+For every speed it reports the latency of each line change against its ideal startMs,
+the CPU time per scheduler tick and the allocations per tick. Run from the repository root:
+
+    python -m benchmarks.display_replay --speeds 1 10 100 --words --jitter-ms 4
+"""
+import argparse
+import logging
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from classes.DisplayBackend import RecordingBackend
+from classes.LyricsPlayer import LyricsPlayer
+from classes.Song import Song
+from classes.VirtualClock import VirtualClock
+
+def build_song(rng: random.Random, line_count: int, words: bool) -> Song:
+    starts, ends, texts = [], [], []
+    word_offsets, word_starts, word_texts = [0], [], []
+    t = rng.randint(0, 15000)
+    for i in range(line_count):
+        duration = rng.randint(800, 6000)
+        starts.append(t)
+        ends.append(t + duration)
+        line_words = [f"word{i}_{j}" for j in range(rng.randint(3, 8))]
+        texts.append(" ".join(line_words))
+        for j, word in enumerate(line_words):
+            word_starts.append(t + duration * j // len(line_words))
+            word_texts.append(word)
+        word_offsets.append(len(word_starts))
+        t += duration
+    if not words:
+        return Song.from_arrays(starts, ends, texts, title="benchmark", artist="benchmark")
+    return Song.from_arrays(starts, ends, texts, title="benchmark", artist="benchmark", word_offsets=word_offsets, word_starts=word_starts, word_texts=word_texts)
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+def replay(song: Song, speed: float, jitter_ms: float, trace_memory: bool) -> dict:
+    clock = VirtualClock(start=1000.0)
+    backend = RecordingBackend(clock, jitter_ms=jitter_ms)
+    player = LyricsPlayer(song, backend, speed=speed, clock=clock)
+    started_at = clock()
+    player.start_lyrics(started_at)
+
+    tick_ns, blocks, peaks = [], [], []
+    if trace_memory:
+        tracemalloc.start()
+    while True:
+        blocks_before = sys.getallocatedblocks()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter_ns()
+        if not backend.run_next():
+            break
+        tick_ns.append(time.perf_counter_ns() - t0)
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+        if trace_memory:
+            peaks.append(tracemalloc.get_traced_memory()[1] - traced_before)
+    if trace_memory:
+        tracemalloc.stop()
+
+    # Latency in wall-clock ms between the ideal start of each line and the moment it was shown
+    latencies = [(shown_at - (started_at + song.start_times[i] / speed / 1000)) * 1000 for shown_at, i in backend.line_changes]
+    return {
+        "ticks": len(tick_ns),
+        "lines": len({i for _, i in backend.line_changes}),
+        "latencies": latencies,
+        "tick_us": [ns / 1000 for ns in tick_ns],
+        "blocks": blocks,
+        "peaks": peaks,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200, help="number of lines in the synthetic song")
+    parser.add_argument("--speeds", type=float, nargs="+", default=[1, 2, 5, 10, 25, 50, 100])
+    parser.add_argument("--words", action="store_true", help="give the song word-level timings (karaoke highlighting instead of the progress bar)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="delay every scheduled callback by a random 0..N ms, like a busy Tk main loop")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the peak traced memory per tick (slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    # The player logs every start and stop
+    logging.disable(logging.INFO)
+
+    song = build_song(random.Random(args.seed), args.lines, args.words)
+    print(f"{len(song.start_times)} lines, {song.end_times[-1] / 1000:.0f} s, {'word' if args.words else 'line'} timings")
+    print(f"{'speed':>6} {'ticks':>7} {'shown':>6} {'lat mean':>9} {'lat p99':>8} {'lat max':>8} {'tick us':>8} {'p99 us':>8} {'blocks':>7}" + (f" {'peak B':>7}" if args.tracemalloc else ""))
+    for speed in args.speeds:
+        result = replay(song, speed, args.jitter_ms, args.tracemalloc)
+        latencies, tick_us = result["latencies"], result["tick_us"]
+        line = (f"{speed:>5g}x {result['ticks']:>7} {result['lines']:>6} {statistics.fmean(latencies):>7.2f}ms {percentile(latencies, 0.99):>6.2f}ms {max(latencies):>6.2f}ms "
+                f"{statistics.fmean(tick_us):>8.1f} {percentile(tick_us, 0.99):>8.1f} {statistics.fmean(result['blocks']):>7.2f}")
+        if args.tracemalloc:
+            line += f" {statistics.fmean(result['peaks']):>7.0f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
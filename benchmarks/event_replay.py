@@ -0,0 +1,148 @@
+"""End-to-end replay benchmark: game event stream -> lyrics resolved -> first line shown.
+
+Writes a synthetic Synth Riders event log (or uses --log), serves it with ReplayServer
+on a free port and consumes it with the GameRuntime and SynthRidersAdapter of the app.
+Every SongStart is resolved with LyricsResolver against a temporary database that holds
+the songs of the synthetic log, and played with LyricsPlayer on a headless backend.
+Reports the frame delivery lag of the replay, the throughput, and the latency report
+(SongStart -> resolved -> first line shown). Run from the repository root:
+
+    python -m benchmarks.event_replay --songs 20 --speed 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from classes.DisplayBackend import RecordingBackend
+from classes.EventLog import EventLog, EventLogWriter
+from classes.GameAdapters import SynthRidersAdapter
+from classes.GameEvent import GameEvent
+from classes.GameRuntime import GameRuntime
+from classes.LatencyReport import LatencyReport
+from classes.LyricsManager import LyricsManager
+from classes.LyricsPlayer import LyricsPlayer
+from classes.LyricsResolver import LyricsResolver
+from classes.ReplayServer import ReplayServer
+from classes.Song import Song
+from classes.VirtualClock import VirtualClock
+
+def synthetic_song(rng: random.Random, i: int) -> Song:
+    t = rng.randint(3000, 15000)
+    starts, ends, texts = [], [], []
+    for j in range(40):
+        duration = rng.randint(1500, 5000)
+        starts.append(t)
+        ends.append(t + duration)
+        texts.append(f"line {j} of song {i}")
+        t += duration
+    return Song.from_arrays(starts, ends, texts, title=f"Song {i}", artist=f"Artist {i}")
+
+def write_synthetic_log(path: str, songs: list, song_seconds: float, play_time_hz: float) -> None:
+    """Writes the log with fake timestamps, as if it had been recorded from the game in real time."""
+    writer = EventLogWriter(path, "ws://localhost:9000/")
+    t = writer.last_frame_at
+    for song in songs:
+        writer.write(json.dumps({"eventType": "SongStart", "data": {"song": song.title, "author": song.artist}}), t)
+        for k in range(int(song_seconds * play_time_hz)):
+            t += 1 / play_time_hz
+            writer.write(json.dumps({"eventType": "PlayTime", "data": {"playTimeMS": int(k * 1000 / play_time_hz)}}), t)
+        t += 0.5
+        writer.write(json.dumps({"eventType": "SongEnd", "data": {}}), t)
+        t += 2
+    writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="replay this event log instead of a synthetic one (its songs are resolved against --db)")
+    parser.add_argument("--db", help="lyrics database to resolve against (default: a temporary one with the synthetic songs)")
+    parser.add_argument("--songs", type=int, default=20, help="songs in the synthetic log")
+    parser.add_argument("--song-seconds", type=float, default=30, help="length of every synthetic song")
+    parser.add_argument("--play-time-hz", type=float, default=10, help="PlayTime events per second in the synthetic log")
+    parser.add_argument("--speed", type=float, default=20, help="replay speed")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = args.log
+        lyrics_manager = LyricsManager("", "", "", db_path=args.db or os.path.join(tmp, "lyrics.db"))
+        if not log_path:
+            rng = random.Random(args.seed)
+            songs = [synthetic_song(rng, i) for i in range(args.songs)]
+            for song in songs:
+                lyrics_manager.save_song_to_database(song, song.title, song.artist)
+            log_path = os.path.join(tmp, "events.wslog.gz")
+            write_synthetic_log(log_path, songs, args.song_seconds, args.play_time_hz)
+        resolver = LyricsResolver(lyrics_manager)
+        report = LatencyReport()
+
+        log = EventLog(log_path)
+        schedule = [offset / args.speed for offset, _ in log]
+        server = ReplayServer(log, port=0, speed=args.speed).start()
+
+        lags = []
+        song_threads = []
+
+        def play(future, started_at: float) -> None:
+            """Plays the resolved song headless until its first line was shown."""
+            result = future.result()
+            report.lyrics_resolved(result.tier)
+            if result.song is None:
+                return
+            # The player starts backdated to the song start and runs on a virtual clock from now on
+            clock = VirtualClock(time.perf_counter())
+            backend = RecordingBackend(clock)
+            player = LyricsPlayer(result.song, backend, clock=clock, speed=args.speed, on_line_shown=report.line_shown)
+            player.start_lyrics(started_at)
+            while not backend.line_changes and backend.run_next():
+                pass
+            player.stop_lyrics()
+
+        frames = 0
+        done = threading.Event()
+        connected_at = None
+
+        class TimedAdapter(SynthRidersAdapter):
+            """Measures when every frame arrives against the schedule of the log."""
+            def parse(self, message, received_at):
+                nonlocal frames, connected_at
+                if connected_at is None:
+                    connected_at = received_at - schedule[0]
+                lags.append((received_at - connected_at - schedule[frames]) * 1000)
+                frames += 1
+                if frames == len(schedule):
+                    done.set()
+                return super().parse(message, received_at)
+
+        def dispatch(event: GameEvent) -> None:
+            if event.kind == GameEvent.START:
+                report.song_started(event.title, event.received_at)
+                future = resolver.resolve_async(event.title, event.artist)
+                thread = threading.Thread(target=play, args=(future, event.started_at))
+                thread.start()
+                song_threads.append(thread)
+
+        runtime = GameRuntime([TimedAdapter(f"ws://localhost:{server.port}/")], dispatch)
+        runtime.start()
+        done.wait()
+        elapsed = time.perf_counter() - connected_at
+        for thread in song_threads:
+            thread.join()
+        runtime.stop()
+        server.stop()
+        resolver.shutdown()
+        lyrics_manager.close()
+
+    lags.sort()
+    print(f"replayed {frames} frames in {elapsed:.2f} s at {args.speed:g}x: {frames / elapsed:.0f} frames/s")
+    print(f"frame lag ms: p50 {statistics.median(lags):.2f}, p99 {lags[int(len(lags) * 0.99)]:.2f}, max {lags[-1]:.2f}")
+    print(report.summary())
+
+if __name__ == "__main__":
+    main()
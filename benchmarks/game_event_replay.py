@@ -0,0 +1,287 @@
+"""Replays game event streams with pauses, resumes and seeks through the adapters into a headless player.
+
+Builds synthetic Beat Saber (BSDataPuller MapData) and Synth Riders (websocket mod) streams
+in which the game pauses, resumes, jumps and changes its speed, feeds them to the adapters on a VirtualClock
+(with the idle() calls the GameRuntime would make during silence) and plays the resulting
+GameEvents with LyricsPlayer on a RecordingBackend, the way the overlay app does.
+The position of the lyrics is probed every few milliseconds against the position of the game.
+Reports the error right after every transition, while paused and once settled, and exits with 1
+if a settled error exceeds --tolerance-ms or the lyrics move while the game is paused. Run from the repository root:
+
+    python -m benchmarks.game_event_replay
+    python -m benchmarks.game_event_replay --log session.wslog.gz --game synthriders
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+
+from classes.DisplayBackend import RecordingBackend
+from classes.EventLog import EventLog
+from classes.GameAdapters import ADAPTERS, BeatSaberAdapter, GameAdapter, SynthRidersAdapter
+from classes.GameEvent import GameEvent
+from classes.LyricsPlayer import LyricsPlayer
+from classes.Song import Song
+from classes.VirtualClock import VirtualClock
+
+START_AT = 1000.0
+
+class GameTimeline:
+    """Where the game is in the song at every moment: a list of (clock time, position ms, speed) segments, speed 0 while paused."""
+    def __init__(self):
+        self.segments = []
+
+    def add(self, at: float, position_ms: int, speed: float) -> None:
+        self.segments.append((at, position_ms, speed))
+
+    def _segment(self, at: float):
+        current = None
+        for segment in self.segments:
+            if segment[0] > at:
+                break
+            current = segment
+        return current
+
+    def position(self, at: float):
+        """Position of the game in ms at clock time 'at', None before the song or after it ended."""
+        current = self._segment(at)
+        if current is None or current[1] is None:
+            return None
+        start, position_ms, speed = current
+        return position_ms + (at - start) * 1000 * speed
+
+    def is_paused(self, at: float) -> bool:
+        current = self._segment(at)
+        return current is not None and current[1] is not None and current[2] == 0
+
+    def transitions(self) -> list:
+        return [at for at, _, _ in self.segments]
+
+class Overlay:
+    """What LyricsOverlayApp.handle_event does with the events, on a headless player."""
+    def __init__(self, song: Song, clock: VirtualClock, backend: RecordingBackend):
+        self.song = song
+        self.clock = clock
+        self.backend = backend
+        self.player = None
+        self.events = []
+
+    def handle_event(self, event: GameEvent) -> None:
+        self.events.append(event)
+        if event.kind == GameEvent.START:
+            self.player = LyricsPlayer(self.song, self.backend, speed=event.speed or 1, clock=self.clock)
+            self.player.start_lyrics(event.started_at, event.time_ms or 0)
+        elif self.player is None:
+            return
+        elif event.kind == GameEvent.PLAYTIME:
+            self.player.sync_to_game_time(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.PAUSE:
+            self.player.pause(event.started_at if event.started_at is not None else event.received_at, event.time_ms)
+        elif event.kind == GameEvent.RESUME:
+            self.player.resume(event.started_at if event.started_at is not None else event.received_at)
+            if event.time_ms is not None:
+                self.player.seek(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.SEEK:
+            self.player.seek(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.SPEED:
+            self.player.set_speed(event.speed, event.started_at if event.started_at is not None else event.received_at)
+        elif event.kind == GameEvent.END:
+            self.player.stop_lyrics()
+            self.player = None
+
+    def position(self):
+        return self.player.timer.get_time() if self.player is not None else None
+
+def build_song(line_count: int = 120) -> Song:
+    starts = [2000 + 1500 * i for i in range(line_count)]
+    return Song.from_arrays(starts, [start + 1400 for start in starts], [f"line {i}" for i in range(line_count)], title="Replay", artist="Benchmark")
+
+def beat_saber_stream(rng: random.Random, delay_ms: float, practice_start_ms: int = 0, practice_speed: float = 1.0, speed_changes: bool = False):
+    """
+    MapData frames of one song: play, pause for 5 s, play, pause twice in a row, play, finish.
+    With 'speed_changes' the song runs faster and then slower after the pauses, as if the modifiers changed.
+    """
+    timeline = GameTimeline()
+    frames = []
+    state = {"Hash": "A1B2", "SongName": "Replay", "SongAuthor": "Benchmark", "InLevel": True, "LevelPaused": False, "Modifiers": {},
+             "PracticeMode": practice_start_ms > 0 or practice_speed != 1.0, "PracticeModeModifiers": {"SongSpeedMul": practice_speed, "SongStartTime": practice_start_ms / 1000}}
+    modifiers = [{}, {"FasterSong": True}, {"FasterSong": True}, {"SlowerSong": True}] if speed_changes else [{}] * 4
+
+    def frame(at: float, **changes) -> None:
+        state.update(changes)
+        # Frames arrive in the order they were sent, every one carries the whole state
+        received_at = max(at + rng.uniform(0, delay_ms) / 1000, frames[-1][0] + 1e-6 if frames else at)
+        frames.append((received_at, json.dumps(state)))
+
+    t = START_AT
+    position = practice_start_ms
+    frame(t)
+    for (play_s, pause_s), segment_modifiers in zip(((20, 5), (8, 0.4), (0.6, 2), (25, 0)), modifiers):
+        if segment_modifiers != state["Modifiers"]:
+            frame(t, Modifiers=segment_modifiers)
+        speed = BeatSaberAdapter._speed(state)
+        timeline.add(t, position, speed)
+        # BSDataPuller also sends a frame on every change of the map state, e.g. the score
+        for k in range(1, int(play_s)):
+            frame(t + k)
+        t += play_s
+        position += int(play_s * 1000 * speed)
+        if pause_s:
+            timeline.add(t, position, 0)
+            frame(t, LevelPaused=True)
+            t += pause_s
+            frame(t, LevelPaused=False)
+    timeline.add(t, None, 0)
+    frame(t, InLevel=False, LevelPaused=False, LevelFinished=True)
+    return frames, timeline
+
+def synth_riders_stream(rng: random.Random, delay_ms: float, play_time_hz: float, silent_pause: bool, speed: float = 1.0):
+    """
+    Mod events of one song: play, pause for 5 s, play, jump 30 s ahead, play, pause for 3 s, play, end.
+    'speed' is that of a speed modifier, which the mod does not report.
+    """
+    timeline = GameTimeline()
+    frames = [(START_AT, json.dumps({"eventType": "SongStart", "data": {"song": "Replay", "author": "Benchmark"}}))]
+    t = START_AT
+    position = 0
+    for play_s, pause_s, jump_ms in ((20, 5, 0), (10, 0, 30000), (15, 3, 0), (20, 0, 0)):
+        timeline.add(t, position, speed)
+        for k in range(int(play_s * play_time_hz)):
+            at = t + k / play_time_hz
+            frames.append((at + rng.uniform(0, delay_ms) / 1000, json.dumps({"eventType": "PlayTime", "data": {"playTimeMS": position + int(k * 1000 * speed / play_time_hz)}})))
+        t += play_s
+        position += int(play_s * 1000 * speed)
+        if pause_s:
+            timeline.add(t, position, 0)
+            if not silent_pause:
+                # The game keeps reporting the same play time while paused
+                for k in range(int(pause_s * play_time_hz)):
+                    frames.append((t + k / play_time_hz + rng.uniform(0, delay_ms) / 1000, json.dumps({"eventType": "PlayTime", "data": {"playTimeMS": position}})))
+            t += pause_s
+        position += jump_ms
+    timeline.add(t, None, 0)
+    frames.append((t, json.dumps({"eventType": "SongEnd", "data": {}})))
+    return frames, timeline
+
+def replay(adapter: GameAdapter, frames: list, overlay: Overlay, clock: VirtualClock, backend: RecordingBackend, probe_ms: float, on_probe) -> None:
+    """Runs the frames, the idle() calls of the GameRuntime and the scheduled display updates in clock order, probing the lyrics position every probe_ms."""
+    frames = sorted(frames)
+    last_message_at = frames[0][0]
+    next_probe = frames[0][0]
+    i = 0
+    while i < len(frames):
+        next_idle = last_message_at + adapter.idle_check_interval if adapter.idle_check_interval else float("inf")
+        due = backend.next_due()
+        candidates = [(frames[i][0], 0), (next_probe, 1), (next_idle, 2)]
+        if due is not None:
+            candidates.append((due, 3))
+        at, kind = min(candidates)
+        if kind == 3:
+            backend.run_next()
+            continue
+        clock.set(at)
+        if kind == 0:
+            for event in adapter.parse(frames[i][1], clock()):
+                overlay.handle_event(event)
+            last_message_at = clock()
+            i += 1
+        elif kind == 1:
+            on_probe(clock(), overlay.position())
+            next_probe += probe_ms / 1000
+        else:
+            for event in adapter.idle(clock()):
+                overlay.handle_event(event)
+            # The runtime waits idle_check_interval again after every idle() call
+            last_message_at = clock()
+
+def check(name: str, adapter: GameAdapter, frames: list, timeline: GameTimeline, args, paused_tolerance_ms: float) -> bool:
+    """'paused_tolerance_ms' is the largest error while paused that passes, if the game reports the paused position less precisely than the running one."""
+    clock = VirtualClock(START_AT)
+    backend = RecordingBackend(clock, jitter_ms=args.jitter_ms, seed=args.seed)
+    overlay = Overlay(build_song(), clock, backend)
+    transitions = timeline.transitions()
+    settle_s = args.settle_ms / 1000
+    early, settled, paused, moved_while_paused = [], [], [], []
+    last_paused = None
+
+    def on_probe(at: float, lyrics_ms) -> None:
+        nonlocal last_paused
+        game_ms = timeline.position(at)
+        if game_ms is None or lyrics_ms is None:
+            return
+        error = abs(lyrics_ms - game_ms)
+        since_transition = min((at - t for t in transitions if t <= at), default=float("inf"))
+        is_paused = overlay.player is not None and overlay.player.timer.is_paused
+        if since_transition <= settle_s:
+            early.append(error)
+        else:
+            (paused if timeline.is_paused(at) else settled).append(error)
+        if is_paused and last_paused is not None and lyrics_ms != last_paused:
+            moved_while_paused.append(at)
+        last_paused = lyrics_ms if is_paused else None
+
+    replay(adapter, frames, overlay, clock, backend, args.probe_ms, on_probe)
+    kinds = [event.kind for event in overlay.events if event.kind != GameEvent.PLAYTIME]
+    print(f"{name}: {len(frames)} frames -> {', '.join(kinds)}")
+    for label, errors in (("within settle time", early), ("while paused", paused), ("settled", settled)):
+        errors.sort()
+        if errors:
+            print(f"  error {label} ms: p50 {errors[len(errors) // 2]:.1f}, p99 {errors[int(len(errors) * 0.99)]:.1f}, max {errors[-1]:.1f} ({len(errors)} probes)")
+    ok = bool(settled) and settled[-1] <= args.tolerance_ms and (not paused or paused[-1] <= paused_tolerance_ms) and not moved_while_paused
+    if moved_while_paused:
+        print(f"  lyrics moved while paused at {len(moved_while_paused)} probes")
+    print(f"  {'ok' if ok else 'FAILED'}")
+    return ok
+
+def show_log(path: str, adapter: GameAdapter) -> None:
+    """Prints the events an adapter makes of a recorded log, with the idle() calls in the silences."""
+    log = EventLog(path)
+    last_at = None
+    for offset, message in log:
+        at = START_AT + offset
+        if adapter.idle_check_interval and last_at is not None:
+            idle_at = last_at + adapter.idle_check_interval
+            while idle_at < at:
+                for event in adapter.idle(idle_at):
+                    print(f"{idle_at - START_AT:10.3f}  {event}")
+                idle_at += adapter.idle_check_interval
+        for event in adapter.parse(message, at):
+            if event.kind != GameEvent.PLAYTIME:
+                print(f"{at - START_AT:10.3f}  {event}")
+        last_at = at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="print the events the adapter of --game makes of this recorded event log instead")
+    parser.add_argument("--game", choices=sorted(ADAPTERS), default="synthriders", help="adapter for --log")
+    parser.add_argument("--delay-ms", type=float, default=5, help="random network delay of every frame")
+    parser.add_argument("--jitter-ms", type=float, default=2, help="random delay of every display update")
+    parser.add_argument("--play-time-hz", type=float, default=10, help="PlayTime events per second of Synth Riders")
+    parser.add_argument("--probe-ms", type=float, default=10, help="how often the lyrics position is compared to the game")
+    parser.add_argument("--settle-ms", type=float, default=1500, help="errors within this time after a pause, resume or jump are reported separately")
+    parser.add_argument("--tolerance-ms", type=float, default=25, help="largest settled error that passes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    if args.log:
+        show_log(args.log, ADAPTERS[args.game]())
+        return
+
+    rng = random.Random(args.seed)
+    # Without PlayTime during the pause, the last one before it is up to one interval early
+    silent_tolerance_ms = args.tolerance_ms + 1000 / args.play_time_hz
+    scenarios = [
+        ("Beat Saber", BeatSaberAdapter(), *beat_saber_stream(rng, args.delay_ms, 0), args.tolerance_ms),
+        ("Beat Saber practice mode", BeatSaberAdapter(), *beat_saber_stream(rng, args.delay_ms, 45000, practice_speed=0.75), args.tolerance_ms),
+        ("Beat Saber speed modifiers", BeatSaberAdapter(), *beat_saber_stream(rng, args.delay_ms, speed_changes=True), args.tolerance_ms),
+        ("Synth Riders, PlayTime stalls while paused", SynthRidersAdapter(), *synth_riders_stream(rng, args.delay_ms, args.play_time_hz, silent_pause=False), args.tolerance_ms),
+        ("Synth Riders, PlayTime stops while paused", SynthRidersAdapter(), *synth_riders_stream(rng, args.delay_ms, args.play_time_hz, silent_pause=True), silent_tolerance_ms),
+        ("Synth Riders, 1.2x speed modifier", SynthRidersAdapter(), *synth_riders_stream(rng, args.delay_ms, args.play_time_hz, silent_pause=False, speed=1.2), args.tolerance_ms),
+    ]
+    results = [check(name, adapter, frames, timeline, args, paused_tolerance_ms) for name, adapter, frames, timeline, paused_tolerance_ms in scenarios]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
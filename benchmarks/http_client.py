@@ -0,0 +1,359 @@
+"""Checks HttpClient against a local HTTP stand-in server: pooling, per-host limits, Retry-After, back-off and deadlines.
+
+The stand-in (http.server on 127.0.0.1) answers like the real endpoints can: slowly, with 503s, or with
+429 and a Retry-After header, as scripted per scenario, and records when every request arrived, how many
+ran at once and how many connections were opened. Each scenario uses a fresh HttpClient and checks
+what the server saw:
+
+  keep-alive        sequential requests reuse one connection (compared with a new connection per request)
+  concurrency       no more requests at once than max_per_host
+  rate limit        requests start no faster than the token bucket allows
+  Retry-After       after a 429 no request reaches the host before the time it asked for, from any thread
+  token refund      a request that gives up on a Retry-After that came in while it waited for a token hands the token back
+  back-off          503s are retried with jittered back-off until the request succeeds
+  deadlines         a slow host and a long Retry-After end in DeadlineExceeded / RateLimited within the deadline,
+                    429s until the attempts run out in a RateLimited that says so
+  LyricsManager     a full lookup (token, Spotify search, lyrics provider) through one client, with a 429 on
+                    the way, and the miss reasons when the host keeps refusing (needs spotipy)
+
+Exits with status 1 if a check fails. Run from the repository root:
+
+    python -m benchmarks.http_client
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from classes.HttpClient import DeadlineExceeded, HttpClient, RateLimited, TokenBucket
+
+LRC = "\n".join(f"[00:{second:02d}.00]line {second}" for second in range(0, 60, 5))
+
+class StandInServer(ThreadingHTTPServer):
+    """Answers every path with 200 unless a script for it says otherwise; records what arrived."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.connections = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            # (path, time.monotonic() of the arrival, status answered)
+            self.arrivals = []
+            # path -> list of (status, Retry-After or None), used up front to back; 200 once empty
+            self.scripts = {}
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up (the deadline checks) close their connection before the answer
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def script(self, path: str, answers: list) -> None:
+        with self.lock:
+            self.scripts[path] = list(answers)
+
+    def times(self, path: str) -> list:
+        with self.lock:
+            return [at for arrived_path, at, _ in self.arrivals if arrived_path == path]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real APIs
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, which Nagle's algorithm would hold back for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            script = server.scripts.get(url.path)
+            status, retry_after = script.pop(0) if script else (200, None)
+            # A script that ends in None repeats its last answer forever
+            if script == [None]:
+                script.insert(0, (status, retry_after))
+            server.arrivals.append((url.path, time.monotonic(), status))
+        try:
+            time.sleep(float(query.get("delay", ["0"])[0]))
+            if status != 200:
+                body = json.dumps({"error": {"status": status, "message": "stand-in error"}}).encode()
+            elif url.path == "/api/token":
+                body = json.dumps({"access_token": "stand-in", "token_type": "Bearer", "expires_in": 3600}).encode()
+            elif url.path == "/v1/search":
+                track = {"name": "Stand-In Song", "popularity": 50, "duration_ms": 60000, "artists": [{"name": "Stand-In Artist"}], "album": {"images": [{"url": "http://127.0.0.1/cover.jpg"}]}}
+                body = json.dumps({"tracks": {"items": [track]}}).encode()
+            elif url.path == "/lrc":
+                body = LRC.encode()
+            else:
+                body = b'{"ok": true}'
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    do_GET = _answer
+    do_POST = _answer
+
+def new_client(**kwargs) -> HttpClient:
+    settings = {"rates": {}, "default_rate": (1000.0, 1000), "deadline": 5.0, "rng": random.Random(1)}
+    settings.update(kwargs)
+    return HttpClient(**settings)
+
+def check_keep_alive(server: StandInServer, requests_count: int) -> list:
+    client = new_client()
+    session = client.session()
+    server.reset()
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        session.get(server.base_url + "/ok").raise_for_status()
+    pooled_ms = (time.perf_counter() - started) * 1000 / requests_count
+    pooled_connections = server.connections
+
+    server.reset()
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        # What spotipy and syncedlyrics did by default for many calls: no shared pool
+        with requests.Session() as fresh:
+            fresh.get(server.base_url + "/ok").raise_for_status()
+    fresh_ms = (time.perf_counter() - started) * 1000 / requests_count
+    client.close()
+    return [(f"keep-alive: {requests_count} requests over {pooled_connections} connection(s), {pooled_ms:.2f} ms/request (new connection each: {server.connections}, {fresh_ms:.2f} ms/request)", pooled_connections == 1)]
+
+def check_concurrency(server: StandInServer, threads: int, max_per_host: int) -> list:
+    client = new_client(max_per_host=max_per_host)
+    server.reset()
+    sessions = [client.session() for _ in range(threads)]
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda session: session.get(server.base_url + "/ok?delay=0.05").raise_for_status(), sessions * 3))
+    client.close()
+    return [(f"concurrency: {threads} threads, at most {server.max_in_flight} requests at once (limit {max_per_host}), {server.connections} connections", server.max_in_flight <= max_per_host and server.connections <= max_per_host)]
+
+def check_rate_limit(server: StandInServer, rate: float, burst: int, requests_count: int) -> list:
+    client = new_client(default_rate=(rate, burst), max_per_host=8)
+    session = client.session(deadline=60)
+    server.reset()
+    started = time.monotonic()
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: session.get(server.base_url + "/ok").raise_for_status(), range(requests_count)))
+    elapsed = time.monotonic() - started
+    client.close()
+    times = sorted(server.times("/ok"))
+    # Most requests that arrived within any one second
+    densest = max(sum(1 for other in times[i:] if other - at < 1.0) for i, at in enumerate(times))
+    minimum = (requests_count - burst) / rate
+    return [(f"rate limit: {requests_count} requests at {rate:g}/s, burst {burst} took {elapsed:.2f} s (at least {minimum:.2f} s), at most {densest} in any second (limit {rate + burst:g})",
+             elapsed >= minimum - 0.05 and densest <= rate + burst)]
+
+def check_retry_after(server: StandInServer, retry_after: int, threads: int) -> list:
+    client = new_client(max_per_host=threads)
+    server.reset()
+    server.script("/limited", [(429, retry_after)])
+    first = client.session()
+    others = [client.session() for _ in range(threads - 1)]
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(first.get, server.base_url + "/limited")]
+        # The others start once the 429 is in, and have to wait with the first one
+        time.sleep(0.1)
+        futures += [pool.submit(session.get, server.base_url + "/limited") for session in others]
+        statuses = [future.result().status_code for future in futures]
+    client.close()
+    with server.lock:
+        refused_at = next(at for path, at, status in server.arrivals if status == 429)
+        later = [at - refused_at for path, at, status in server.arrivals if at > refused_at]
+    return [(f"Retry-After: after a 429 asking for {retry_after} s, the next {len(later)} requests came {min(later):.2f} s to {max(later):.2f} s later, all succeeded: {statuses.count(200) == threads}",
+             min(later) >= retry_after - 0.01 and statuses.count(200) == threads)]
+
+def check_token_refund() -> list:
+    """TokenBucket on a fake clock: the second request waits for a token, and a Retry-After past its deadline comes in meanwhile."""
+    now = [0.0]
+    bucket = None
+
+    def sleep(seconds: float) -> None:
+        if now[0] == 0.0:
+            bucket.block_until(5.0)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10.0, burst=1, clock=lambda: now[0], sleep=sleep)
+    first, second = bucket.acquire(deadline=1.0), bucket.acquire(deadline=1.0)
+    # Once the Retry-After is over, the bucket starts from empty: the next token comes 1 / rate later, not 2 / rate
+    now[0] = 5.0
+    third = bucket.acquire(deadline=10.0)
+    return [(f"token refund: first {first}, the waiting one {second}, the next one after the Retry-After got its token at {now[0]:.2f} s (expected 5.10 s)",
+             first and not second and third and abs(now[0] - 5.1) < 1e-9)]
+
+def check_backoff(server: StandInServer, failures: int) -> list:
+    client = new_client(backoff_base=0.1)
+    server.reset()
+    server.script("/flaky", [(503, None)] * failures)
+    started = time.monotonic()
+    response = client.session().get(server.base_url + "/flaky")
+    elapsed = time.monotonic() - started
+    client.close()
+    times = server.times("/flaky")
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    bounds = [min(client.backoff_cap, client.backoff_base * 2 ** attempt) for attempt in range(len(gaps))]
+    within = all(gap <= bound + 0.05 for gap, bound in zip(gaps, bounds))
+    return [(f"back-off: {failures} x 503 then {response.status_code} after {len(times)} attempts in {elapsed:.2f} s, waits {', '.join(f'{gap:.3f}' for gap in gaps)} s (bounds {', '.join(f'{bound:g}' for bound in bounds)})",
+             response.status_code == 200 and len(times) == failures + 1 and within)]
+
+def check_deadlines(server: StandInServer, deadline: float) -> list:
+    rows = []
+    client = new_client(timeout=(1.0, 10.0))
+    server.reset()
+    started = time.monotonic()
+    try:
+        client.session(deadline=deadline).get(server.base_url + f"/ok?delay={deadline * 3}")
+        error = None
+    except DeadlineExceeded as e:
+        error = e
+    elapsed = time.monotonic() - started
+    rows.append((f"deadline: a host answering after {deadline * 3:g} s gave up after {elapsed:.2f} s (deadline {deadline:g} s): {type(error).__name__}", isinstance(error, DeadlineExceeded) and elapsed <= deadline + 0.25))
+
+    server.script("/limited", [(429, 30), None])
+    results = []
+    for _ in range(2):
+        started = time.monotonic()
+        try:
+            client.session(deadline=deadline).get(server.base_url + "/limited")
+            results.append(("answered", time.monotonic() - started))
+        except RateLimited as e:
+            results.append((f"RateLimited (retry after {e.retry_after:.0f} s)", time.monotonic() - started))
+    arrived = len(server.times("/limited"))
+    client.close()
+    rows.append((f"deadline: Retry-After of 30 s -> {results[0][0]} in {results[0][1]:.2f} s, the next request {results[1][0]} in {results[1][1]:.2f} s without reaching the host ({arrived} arrived)",
+                 all(result.startswith("RateLimited") and elapsed < 0.5 for result, elapsed in results) and arrived == 1))
+
+    # Short Retry-Afters that fit the deadline, until the attempts run out
+    client = new_client(max_attempts=2)
+    server.reset()
+    server.script("/limited", [(429, 0.1)] * 2)
+    try:
+        client.session(deadline=deadline * 5).get(server.base_url + "/limited")
+        message = "answered"
+    except RateLimited as e:
+        message = str(e)
+    client.close()
+    rows.append((f"attempts: 429 at every attempt within the deadline -> {message}", "2 attempts" in message and "deadline" not in message))
+    return rows
+
+def check_lyrics_manager(server: StandInServer) -> list:
+    try:
+        import spotipy
+    except ImportError:
+        return [("LyricsManager: skipped, spotipy is not installed", True)]
+    from classes.LyricsManager import LyricsManager
+    from classes.LyricsProviders import LyricsProvider
+
+    class StandInProvider(LyricsProvider):
+        """Gets its lyrics from the stand-in, through the shared client like the syncedlyrics providers."""
+        name = "stand-in"
+        timeout = 2.0
+
+        def __init__(self, http: HttpClient):
+            self.session = http.session(deadline=self.timeout)
+
+        def fetch_lrc(self, title, main_artist, duration_ms, cancelled):
+            response = self.session.get(server.base_url + "/lrc")
+            response.raise_for_status()
+            return response.text
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        http = new_client(deadline=3.0)
+        manager = LyricsManager("id", "secret", "", db_path=os.path.join(tmp, "lyrics.db"), providers=[StandInProvider(http)], token_cache_path=os.path.join(tmp, "token.json"), http=http)
+        manager.spotify_token.TOKEN_URL = server.base_url + "/api/token"
+        manager.spotify.prefix = server.base_url + "/v1/"
+
+        server.reset()
+        server.script("/v1/search", [(429, 1)])
+        started = time.monotonic()
+        song, reason = manager.search_on_spotify_with_reason("Stand-In Song", "Stand-In Artist")
+        elapsed = time.monotonic() - started
+        rows.append((f"LyricsManager: lookup with a 429 on the way -> {len(song.start_times) if song else 0} lines in {elapsed:.2f} s over {server.connections} connection(s)",
+                     song is not None and len(song.start_times) == LRC.count("\n") + 1 and server.connections == 1))
+
+        server.reset()
+        server.script("/v1/search", [(429, 60), None])
+        started = time.monotonic()
+        song, reason = manager.search_on_spotify_with_reason("Stand-In Song", "Stand-In Artist")
+        rows.append((f"LyricsManager: Spotify keeps answering 429 -> {reason} in {time.monotonic() - started:.2f} s", song is None and reason == LyricsManager.MISS_PROVIDER_ERROR))
+        manager.close()
+
+        http = new_client(deadline=3.0)
+        manager = LyricsManager("id", "secret", "", db_path=os.path.join(tmp, "lyrics.db"), providers=[StandInProvider(http)], token_cache_path=os.path.join(tmp, "token.json"), http=http)
+        manager.spotify.prefix = server.base_url + "/v1/"
+        server.reset()
+        server.script("/lrc", [(503, None), None])
+        song, reason = manager.search_on_spotify_with_reason("Stand-In Song", "Stand-In Artist")
+        rows.append((f"LyricsManager: lyrics provider keeps answering 503 -> {reason}, not {LyricsManager.MISS_NO_SYNCED_LYRICS}", song is None and reason == LyricsManager.MISS_PROVIDER_ERROR))
+        manager.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests of the keep-alive comparison")
+    parser.add_argument("--log", action="store_true", help="show the log of the client")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.log else logging.CRITICAL, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    server = StandInServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    rows = []
+    try:
+        rows += check_keep_alive(server, args.requests)
+        rows += check_concurrency(server, threads=12, max_per_host=3)
+        rows += check_rate_limit(server, rate=20.0, burst=5, requests_count=45)
+        rows += check_retry_after(server, retry_after=1, threads=4)
+        rows += check_token_refund()
+        rows += check_backoff(server, failures=3)
+        rows += check_deadlines(server, deadline=1.0)
+        rows += check_lyrics_manager(server)
+    finally:
+        server.shutdown()
+    failed = 0
+    for text, ok in rows:
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    print(f"{len(rows) - failed} of {len(rows)} checks passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Throughput benchmark of the bulk import and export of the lyrics library, in songs per second.
+
+Writes synthetic songs (a third of them with word timings) as a folder of LRC files and as a
+.jsonl.gz archive, then imports each into a fresh database, parsing in this process and with a
+process pool, and compares that with saving the same songs one at a time through
+save_song_to_database. Imports the archive a second time to check that every song is skipped as a
+duplicate, exports the database as JSONL and LRC, and checks that an export -> import -> export
+round trip gives the same archive and that exporting the LRC files into the same folder again keeps
+one file per song. The peak memory of the importing process is measured for two library sizes to show
+that it depends on the batch size, not on the library. Run from the repository root:
+
+    python -m benchmarks.library_import --songs 20000 --workers 4
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from classes.LibraryArchive import LibraryArchive, record_to_song, song_to_record
+from classes.LrcParser import format_lrc
+from classes.LyricsManager import LyricsManager
+from classes.Song import Song
+
+WORDS = ("love", "night", "fire", "heart", "dance", "light", "dream", "rain", "gold", "storm", "summer", "shadow", "river", "echo",
+         "neon", "ghost", "paradise", "thunder", "silver", "midnight", "ocean", "wild", "electric", "falling", "city", "stars")
+
+def build_song(rng: random.Random, song_id: int, lines: int) -> Song:
+    starts, ends, texts = [], [], []
+    word_offsets, word_starts, word_texts = [0], [], []
+    t = rng.randint(0, 15000)
+    for _ in range(lines):
+        duration = rng.randint(1500, 5000)
+        line_words = [rng.choice(WORDS) for _ in range(rng.randint(3, 7))]
+        starts.append(t)
+        ends.append(t + duration)
+        texts.append(" ".join(line_words))
+        for j, word in enumerate(line_words):
+            word_starts.append(t + duration * j // len(line_words))
+            word_texts.append(word)
+        word_offsets.append(len(word_starts))
+        t += duration
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title() + f" {song_id}"
+    artist = f"{rng.choice(WORDS).title()} Artist {song_id % 997}"
+    if song_id % 3:
+        return Song.from_arrays(starts, ends, texts, title=title, artist=artist)
+    return Song.from_arrays(starts, ends, texts, title=title, artist=artist, word_offsets=word_offsets, word_starts=word_starts, word_texts=word_texts)
+
+def write_inputs(directory: str, songs: int, lines: int, seed: int) -> tuple:
+    rng = random.Random(seed)
+    lrc_dir = os.path.join(directory, "lrc")
+    jsonl_path = os.path.join(directory, "songs.jsonl.gz")
+    os.makedirs(lrc_dir)
+    with gzip.open(jsonl_path, "wt", encoding="utf-8") as archive:
+        for song_id in range(1, songs + 1):
+            song = build_song(rng, song_id, lines)
+            # 100 songs per folder, like a library sorted by artist
+            folder = os.path.join(lrc_dir, f"{song_id // 100:04d}")
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f"{song.artist} - {song.title}.lrc"), "w", encoding="utf-8") as f:
+                f.write(format_lrc(song))
+            archive.write(json.dumps(song_to_record(song, [(song.title, song.artist)])) + "\n")
+    return lrc_dir, jsonl_path
+
+def fresh_manager(directory: str, name: str) -> LyricsManager:
+    path = os.path.join(directory, name)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return LyricsManager("", "", "", db_path=path)
+
+def timed_import(directory: str, source: str, workers: int, batch_size: int) -> tuple:
+    manager = fresh_manager(directory, "import.db")
+    start = time.perf_counter()
+    counts = LibraryArchive(manager, workers=workers, batch_size=batch_size).import_path(source)
+    seconds = time.perf_counter() - start
+    manager.close()
+    return counts, seconds
+
+def one_at_a_time(directory: str, jsonl_path: str, limit: int) -> float:
+    """Songs per second when every song is saved in its own transaction, as the apps do."""
+    manager = fresh_manager(directory, "single.db")
+    saved = 0
+    start = time.perf_counter()
+    with gzip.open(jsonl_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            song, queries = record_to_song(json.loads(line))
+            manager.save_song_to_database(song, *queries[0])
+            saved += 1
+            if saved == limit:
+                break
+    seconds = time.perf_counter() - start
+    manager.close()
+    return saved / seconds
+
+def peak_import_memory(directory: str, jsonl_path: str, songs: int, workers: int, batch_size: int) -> float:
+    """Peak MB traced in this process while importing the first 'songs' songs of the archive."""
+    partial = os.path.join(directory, f"first-{songs}.jsonl")
+    with gzip.open(jsonl_path, "rt", encoding="utf-8") as source, open(partial, "w", encoding="utf-8") as target:
+        for _, line in zip(range(songs), source):
+            target.write(line)
+    manager = fresh_manager(directory, "memory.db")
+    tracemalloc.start()
+    LibraryArchive(manager, workers=workers, batch_size=batch_size).import_path(partial)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    manager.close()
+    return peak / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=40, help="lines per song")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parsing processes of the pooled import")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--single", type=int, default=2000, help="songs saved one at a time for the comparison")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default=None, help="directory for the files of the benchmark (default: a temporary directory)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = args.dir or tempfile.mkdtemp()
+    start = time.perf_counter()
+    lrc_dir, jsonl_path = write_inputs(directory, args.songs, args.lines, args.seed)
+    print(f"wrote {args.songs} songs x {args.lines} lines as LRC and JSONL in {time.perf_counter() - start:.1f} s, archive {os.path.getsize(jsonl_path) / 1e6:.1f} MB")
+
+    print(f"{'import':<40} {'songs/s':>9} {'seconds':>8}  counts")
+    print(f"{'one transaction per song':<40} {one_at_a_time(directory, jsonl_path, args.single):>9.0f}")
+    for name, source in (("LRC folder", lrc_dir), ("JSONL archive", jsonl_path)):
+        for workers in sorted({1, args.workers}):
+            counts, seconds = timed_import(directory, source, workers, args.batch_size)
+            print(f"{f'{name}, {workers} process' + ('es' if workers > 1 else ''):<40} {counts['imported'] / seconds:>9.0f} {seconds:>8.2f}  {counts}")
+
+    manager = LyricsManager("", "", "", db_path=os.path.join(directory, "import.db"))
+    archive = LibraryArchive(manager, workers=args.workers, batch_size=args.batch_size)
+    start = time.perf_counter()
+    counts = archive.import_path(jsonl_path)
+    seconds = time.perf_counter() - start
+    print(f"{'JSONL archive again (all duplicates)':<40} {counts['read'] / seconds:>9.0f} {seconds:>8.2f}  {counts}")
+    dedupe_ok = counts["imported"] == 0 and counts["duplicates"] == args.songs
+
+    print(f"{'export':<40} {'songs/s':>9} {'seconds':>8}")
+    exported_path = os.path.join(directory, "export.jsonl.gz")
+    lrc_export_dir = os.path.join(directory, "export-lrc")
+    for name, export, target in (("JSONL archive", archive.export_jsonl, exported_path), ("LRC folder", archive.export_lrc, lrc_export_dir)):
+        start = time.perf_counter()
+        exported = export(target)
+        seconds = time.perf_counter() - start
+        print(f"{name:<40} {exported / seconds:>9.0f} {seconds:>8.2f}")
+    # Exporting into the same folder again overwrites the files instead of adding copies
+    archive.export_lrc(lrc_export_dir)
+    reexport_ok = len(os.listdir(lrc_export_dir)) == exported
+    manager.close()
+
+    # export -> import -> export gives the same archive
+    manager = fresh_manager(directory, "roundtrip.db")
+    archive = LibraryArchive(manager, workers=args.workers, batch_size=args.batch_size)
+    archive.import_path(exported_path)
+    second_path = os.path.join(directory, "export-again.jsonl.gz")
+    archive.export_jsonl(second_path)
+    manager.close()
+    with gzip.open(exported_path, "rt", encoding="utf-8") as first, gzip.open(second_path, "rt", encoding="utf-8") as second:
+        roundtrip_ok = first.read() == second.read()
+
+    # Both sizes fill several batches, the peak should be the same
+    small, large = max(1, args.songs // 2), args.songs
+    print(f"peak memory of the importing process: {peak_import_memory(directory, jsonl_path, small, args.workers, args.batch_size):.1f} MB for {small} songs, "
+          f"{peak_import_memory(directory, jsonl_path, large, args.workers, args.batch_size):.1f} MB for {large} songs")
+    print(f"second import skipped every song: {dedupe_ok}")
+    print(f"export -> import -> export is identical: {roundtrip_ok}")
+    print(f"exporting LRC files into the same folder again keeps one file per song: {reexport_ok}")
+    if not args.dir:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
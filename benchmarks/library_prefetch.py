@@ -0,0 +1,201 @@
+"""Checks LibraryScanner and Prefetcher on a temporary library of custom maps, with a stub resolver instead of the network.
+
+Writes a Beat Saber CustomLevels folder (Info.dat v2 and v4, a lower-case info.dat, a broken Info.dat and a
+folder without one) and a Synth Riders CustomSongs folder (.synth archives, an extracted map, a broken archive),
+scans them and prefetches the songs into a temporary database. The stub resolver saves a song for every query
+(or records a miss for some of them, like the network lookup does) and notes when each lookup started.
+The checks:
+
+  scanner           every readable map is found with the title and artist the game reports, broken ones are skipped
+  progress          the callback sees every song once, counting up to the total, duplicates are looked up once
+  rate limit        lookups start no faster than --rate per second, with all workers busy
+  interrupted run   stop() from the progress callback lets the running lookups finish and skips the others
+  resume            a second run looks up only the songs the first one did not get to, a third one looks up nothing
+
+Exits with status 1 if a check fails. Run from the repository root:
+
+    python -m benchmarks.library_prefetch
+    python -m benchmarks.library_prefetch --songs 200 --rate 50 --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from classes.LibraryScanner import LibraryScanner, LibrarySong
+from classes.LyricsManager import LyricsManager
+from classes.LyricsResolver import LookupResult, LyricsResolver
+from classes.Prefetcher import Prefetcher
+from classes.Song import Song
+
+class StubResolver:
+    """Stands in for LyricsResolver.resolve(): saves a one-line song for every query, except for the titles in 'misses', which are recorded as misses."""
+    def __init__(self, lyrics_manager: LyricsManager, misses: set, lookup_seconds: float):
+        self.lyrics_manager = lyrics_manager
+        self.misses = misses
+        self.lookup_seconds = lookup_seconds
+        self.lock = threading.Lock()
+        self.started = []
+
+    def resolve(self, title: str, main_artist: str) -> LookupResult:
+        with self.lock:
+            self.started.append((time.monotonic(), title))
+        time.sleep(self.lookup_seconds)
+        if title in self.misses:
+            self.lyrics_manager.record_miss(title, main_artist, LyricsManager.MISS_NO_SYNCED_LYRICS)
+            return LookupResult(None, None)
+        song = Song.from_arrays([1000], [3000], [f"{title} by {main_artist}"], title=title, artist=main_artist)
+        self.lyrics_manager.save_song_to_database(song, title, main_artist)
+        return LookupResult(song, LyricsResolver.TIER_NETWORK)
+
+def write_library(directory: str, songs: int) -> tuple:
+    """The Beat Saber and Synth Riders folders, and the (title, artist) pairs the scanner should find in each."""
+    beat_saber = os.path.join(directory, "CustomLevels")
+    synth_riders = os.path.join(directory, "CustomSongs")
+    os.makedirs(beat_saber)
+    os.makedirs(synth_riders)
+    expected_beat_saber, expected_synth_riders = [], []
+    for i in range(songs):
+        title, artist = f"Song {i:04d}", f"Artist {i % 7}"
+        if i % 2 == 0:
+            level = os.path.join(beat_saber, f"{i:04d} ({title} - mapper)")
+            os.makedirs(level)
+            if i % 6 == 0:
+                info, name = {"version": "4.0.0", "song": {"title": title, "subTitle": "", "author": artist}}, "Info.dat"
+            else:
+                info, name = {"_version": "2.0.0", "_songName": title, "_songAuthorName": artist}, "Info.dat" if i % 4 else "info.dat"
+            with open(os.path.join(level, name), "w", encoding="utf-8-sig") as f:
+                json.dump(info, f)
+            expected_beat_saber.append((title, artist))
+        else:
+            meta = json.dumps({"Name": title, "Author": artist, "Beatmapper": "mapper"})
+            if i % 5 == 1:
+                os.makedirs(os.path.join(synth_riders, f"{title}"))
+                with open(os.path.join(synth_riders, title, "beatmap.meta.bin"), "w", encoding="utf-8") as f:
+                    f.write(meta)
+            else:
+                with zipfile.ZipFile(os.path.join(synth_riders, f"{title}.synth"), "w") as archive:
+                    archive.writestr("beatmap.meta.bin", meta)
+            expected_synth_riders.append((title, artist))
+
+    # Maps the games would not load either
+    os.makedirs(os.path.join(beat_saber, "broken"))
+    with open(os.path.join(beat_saber, "broken", "Info.dat"), "w") as f:
+        f.write("{not json")
+    os.makedirs(os.path.join(beat_saber, "no info"))
+    with open(os.path.join(synth_riders, "broken.synth"), "wb") as f:
+        f.write(b"not a zip file")
+    with open(os.path.join(synth_riders, "notes.txt"), "w") as f:
+        f.write("not a map")
+    # The same song installed twice, once per game
+    level = os.path.join(beat_saber, "duplicate")
+    os.makedirs(level)
+    with open(os.path.join(level, "Info.dat"), "w", encoding="utf-8") as f:
+        json.dump({"_songName": expected_synth_riders[0][0], "_songAuthorName": expected_synth_riders[0][1]}, f)
+    expected_beat_saber.append(expected_synth_riders[0])
+    return beat_saber, synth_riders, expected_beat_saber, expected_synth_riders
+
+def check_scanner(beat_saber: str, synth_riders: str, expected_beat_saber: list, expected_synth_riders: list) -> tuple:
+    scanner = LibraryScanner()
+    found_beat_saber = [(song.title, song.artist) for song in scanner.scan_beat_saber(beat_saber)]
+    found_synth_riders = [(song.title, song.artist) for song in scanner.scan_synth_riders(synth_riders)]
+    rows = [
+        (f"scanner: Beat Saber {len(found_beat_saber)} of {len(expected_beat_saber)} levels", sorted(found_beat_saber) == sorted(expected_beat_saber)),
+        (f"scanner: Synth Riders {len(found_synth_riders)} of {len(expected_synth_riders)} maps", sorted(found_synth_riders) == sorted(expected_synth_riders)),
+    ]
+    songs = list(scanner.scan_beat_saber(beat_saber)) + list(scanner.scan_synth_riders(synth_riders))
+    return rows, songs
+
+def run_prefetch(manager: LyricsManager, resolver: StubResolver, songs: list, workers: int, rate: float, stop_after: int = None) -> tuple:
+    """The counts of Prefetcher.run() and the progress callbacks as (done, total, title, state)."""
+    progress = []
+    prefetcher = None
+
+    def report(done: int, total: int, song: LibrarySong, state: str) -> None:
+        progress.append((done, total, song.title, state))
+        if stop_after is not None and done == stop_after:
+            prefetcher.stop()
+
+    prefetcher = Prefetcher(manager, resolver, max_workers=workers, requests_per_second=rate, progress_callback=report)
+    return prefetcher.run(songs), progress
+
+def check_progress(progress: list, unique: int, counts: dict) -> list:
+    dones = [done for done, _, _, _ in progress]
+    titles = [title for _, _, title, _ in progress]
+    return [
+        (f"progress: {len(progress)} callbacks for {unique} unique songs, done 1..{max(dones)}",
+         dones == list(range(1, unique + 1)) and all(total == unique for _, total, _, _ in progress)),
+        (f"progress: every song reported once, counts {counts}", len(set(titles)) == unique and sum(counts.values()) == unique),
+    ]
+
+def check_rate_limit(started: list, rate: float) -> list:
+    """The k-th lookup may not start before k / rate seconds after the first (with some slack for the timer)."""
+    times = sorted(at for at, _ in started)
+    slack = 0.02
+    early = [k for k, at in enumerate(times) if at - times[0] < k / rate - slack]
+    achieved = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+    return [(f"rate limit: {len(times)} lookups at {achieved:.1f}/s (limit {rate:g}/s), {len(early)} started early", not early and achieved <= rate * 1.05)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=60, help="maps in the library (half per game)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=20.0, help="network lookups per second of the Prefetcher")
+    parser.add_argument("--lookup-ms", type=float, default=30.0, help="time the stub resolver takes per lookup")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        beat_saber, synth_riders, expected_beat_saber, expected_synth_riders = write_library(tmp, args.songs)
+        scanner_rows, songs = check_scanner(beat_saber, synth_riders, expected_beat_saber, expected_synth_riders)
+        rows += scanner_rows
+        unique = len({(title, artist) for title, artist in expected_beat_saber + expected_synth_riders})
+        misses = {song.title for song in songs[::9]}
+
+        # First run, stopped after a third of the songs as if interrupted
+        manager = LyricsManager("", "", "", db_path=os.path.join(tmp, "lyrics.db"))
+        resolver = StubResolver(manager, misses, args.lookup_ms / 1000)
+        stop_after = unique // 3
+        counts, progress = run_prefetch(manager, resolver, songs, args.workers, args.rate, stop_after=stop_after)
+        first_lookups = {title for _, title in resolver.started}
+        rows += check_progress(progress, unique, counts)
+        rows.append((f"interrupted run: stopped after {stop_after} songs, {len(first_lookups)} looked up, {counts.get(Prefetcher.SKIPPED, 0)} skipped",
+                     stop_after <= len(first_lookups) <= stop_after + args.workers and counts.get(Prefetcher.SKIPPED, 0) == unique - len(first_lookups)))
+        rows += check_rate_limit(resolver.started, args.rate)
+        manager.close()
+
+        # Second run on the same database: continues with the songs the first one did not get to
+        manager = LyricsManager("", "", "", db_path=os.path.join(tmp, "lyrics.db"))
+        resolver = StubResolver(manager, misses, args.lookup_ms / 1000)
+        counts, progress = run_prefetch(manager, resolver, songs, args.workers, args.rate)
+        second_lookups = {title for _, title in resolver.started}
+        rows += check_progress(progress, unique, counts)
+        rows.append((f"resume: {len(second_lookups)} looked up, {len(second_lookups & first_lookups)} of them again",
+                     not second_lookups & first_lookups and len(first_lookups | second_lookups) == unique))
+        rows += check_rate_limit(resolver.started, args.rate)
+        manager.close()
+
+        # Third run: everything is either saved or in the negative cache
+        manager = LyricsManager("", "", "", db_path=os.path.join(tmp, "lyrics.db"))
+        resolver = StubResolver(manager, misses, args.lookup_ms / 1000)
+        counts, _ = run_prefetch(manager, resolver, songs, args.workers, args.rate)
+        saved = unique - len(misses)
+        rows.append((f"resume: third run looked up {len(resolver.started)}, counts {counts}",
+                     not resolver.started and counts == {Prefetcher.SKIPPED: saved, Prefetcher.MISSED: len(misses)}))
+        manager.close()
+
+    failed = 0
+    for text, ok in rows:
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    print(f"{len(rows) - failed} of {len(rows)} checks passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Benchmark of the database viewer's data access: opening the list, scrolling, search as you type, previews and deletes.
+
+Builds a version 5 database (before the library index) with synthetic songs, half of them stored
+as blobs, and times the migration that indexes titles, artists and lyrics. Then compares the old
+viewer, which read every song at startup, with SongLibrary/SongPages: the first screen, jumps to
+random positions and paging from there, every keystroke of searches for title and lyric words,
+loading a preview, and deleting songs: the old viewer's statements and commit per song, a commit per song
+with the cascades, a statement per song in one transaction, and SongLibrary.delete (one transaction, a statement
+per chunk of songs). The cost of each table of the cascade is profiled by deleting its rows on their own, a
+statement per song and in one statement, in a transaction that is rolled back. Checks that paging through the whole list returns every song once and in order, and that deleted
+songs leave nothing behind in any table. Tk is not needed. Run from the repository root:
+
+    python -m benchmarks.library_viewer --songs 100000
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from classes import LyricsBlob
+from classes.DatabaseMigrations import MIGRATIONS, migrate
+from classes.QueryNormalizer import normalize_artist, normalize_title, query_key
+from classes.Song import Song
+from classes.SongLibrary import SongLibrary, SongPages
+
+WORDS = ("love", "night", "fire", "heart", "dance", "light", "dream", "rain", "gold", "storm", "summer", "shadow", "river", "echo",
+         "neon", "ghost", "paradise", "thunder", "silver", "midnight", "ocean", "wild", "electric", "falling", "city", "stars")
+VISIBLE_ROWS = 30
+
+def build_database(path: str, songs: int, lines_per_song: int, seed: int) -> None:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+    # The schema before the library index
+    for migration in MIGRATIONS[:5]:
+        migration(cursor)
+    cursor.execute("PRAGMA user_version = 5")
+    for first in range(1, songs + 1, 1000):
+        batch = []
+        for song_id in range(first, min(first + 1000, songs + 1)):
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title() + f" {song_id}"
+            artist = f"{rng.choice(WORDS).title()} Artist {song_id % 997}"
+            texts = [" ".join(rng.choice(WORDS) for _ in range(5)) for _ in range(lines_per_song)]
+            batch.append((song_id, title, artist, texts))
+        cursor.executemany("INSERT INTO songs (id, title, artist, cover_link) VALUES (?, ?, ?, NULL)", ((i, t, a) for i, t, a, _ in batch))
+        cursor.executemany("INSERT INTO querys (query_title, query_main_artist, song_id, query_key) VALUES (?, ?, ?, ?)", ((t, a, i, query_key(t, a)) for i, t, a, _ in batch))
+        cursor.executemany("INSERT INTO query_entries (title, artist, song_id) VALUES (?, ?, ?)", ((normalize_title(t), normalize_artist(a), i) for i, t, a, _ in batch))
+        blobs, lines = [], []
+        for song_id, _, _, texts in batch:
+            starts = [j * 2000 for j in range(len(texts))]
+            if song_id % 2:
+                blobs.append((song_id, LyricsBlob.encode(Song.from_arrays(starts, [start + 2000 for start in starts], texts))))
+            else:
+                lines.extend((song_id, text, start, start + 2000, 2000) for text, start in zip(texts, starts))
+        cursor.executemany("INSERT INTO lyrics_blobs (song_id, data) VALUES (?, ?)", blobs)
+        cursor.executemany("INSERT INTO lyrics_lines (song_id, text, startMs, endMs, durationMs) VALUES (?, ?, ?, ?, ?)", lines)
+        conn.commit()
+    conn.close()
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {name:<44} median {statistics.median(samples):9.3f} ms   p95 {p95:9.3f} ms   ({len(samples)} samples)")
+
+def old_startup(path: str) -> int:
+    """What the old viewer did before showing its window: every song, formatted into a label that carried its id."""
+    conn = sqlite3.connect(path)
+    labels = [f"{title} (ID: {song_id})" for song_id, title in conn.execute("SELECT id, title FROM songs").fetchall()]
+    conn.close()
+    return len(labels)
+
+def new_startup(library: SongLibrary) -> list:
+    return SongPages(library).rows(0, VISIBLE_ROWS)
+
+def check_order(library: SongLibrary) -> bool:
+    """Paging through the whole list with keyset pagination gives every song once, in the order of a full sort."""
+    pages = SongPages(library, page_size=500, max_pages=4)
+    paged = [song.song_id for song in pages.rows(0, pages.total)]
+    expected = [row[0] for row in library._connection().execute("SELECT id FROM songs ORDER BY ifnull(title, '') COLLATE NOCASE, id")]
+    return paged == expected
+
+def old_delete(conn: sqlite3.Connection, song_ids: list) -> None:
+    for song_id in song_ids:
+        conn.execute("DELETE FROM songs WHERE id=?", (song_id,))
+        conn.execute("DELETE FROM lyrics_lines WHERE song_id=?", (song_id,))
+        conn.execute("DELETE FROM querys WHERE song_id=?", (song_id,))
+        conn.commit()
+
+def leftovers(conn: sqlite3.Connection, song_ids: list) -> dict:
+    marks = ",".join("?" * len(song_ids))
+    tables = {"songs": "id", "lyrics_lines": "song_id", "lyrics_blobs": "song_id", "querys": "song_id", "query_entries": "song_id", "library_index": "rowid"}
+    counts = {table: conn.execute(f"SELECT count(*) FROM {table} WHERE {column} IN ({marks})", song_ids).fetchone()[0] for table, column in tables.items()}
+    return {table: count for table, count in counts.items() if count}
+
+def commit_per_song_delete(path: str, song_ids: list) -> None:
+    """The old viewer's commit per song, but with the cascades and triggers, so it removes as much as SongLibrary.delete."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys=ON")
+    for song_id in song_ids:
+        conn.execute("DELETE FROM songs WHERE id=?", (song_id,))
+        conn.commit()
+    conn.close()
+
+def statement_per_song_delete(path: str, song_ids: list) -> None:
+    """One transaction, but a DELETE statement per song."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys=ON")
+    with conn:
+        conn.executemany("DELETE FROM songs WHERE id=?", ((song_id,) for song_id in song_ids))
+    conn.close()
+
+# What deleting a song touches, children first: the cascades of the foreign keys, the FTS5 triggers (query_entries feeds query_index), the song
+CASCADE = (("lyrics_lines", "song_id"), ("lyrics_blobs", "song_id"), ("querys", "song_id"), ("query_entries", "song_id"), ("library_index", "rowid"), ("songs", "id"))
+
+def cascade_profile(path: str, song_ids: list) -> list:
+    """(table, ms with a statement per song, ms with one statement) for every table of the cascade, deleted on its own and rolled back."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    marks = ",".join("?" * len(song_ids))
+    per_song, at_once = {}, {}
+    for times, run in ((per_song, lambda table, column: conn.executemany(f"DELETE FROM {table} WHERE {column}=?", ((song_id,) for song_id in song_ids))),
+                       (at_once, lambda table, column: conn.execute(f"DELETE FROM {table} WHERE {column} IN ({marks})", song_ids))):
+        conn.execute("BEGIN")
+        for table, column in CASCADE:
+            times[table] = timed(run, table, column)[1]
+        conn.execute("ROLLBACK")
+    conn.close()
+    return [(table, per_song[table], at_once[table]) for table, _ in CASCADE]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=100000)
+    parser.add_argument("--lines-per-song", type=int, default=40)
+    parser.add_argument("--samples", type=int, default=50, help="jumps and searches to time")
+    parser.add_argument("--deletes", type=int, default=200, help="songs deleted by each delete strategy")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default=None, help="directory for the benchmark database (default: a temporary directory)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+
+    directory = args.dir or tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark-library.db")
+    if os.path.exists(path):
+        os.remove(path)
+    _, ms = timed(build_database, path, args.songs, args.lines_per_song, args.seed)
+    print(f"built {args.songs} songs x {args.lines_per_song} lines in {ms / 1000:.1f} s")
+    conn = sqlite3.connect(path)
+    _, ms = timed(migrate, conn)
+    conn.close()
+    print(f"migration to the library index: {ms / 1000:.1f} s, database {os.path.getsize(path) / 1e6:.1f} MB")
+
+    print("opening the list")
+    report("old: every song into the list", [timed(old_startup, path)[1] for _ in range(5)])
+    library = SongLibrary(path)
+    report(f"new: count + first {VISIBLE_ROWS} rows", [timed(new_startup, library)[1] for _ in range(5)])
+
+    print("scrolling")
+    pages = SongPages(library)
+    jumps, steps = [], []
+    for _ in range(args.samples):
+        position = rng.randrange(pages.total)
+        jumps.append(timed(pages.rows, position, VISIBLE_ROWS)[1])
+        # Scrolling on from there, a page at a time
+        steps.append(timed(pages.rows, position + pages.page_size, VISIBLE_ROWS)[1])
+    report("jump to a random position (key_at + page)", jumps)
+    report("next page after it (keyset)", steps)
+
+    print("search as you type (count + first screen per keystroke)")
+    keystrokes = {"title word": [], "two words": [], "artist": []}
+    for _ in range(args.samples):
+        first, second = rng.sample(WORDS, 2)
+        for kind, text in (("title word", first), ("two words", f"{first} {second}"), ("artist", f"artist {rng.randrange(997)}")):
+            for length in range(1, len(text) + 1):
+                keystrokes[kind].append(timed(new_startup_for, library, text[:length])[1])
+    for kind, samples in keystrokes.items():
+        report(kind, samples)
+    samples = []
+    conn = sqlite3.connect(path)
+    for word in rng.sample(WORDS, 5):
+        samples.append(timed(lambda: conn.execute("SELECT count(DISTINCT song_id) FROM lyrics_lines WHERE text LIKE ?", (f"%{word}%",)).fetchone())[1])
+    report("without the index: LIKE over lyrics_lines", samples)
+
+    print("lyrics preview")
+    report("SongLibrary.lyrics (blob or lines)", [timed(library.lyrics, rng.randint(1, args.songs))[1] for _ in range(args.samples)])
+
+    print("deleting")
+    ids = rng.sample(range(1, args.songs + 1), 5 * args.deletes)
+    old_ids, commit_ids, statement_ids, new_ids, profile_ids = (ids[i * args.deletes:(i + 1) * args.deletes] for i in range(5))
+    _, ms = timed(old_delete, conn, old_ids)
+    print(f"  old: 3 statements and a commit per song              {ms:9.1f} ms for {args.deletes} songs, left behind: {leftovers(conn, old_ids) or 'nothing'}")
+    _, ms = timed(commit_per_song_delete, path, commit_ids)
+    print(f"  a commit per song, cascades and triggers             {ms:9.1f} ms for {args.deletes} songs, left behind: {leftovers(conn, commit_ids) or 'nothing'}")
+    _, ms = timed(statement_per_song_delete, path, statement_ids)
+    print(f"  one transaction, a statement per song                {ms:9.1f} ms for {args.deletes} songs, left behind: {leftovers(conn, statement_ids) or 'nothing'}")
+    deleted, ms = timed(library.delete, new_ids)
+    print(f"  new: one transaction, a statement per {SongLibrary._DELETE_CHUNK} songs     {ms:9.1f} ms for {deleted} songs, left behind: {leftovers(conn, new_ids) or 'nothing'}")
+    conn.close()
+    print(f"  cascade profile for {args.deletes} songs, every table deleted on its own:")
+    for table, per_song_ms, at_once_ms in cascade_profile(path, profile_ids):
+        print(f"    {table:<16} statement per song {per_song_ms:7.1f} ms   one statement {at_once_ms:7.1f} ms")
+
+    ok = check_order(library)
+    print(f"keyset paging through all {SongPages(library).total} songs matches a full sort: {ok}")
+    library.close()
+
+def new_startup_for(library: SongLibrary, query: str) -> list:
+    return SongPages(library, query).rows(0, VISIBLE_ROWS)
+
+if __name__ == "__main__":
+    main()
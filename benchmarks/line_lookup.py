@@ -0,0 +1,70 @@
+"""Microbenchmark for finding the active lyrics line on every display tick.
+
+Compares the old linear scan from index 0 with Song.line_index_at (cursor + bisect)
+on a synthetic word-level karaoke track. Run from the repository root:
+
+    python -m benchmarks.line_lookup --lines 20000
+"""
+import argparse
+import random
+import time
+
+from classes.LyricsLine import LyricsLine
+from classes.Song import Song
+
+def build_song(line_count: int, line_ms: int) -> Song:
+    lines = []
+    for i in range(line_count):
+        start = i * line_ms
+        lines.append(LyricsLine(text=f"word {i}", startMs=start, endMs=start + line_ms, durationMs=line_ms))
+    return Song(lines=lines, title="benchmark", artist="benchmark")
+
+def linear_scan(lines: list, current_time: int) -> int:
+    i = 0
+    while i < len(lines) and lines[i].startMs <= current_time:
+        i += 1
+    return i - 1
+
+def run_ticks(lookup, ticks) -> float:
+    """Returns the mean cost per tick in microseconds."""
+    start = time.perf_counter()
+    lookup(ticks)
+    return (time.perf_counter() - start) / len(ticks) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000, help="number of lines in the synthetic song")
+    parser.add_argument("--line-ms", type=int, default=250, help="duration of each line in milliseconds")
+    parser.add_argument("--tick-ms", type=int, default=50, help="time between display ticks in milliseconds")
+    parser.add_argument("--seeks", type=int, default=2000, help="number of random jump_to_time lookups")
+    args = parser.parse_args()
+
+    song = build_song(args.lines, args.line_ms)
+    ticks = list(range(0, song.durationMs, args.tick_ms))
+    seeks = [random.randrange(song.durationMs) for _ in range(args.seeks)]
+
+    # The old Song kept a plain list of LyricsLine objects
+    lines = list(song.lines)
+
+    def scan_all(times):
+        for t in times:
+            linear_scan(lines, t)
+
+    def cursor_all(times):
+        index = -1
+        for t in times:
+            index = song.line_index_at(t, index)
+
+    def bisect_all(times):
+        for t in times:
+            song.line_index_at(t)
+
+    # The linear scan is quadratic over a whole playback, so only time a sample of it
+    scan_sample = ticks[::max(1, len(ticks) // 2000)]
+    print(f"{args.lines} lines, {len(ticks)} ticks of {args.tick_ms} ms")
+    print(f"linear scan       {run_ticks(scan_all, scan_sample):10.2f} us/tick")
+    print(f"cursor (playback) {run_ticks(cursor_all, ticks):10.2f} us/tick")
+    print(f"bisect (seek)     {run_ticks(bisect_all, seeks):10.2f} us/lookup")
+
+if __name__ == "__main__":
+    main()
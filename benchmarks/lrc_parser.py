@@ -0,0 +1,110 @@
+"""Fuzz test and throughput benchmark for the LRC parser.
+
+Generates a synthetic corpus of plain and enhanced (word-level) LRC files, or reads a
+directory of .lrc files with --corpus, and measures parsing throughput. The fuzz run
+feeds randomly mutated LRC into the parser and checks the invariants of the result.
+Run from the repository root:
+
+    python -m benchmarks.lrc_parser --songs 2000 --fuzz 5000
+"""
+import argparse
+import os
+import random
+import re
+import string
+import time
+
+from classes.LrcParser import parse_lrc
+
+def timestamp(ms: int, digits: int = 2, bracket: str = "[]") -> str:
+    fraction = str(ms % 1000).zfill(3)[:digits]
+    return f"{bracket[0]}{ms // 60000:02d}:{ms // 1000 % 60:02d}.{fraction}{bracket[1]}"
+
+def synthetic_lrc(rng: random.Random, lines: int, enhanced: bool) -> str:
+    out = ["[ti:Synthetic]", "[ar:Benchmark]", f"[offset:{rng.randint(-300, 300)}]"]
+    t = rng.randint(0, 10000)
+    for _ in range(lines):
+        words = ["".join(rng.choices(string.ascii_lowercase + "äöüß", k=rng.randint(2, 8))) for _ in range(rng.randint(2, 9))]
+        if enhanced:
+            parts = []
+            for word in words:
+                parts.append(timestamp(t, bracket="<>") + word)
+                t += rng.randint(100, 600)
+            out.append(timestamp(t - 50, rng.choice((2, 3))) + " ".join(parts))
+        else:
+            out.append(timestamp(t, rng.choice((1, 2, 3))) + " " + " ".join(words))
+            t += rng.randint(1000, 6000)
+    return "\n".join(out)
+
+def legacy_parse(lyrics_text: str) -> int:
+    """The regex the project used before the streaming parser, for comparison."""
+    return len(re.compile(r'\[(\d{2}):(\d{2})\.(\d{2})\] (.+)').findall(lyrics_text))
+
+def mutate(rng: random.Random, text: str) -> str:
+    chars = list(text)
+    for _ in range(rng.randint(1, 20)):
+        position = rng.randrange(len(chars) + 1)
+        action = rng.random()
+        if action < 0.4:
+            chars.insert(position, rng.choice("[]<>:.+-0123456789\n \t\x00é"))
+        elif action < 0.7 and chars:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[position:position] = list(rng.choice(("[99:99.999]", "[offset:abc]", "[length:]", "<00:0", "[00:00]", "[:]")))
+    return "".join(chars)
+
+def check(song) -> None:
+    starts, ends = song.start_times, song.end_times
+    assert len(starts) == len(ends) == len(song.texts)
+    assert all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)), "starts not sorted"
+    assert all(start <= end for start, end in zip(starts, ends)), "line ends before it starts"
+    if song.has_words:
+        assert len(song.word_offsets) == len(starts) + 1
+        assert song.word_offsets[-1] == len(song.word_starts) == len(song.word_texts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=2000, help="synthetic songs per format")
+    parser.add_argument("--lines", type=int, default=60, help="lines per synthetic song")
+    parser.add_argument("--corpus", help="directory with .lrc files to parse instead of the synthetic corpus")
+    parser.add_argument("--fuzz", type=int, default=5000, help="number of mutated inputs to check")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if args.corpus:
+        corpora = {"corpus": []}
+        for root, _, files in os.walk(args.corpus):
+            for name in files:
+                if name.lower().endswith(".lrc"):
+                    with open(os.path.join(root, name), encoding="utf-8-sig", errors="replace") as f:
+                        corpora["corpus"].append(f.read())
+    else:
+        corpora = {
+            "plain": [synthetic_lrc(rng, args.lines, False) for _ in range(args.songs)],
+            "enhanced": [synthetic_lrc(rng, args.lines, True) for _ in range(args.songs)],
+        }
+
+    for name, texts in corpora.items():
+        size = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+        start = time.perf_counter()
+        lines = sum(len(parse_lrc(text).start_times) for text in texts)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        legacy_lines = sum(legacy_parse(text) for text in texts)
+        legacy_elapsed = time.perf_counter() - start
+        print(f"{name:<9} {len(texts)} files, {size:.1f} MB: {size / elapsed:6.1f} MB/s, {lines / elapsed:9.0f} lines/s "
+              f"({lines} lines; legacy regex finds {legacy_lines} in {legacy_elapsed:.2f} s)")
+
+    samples = [text for texts in corpora.values() for text in texts[:50]]
+    for i in range(args.fuzz):
+        text = mutate(rng, rng.choice(samples))
+        try:
+            check(parse_lrc(text, rng.choice((None, 0, 180000))))
+        except Exception:
+            print(f"fuzz input {i} failed:\n{text!r}")
+            raise
+    print(f"fuzz: {args.fuzz} mutated inputs parsed, all invariants hold")
+
+if __name__ == "__main__":
+    main()
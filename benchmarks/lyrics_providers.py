@@ -0,0 +1,184 @@
+"""Checks LyricsProviderEngine against stub providers: scoring, early return, timeouts, errors and cancellation.
+
+The stub providers answer with scripted LRC texts after a scripted delay, raise, or hang, and note when they
+were called, whether they saw the 'cancelled' event and when they returned. Each scenario uses a fresh engine:
+
+  scoring           well synced lyrics that cover the song score higher than few lines, repeated timestamps,
+                    lines past the end of the song or an unknown duration; word timings add a little
+  best result       without a good enough answer the engine waits for every provider and returns the best one
+  early return      a good enough answer returns at once and sets 'cancelled' for the providers still running
+  cancellation      a provider that watches 'cancelled' stops right after the early return
+  timeouts          a provider that hangs is given up after its own timeout and reported as failed,
+                    a fast provider's lyrics are still returned
+  errors            a provider that raises is reported as failed without hiding the others
+  abstract          a provider without fetch_lrc() cannot be created
+  close             LyricsManager.close() shuts down the engine's threads
+
+Exits with status 1 if a check fails. Run from the repository root:
+
+    python -m benchmarks.lyrics_providers
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from classes.LrcParser import parse_lrc
+from classes.LyricsManager import LyricsManager
+from classes.LyricsProviders import LyricsProvider, LyricsProviderEngine
+
+DURATION_MS = 180000
+
+def lrc(lines: int, last_ms: int = 170000, repeat: int = 1, words: bool = False) -> str:
+    """LRC text with 'lines' lines spread up to 'last_ms', every timestamp used 'repeat' times."""
+    text = []
+    for i in range(lines):
+        ms = last_ms * (i // repeat) * repeat // max(1, lines - 1)
+        stamp = f"{ms // 60000:02d}:{ms // 1000 % 60:02d}.{ms % 1000 // 10:02d}"
+        words_text = f"<{stamp}>line <{stamp}>{i}" if words else f"line {i}"
+        text.append(f"[{stamp}]{words_text}")
+    return "\n".join(text)
+
+GOOD = lrc(40)
+# Below the default good_enough of 0.8: the lyrics end a quarter into the song
+OK = lrc(40, last_ms=45000)
+POOR = lrc(4, last_ms=60000)
+
+class StubProvider(LyricsProvider):
+    """Answers 'text' after 'delay' seconds. 'raises' is raised instead; with 'watches_cancel' the wait ends early once 'cancelled' is set."""
+    def __init__(self, name: str, text: str = None, delay: float = 0.0, timeout: float = 2.0, raises: Exception = None, watches_cancel: bool = True):
+        self.name = name
+        self.text = text
+        self.delay = delay
+        self.timeout = timeout
+        self.raises = raises
+        self.watches_cancel = watches_cancel
+        self.called_at = None
+        self.returned_at = None
+        self.saw_cancel = False
+
+    def fetch_lrc(self, title, main_artist, duration_ms, cancelled):
+        self.called_at = time.monotonic()
+        try:
+            if self.watches_cancel:
+                self.saw_cancel = cancelled.wait(self.delay)
+                if self.saw_cancel:
+                    return None
+            else:
+                time.sleep(self.delay)
+            if self.raises is not None:
+                raise self.raises
+            return self.text
+        finally:
+            self.returned_at = time.monotonic()
+
+def timed_search(engine: LyricsProviderEngine) -> tuple:
+    started = time.monotonic()
+    best, failed = engine.search_with_failures("Song", "Artist", DURATION_MS)
+    return best, failed, time.monotonic() - started
+
+def check_scoring() -> list:
+    def score(text: str, duration_ms: int = DURATION_MS) -> float:
+        return LyricsProviderEngine.score(parse_lrc(text, duration_ms), duration_ms)
+
+    good, few, repeated, too_long, unknown, words = score(GOOD), score(POOR), score(lrc(40, repeat=4)), score(lrc(40, last_ms=200000)), score(GOOD, 0), score(lrc(8, words=True))
+    half, lines = score(OK), score(lrc(8))
+    return [
+        (f"scoring: well synced {good:.2f} > few lines {few:.2f}, repeated timestamps {repeated:.2f}, past the end {too_long:.2f}, unknown duration {unknown:.2f}",
+         good > max(few, repeated, too_long, unknown) and good >= 0.8 > max(few, repeated, too_long, unknown)),
+        (f"scoring: lyrics ending a quarter in {half:.2f} between past the end {too_long:.2f} and well synced {good:.2f}", too_long < half < good),
+        (f"scoring: word timings {words:.2f} > line timings {lines:.2f}, never above 1", lines < words <= 1.0),
+        (f"scoring: no lines {LyricsProviderEngine.score(parse_lrc('', DURATION_MS), DURATION_MS):.2f}", LyricsProviderEngine.score(parse_lrc("", DURATION_MS), DURATION_MS) == 0.0),
+    ]
+
+def check_best_result(delay: float) -> list:
+    providers = [StubProvider("poor", POOR, delay=delay / 2), StubProvider("ok", OK, delay=delay), StubProvider("none", None, delay=delay / 3)]
+    engine = LyricsProviderEngine(providers, good_enough=0.8)
+    best, failed, elapsed = timed_search(engine)
+    engine.shutdown()
+    return [(f"best result: {best.provider if best else None} ({best.score if best else 0:.2f}) after waiting {elapsed:.2f} s for all {len(providers)}, failed {failed}",
+             best is not None and best.provider == "ok" and not failed and elapsed >= delay)]
+
+def check_early_return(delay: float) -> list:
+    fast, slow, stubborn = StubProvider("fast", GOOD, delay=delay / 10), StubProvider("slow", OK, delay=delay * 10), StubProvider("stubborn", OK, delay=delay * 2, watches_cancel=False)
+    engine = LyricsProviderEngine([fast, slow, stubborn], good_enough=0.8)
+    best, failed, elapsed = timed_search(engine)
+    returned = time.monotonic()
+    # Let the provider that watches 'cancelled' notice it
+    time.sleep(delay / 2)
+    engine.shutdown()
+    stopped_after = slow.returned_at - returned if slow.returned_at else float("inf")
+    return [
+        (f"early return: {best.provider if best else None} ({best.score if best else 0:.2f}) in {elapsed:.2f} s without waiting for the slow providers, failed {failed}",
+         best is not None and best.provider == "fast" and elapsed < delay and not failed),
+        (f"cancellation: the slow provider saw 'cancelled' and returned {stopped_after * 1000:.0f} ms after the search", slow.saw_cancel and stopped_after < delay / 2),
+    ]
+
+def check_timeouts(delay: float) -> list:
+    fast, hanging = StubProvider("fast", OK, delay=delay / 10), StubProvider("hanging", GOOD, delay=delay * 4, timeout=delay, watches_cancel=False)
+    engine = LyricsProviderEngine([fast, hanging], good_enough=0.8)
+    best, failed, elapsed = timed_search(engine)
+    engine.shutdown()
+    rows = [(f"timeouts: gave up on the hanging provider after {elapsed:.2f} s (timeout {delay:g} s), returned {best.provider if best else None}, failed {failed}",
+             best is not None and best.provider == "fast" and failed == ["hanging"] and delay <= elapsed < delay * 2)]
+
+    nothing = LyricsProviderEngine([StubProvider("hanging", GOOD, delay=delay * 4, timeout=delay / 2, watches_cancel=False)])
+    best, failed, elapsed = timed_search(nothing)
+    nothing.shutdown()
+    rows.append((f"timeouts: a single hanging provider -> {best} after {elapsed:.2f} s, failed {failed}", best is None and failed == ["hanging"] and elapsed < delay))
+    return rows
+
+def check_errors(delay: float) -> list:
+    engine = LyricsProviderEngine([StubProvider("broken", delay=delay / 10, raises=ConnectionError("stand-in error")), StubProvider("ok", OK, delay=delay / 5)])
+    best, failed, elapsed = timed_search(engine)
+    engine.shutdown()
+    return [(f"errors: {best.provider if best else None} returned despite a failing provider, failed {failed}", best is not None and best.provider == "ok" and failed == ["broken"])]
+
+def check_abstract() -> list:
+    class Incomplete(LyricsProvider):
+        name = "incomplete"
+
+    try:
+        Incomplete()
+        created = True
+    except TypeError:
+        created = False
+    return [(f"abstract: a provider without fetch_lrc() {'was' if created else 'cannot be'} created", not created)]
+
+def check_close() -> list:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = LyricsManager("", "", "", db_path=os.path.join(tmp, "lyrics.db"), providers=[StubProvider("fast", GOOD)], token_cache_path=os.path.join(tmp, "token.json"))
+        manager.close()
+        try:
+            manager.lyrics_engine.executor.submit(time.sleep, 0)
+            shut_down = False
+        except RuntimeError:
+            shut_down = True
+    return [(f"close: LyricsManager.close() {'shut down' if shut_down else 'did not shut down'} the provider threads", shut_down)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.5, help="base delay of the slow stub providers in seconds")
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    rows = []
+    rows += check_scoring()
+    rows += check_best_result(args.delay)
+    rows += check_early_return(args.delay)
+    rows += check_timeouts(args.delay)
+    rows += check_errors(args.delay)
+    rows += check_abstract()
+    rows += check_close()
+
+    failed = 0
+    for text, ok in rows:
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {text}")
+    print(f"{len(rows) - failed} of {len(rows)} checks passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Overhead of the metrics instrumentation, and a check of the metrics endpoint.
+
+Times METRICS.inc, observe and span per call with the metrics off (as they are unless the app runs
+with --metrics-port) and on, then replays a synthetic song through LyricsPlayer on a
+RecordingBackend, as benchmarks.display_replay does, and compares the CPU time per scheduler
+tick with the metrics off and on. Finally starts a MetricsServer on a free port, fetches
+/metrics and /metrics.json and profiles a busy loop through /profile/start and /profile/stop,
+with cProfile switched on the loop's own thread like the overlay does with root.after. Checks that a bad
+?sort or ?limit is answered with 400 and leaves the profiler running, that of two concurrent starts only one
+enables a profile, and that a start whose thread answers too late can be followed by another one.
+Run from the repository root:
+
+    python -m benchmarks.metrics --calls 200000 --lines 400
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import queue
+import random
+import statistics
+import threading
+import time
+import timeit
+import urllib.error
+import urllib.request
+
+from benchmarks.display_replay import build_song
+from classes.DisplayBackend import RecordingBackend
+from classes.LyricsPlayer import LyricsPlayer
+from classes.LyricsResolver import LookupResult, LyricsResolver
+from classes.Metrics import METRICS
+from classes.MetricsServer import MetricsServer, Profiler
+from classes.VirtualClock import VirtualClock
+
+def per_call_ns(statement, calls: int) -> float:
+    return min(timeit.repeat(statement, number=calls, repeat=5)) / calls * 1e9
+
+def time_calls(calls: int) -> None:
+    def span():
+        with METRICS.span("benchmark", trace=False):
+            pass
+    statements = {
+        "inc": lambda: METRICS.inc("benchmark_total", kind="a"),
+        "observe": lambda: METRICS.observe("benchmark_ms", 1.5, kind="a"),
+        "span": span,
+        "(empty call)": lambda: None,
+    }
+    print(f"{'call':<14} {'off ns':>8} {'on ns':>8}")
+    for name, statement in statements.items():
+        METRICS.disable()
+        off = per_call_ns(statement, calls)
+        METRICS.enable()
+        on = per_call_ns(statement, calls)
+        print(f"{name:<14} {off:>8.0f} {on:>8.0f}")
+    METRICS.disable()
+    METRICS.reset()
+
+def replay_tick_us(song, speed: float) -> list:
+    clock = VirtualClock(start=1000.0)
+    backend = RecordingBackend(clock)
+    player = LyricsPlayer(song, backend, speed=speed, clock=clock)
+    player.start_lyrics(clock())
+    ticks = []
+    while True:
+        t0 = time.perf_counter_ns()
+        if not backend.run_next():
+            break
+        ticks.append((time.perf_counter_ns() - t0) / 1000)
+    return ticks
+
+def time_replay(song, speed: float, rounds: int) -> None:
+    print(f"replay at {speed:g}x, CPU per tick")
+    for enabled in (False, True, False, True):
+        METRICS.enabled = enabled
+        ticks = [tick for _ in range(rounds) for tick in replay_tick_us(song, speed)]
+        print(f"  metrics {'on ' if enabled else 'off'}  mean {statistics.fmean(ticks):6.2f} us   median {statistics.median(ticks):6.2f} us   ({len(ticks)} ticks)")
+    snapshot = METRICS.snapshot()
+    late = next((h for h in snapshot["histograms"] if h["name"] == "lyrics_line_late_ms"), None)
+    if late:
+        print(f"  lyrics_line_late_ms: {late['count']} lines, p50 {late['p50']:.3f} ms, p99 {late['p99']:.3f} ms")
+    METRICS.disable()
+
+def fetch(url: str) -> str:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read().decode("utf-8")
+
+def fetch_status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def check_profiler_start() -> dict:
+    """Concurrent starts, and a start whose thread does not answer in time."""
+    # The main loop runs the queued calls only while 'go' is set, like a Tk thread that is busy otherwise
+    calls, go, stop = queue.Queue(), threading.Event(), threading.Event()
+
+    def main_loop():
+        while not stop.is_set():
+            if not go.wait(0.001):
+                continue
+            try:
+                calls.get(timeout=0.001)()
+            except queue.Empty:
+                pass
+
+    loop = threading.Thread(target=main_loop, name="main-loop")
+    loop.start()
+    profiler = Profiler(run_on_thread=calls.put)
+    results = []
+    starters = [threading.Thread(target=lambda: results.append(profiler.start())) for _ in range(2)]
+    for thread in starters:
+        thread.start()
+    # Both starts are waiting for the loop; only one of them may have queued an enable
+    time.sleep(0.05)
+    pending = calls.qsize()
+    go.set()
+    for thread in starters:
+        thread.join()
+    one_started = pending == 1 and sorted(results) == [False, True] and profiler.stop() is not None
+
+    # A start that times out: the loop runs the late enable and the disable queued behind it, a new start works
+    go.clear()
+    time.sleep(0.01)
+    stuck = Profiler(run_on_thread=calls.put, timeout=0.05)
+    try:
+        stuck.start()
+        timed_out = False
+    except concurrent.futures.TimeoutError:
+        timed_out = True
+    queued = calls.qsize()
+    go.set()
+    restarted = not stuck.is_running and stuck.start() and stuck.stop() is not None
+    stop.set()
+    loop.join()
+    return {
+        "one of two starts": one_started,
+        "start after a timeout": timed_out and queued == 2 and restarted,
+    }
+
+def check_server() -> bool:
+    # The profiled "main loop": runs busy work and the functions the profiler hands it, like Tk runs after() callbacks
+    calls, stop = queue.Queue(), threading.Event()
+
+    def main_loop():
+        while not stop.is_set():
+            sum(i * i for i in range(2000))
+            try:
+                calls.get(timeout=0.001)()
+            except queue.Empty:
+                pass
+
+    loop = threading.Thread(target=main_loop, name="main-loop")
+    loop.start()
+    server = MetricsServer(0, profiler=Profiler(run_on_thread=calls.put))
+    server.start()
+    try:
+        METRICS.inc("lyrics_lookups_total", tier="memory")
+        METRICS.observe("lyrics_lookup_ms", 0.2, tier="memory")
+        LyricsResolver._record(LookupResult(None, LyricsResolver.TIER_NEGATIVE, {LyricsResolver.TIER_MEMORY: 0.01, LyricsResolver.TIER_DATABASE: 0.3,
+                                                                                 LyricsResolver.TIER_FUZZY: 1.5, LyricsResolver.TIER_NEGATIVE: 0.1}))
+        with METRICS.span("spotify.search"):
+            time.sleep(0.01)
+        text = fetch(server.url + "/metrics")
+        snapshot = json.loads(fetch(server.url + "/metrics.json"))
+        started = fetch(server.url + "/profile/start")
+        time.sleep(0.3)
+        bad_sort = fetch_status(server.url + "/profile/stop?sort=bogus")
+        bad_limit = fetch_status(server.url + "/profile/stop?limit=abc")
+        still_running = server.profiler.is_running
+        report = fetch(server.url + "/profile/stop?sort=tottime&limit=5")
+    finally:
+        server.stop()
+        stop.set()
+        loop.join()
+    checks = {
+        "prometheus counter": 'lyrics_lookups_total{tier="memory"} 1' in text,
+        "prometheus help": "# HELP lyrics_lookup_ms" in text,
+        "prometheus histogram": 'span_ms_bucket{span="spotify.search",le="20"} 1' in text,
+        "time per lookup tier": all(f'lyrics_tier_ms_count{{tier="{tier}"}} 1' in text for tier in ("memory", "database", "fuzzy", "negative")),
+        "json trace": any(trace["span"] == "spotify.search" for trace in snapshot["traces"]),
+        "profiler started": started == "profiling\n",
+        "profile of the main loop": "<genexpr>" in report,
+        "bad sort and limit: 400": bad_sort == 400 and bad_limit == 400 and still_running,
+        "off after stop": not METRICS.enabled,
+    }
+    checks.update(check_profiler_start())
+    for name, ok in checks.items():
+        print(f"  {name:<26} {'ok' if ok else 'FAILED'}")
+    return all(checks.values())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000, help="calls per timing of inc, observe and span")
+    parser.add_argument("--lines", type=int, default=400, help="number of lines in the synthetic song")
+    parser.add_argument("--speed", type=float, default=10)
+    parser.add_argument("--rounds", type=int, default=5, help="replays per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    time_calls(args.calls)
+    time_replay(build_song(random.Random(args.seed), args.lines, words=True), args.speed, args.rounds)
+    print("metrics server")
+    print("all checks passed" if check_server() else "some checks FAILED")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Startup benchmark: time from process start to the first frame of the overlay.
+
+Starts a fresh Python process per run, which imports the overlay app, creates it with a temporary
+database and dummy Spotify credentials (nothing is looked up) and draws the first frame with
+root.update(). Without a display the Tk window cannot be created; the run then measures the same
+path up to a first line drawn by LyricsPlayer on a RecordingBackend. Reports the median time of
+every step from the moment the process was spawned, and which of the heavy network libraries
+were imported before the first frame. --eager imports them up front first, like the app used to.
+Run from the repository root:
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --runs 10 --eager
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ("requests", "spotipy", "syncedlyrics")
+
+# Runs in the child process; prints one JSON object with time.time() of every step
+CHILD = r"""
+import json, os, sys, time
+marks = {"interpreter": time.time()}
+if "--eager" in sys.argv:
+    for module in %(heavy)r:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    marks["eager imports"] = time.time()
+from classes.GameAdapters import BeatSaberAdapter
+from classes.LyricsOverlayApp import LyricsOverlayApp
+marks["imports"] = time.time()
+tmp = sys.argv[1]
+mode = "tk"
+try:
+    app = LyricsOverlayApp([BeatSaberAdapter("ws://127.0.0.1:9/")], wait_for_window=False, secrets_path=os.path.join(tmp, "secrets.json"), db_path=os.path.join(tmp, "lyrics.db"))
+    marks["app created"] = time.time()
+    app.root.update()
+    marks["first frame"] = time.time()
+    app.lyrics_resolver.shutdown()
+    app.lyrics_manager.close()
+    app.root.destroy()
+except Exception as e:
+    if type(e).__name__ != "TclError":
+        raise
+    # No display: the same setup without the window
+    mode = "headless"
+    from classes.DisplayBackend import RecordingBackend
+    from classes.LyricsManager import LyricsManager
+    from classes.LyricsPlayer import LyricsPlayer
+    from classes.LyricsResolver import LyricsResolver
+    from classes.Song import Song
+    from classes.VirtualClock import VirtualClock
+    manager = LyricsManager("id", "secret", "", db_path=os.path.join(tmp, "lyrics.db"))
+    resolver = LyricsResolver(manager)
+    marks["app created"] = time.time()
+    clock = VirtualClock()
+    player = LyricsPlayer(Song.from_arrays([0], [1000], ["first line"]), RecordingBackend(clock), clock=clock)
+    player.start_lyrics()
+    marks["first frame"] = time.time()
+    resolver.shutdown()
+    manager.close()
+print(json.dumps({"mode": mode, "marks": marks, "heavy": [m for m in %(heavy)r if m in sys.modules]}))
+""" % {"heavy": HEAVY_MODULES}
+
+def run_once(tmp: str, eager: bool) -> dict:
+    args = [sys.executable, "-c", CHILD, tmp] + (["--eager"] if eager else [])
+    spawned = time.time()
+    output = subprocess.run(args, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["steps_ms"] = {step: (at - spawned) * 1000 for step, at in result["marks"].items()}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--eager", action="store_true", help="import requests, spotipy and syncedlyrics before the app, like it used to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "secrets.json"), "w") as f:
+            json.dump({"spotify_client_id": "id", "spotify_client_secret": "secret", "spotify_dc_cookie": ""}, f)
+        # The first run also creates the database, it is not counted
+        run_once(tmp, args.eager)
+        results = [run_once(tmp, args.eager) for _ in range(args.runs)]
+
+    print(f"{args.runs} runs, {results[0]['mode']}{', eager imports' if args.eager else ''}; ms since the process was spawned (median, min, max)")
+    for step in results[0]["steps_ms"]:
+        values = [result["steps_ms"][step] for result in results]
+        print(f"  {step:15} {statistics.median(values):7.1f} {min(values):7.1f} {max(values):7.1f}")
+    heavy = results[0]["heavy"]
+    print(f"network libraries imported before the first frame: {', '.join(heavy) if heavy else 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark of Timer.get_time(): cost per call, allocations and accuracy.
+
+Overhead: calls get_time() in a loop on the real clock (time.perf_counter_ns) while running,
+paused and after many speed changes, and reports ns per call and the memory blocks left behind.
+Accuracy: drives a Timer on a nanosecond test clock through random speed changes, pauses,
+unpauses and seeks, and compares its position with an exact rational reference after every
+step, in ns and in the ms that get_time() returns. The same sequence is replayed with the
+formula of the float-seconds timer this one replaced, to show what the integer segments gain. Run from the repository root:
+
+    python -m benchmarks.timer --calls 1000000 --steps 20000
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from fractions import Fraction
+
+from classes.Timer import NS_PER_MS, Timer
+
+class TestClock:
+    """A clock in integer nanoseconds that only moves when told to."""
+    def __init__(self, start_ns: int):
+        self.now_ns = start_ns
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+def overhead(calls: int, state: str) -> tuple:
+    """Returns (ns per get_time() call, memory blocks still allocated after the calls)."""
+    timer = Timer()
+    timer.start()
+    if state == "paused":
+        timer.pause()
+    elif state == "speed changes":
+        for i in range(1000):
+            timer.set_speed(1 + (i % 7) / 10)
+    get_time = timer.get_time
+    for _ in range(1000):
+        get_time()
+    blocks_before = sys.getallocatedblocks()
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        get_time()
+    elapsed = time.perf_counter_ns() - started
+    blocks = sys.getallocatedblocks() - blocks_before
+
+    # The empty loop is not part of the cost of a call
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        pass
+    loop = time.perf_counter_ns() - started
+    return (elapsed - loop) / calls, blocks
+
+def peak_bytes(calls: int) -> int:
+    """Largest amount of memory that get_time() held at once over the calls, as traced by tracemalloc."""
+    timer = Timer()
+    timer.start()
+    get_time = timer.get_time
+    get_time()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        get_time()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peak
+
+def accuracy(steps: int, seed: int) -> dict:
+    """Max deviation in ns, and how often the ms were wrong, of the timer and of the float-seconds formula over a random sequence of operations."""
+    rng = random.Random(seed)
+    # Start far from 0, like perf_counter after some uptime, where floats have the least precision left
+    clock = TestClock(rng.randint(10 ** 14, 10 ** 15))
+    timer = Timer(clock_ns=clock)
+    timer.start()
+    # Exact reference and the old float formula: position at the start of the current segment, speed, paused
+    exact_start, exact_position, speed, paused = clock.now_ns, Fraction(0), Fraction(1), False
+    float_start_s, float_paused_s, float_pause_at_s, float_speed = clock.now_ns / 1e9, 0.0, None, 1.0
+    float_offset_ms = 0.0
+    max_error_ns = max_float_error_ns = 0
+    wrong_ms = float_wrong_ms = 0
+    operations = {"speed": 0, "pause": 0, "unpause": 0, "seek": 0, "query": 0}
+
+    def exact_now() -> Fraction:
+        return exact_position + (0 if paused else (clock.now_ns - exact_start) * speed)
+
+    def float_now_ms() -> float:
+        now_s = float_pause_at_s if float_pause_at_s is not None else clock.now_ns / 1e9
+        return (now_s - float_start_s - float_paused_s) * float_speed * 1000 + float_offset_ms
+
+    for _ in range(steps):
+        # Whole milliseconds half of the time, like the VirtualClock of the replay benchmarks
+        clock.now_ns += rng.randint(1, 50) * NS_PER_MS if rng.random() < 0.5 else rng.randint(1, 50_000_000)
+        operation = rng.choice(("speed", "speed", "pause", "unpause", "seek", "query", "query"))
+        if operation == "speed":
+            new_speed = rng.choice((0.5, 0.75, 0.85, 1.0, 1.2, 1.5, 1.03125, 0.96875))
+            # The speed that was meant, 6/5 for 1.2, not the binary fraction closest to it
+            exact_position, exact_start, speed = exact_now(), clock.now_ns, Fraction(str(new_speed))
+            timer.set_speed(new_speed)
+            # The old timer kept the position by moving its start, at float precision
+            float_position_ms = float_now_ms()
+            float_speed = new_speed
+            float_start_s, float_paused_s, float_offset_ms = (float_pause_at_s or clock.now_ns / 1e9), 0.0, float_position_ms
+        elif operation == "pause" and not paused:
+            exact_position, exact_start, paused = exact_now(), clock.now_ns, True
+            timer.pause()
+            float_pause_at_s = clock.now_ns / 1e9
+        elif operation == "unpause" and paused:
+            exact_start, paused = clock.now_ns, False
+            timer.unpause()
+            float_paused_s += clock.now_ns / 1e9 - float_pause_at_s
+            float_pause_at_s = None
+        elif operation == "seek":
+            position_ms = rng.randint(0, 600_000)
+            exact_position, exact_start = Fraction(position_ms * NS_PER_MS), clock.now_ns
+            timer.set_time(position_ms)
+            float_start_s, float_paused_s, float_offset_ms = (float_pause_at_s or clock.now_ns / 1e9), 0.0, position_ms
+        elif operation != "query":
+            continue
+        operations[operation] += 1
+        exact = exact_now()
+        max_error_ns = max(max_error_ns, abs(timer.get_time_ns() - exact))
+        max_float_error_ns = max(max_float_error_ns, abs(float_now_ms() * NS_PER_MS - exact))
+        exact_ms = exact // NS_PER_MS
+        wrong_ms += timer.get_time() != exact_ms
+        # The old get_time() truncated the float milliseconds
+        float_wrong_ms += int(float_now_ms()) != exact_ms
+    checks = sum(operations.values())
+    return {"max_error_ns": float(max_error_ns), "max_float_error_ns": float(max_float_error_ns), "wrong_ms": wrong_ms, "float_wrong_ms": float_wrong_ms, "checks": checks, "operations": operations}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1_000_000, help="get_time() calls per overhead measurement")
+    parser.add_argument("--steps", type=int, default=20_000, help="random operations in the accuracy run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print("get_time() overhead")
+    for state in ("running", "paused", "speed changes"):
+        ns, blocks = overhead(args.calls, state)
+        print(f"  {state:14} {ns:6.1f} ns/call, {blocks:+d} blocks after {args.calls} calls")
+    print(f"  peak traced memory during {min(args.calls, 100_000)} calls: {peak_bytes(min(args.calls, 100_000))} bytes")
+
+    result = accuracy(args.steps, args.seed)
+    operations = ", ".join(f"{count} {name}" for name, count in result["operations"].items())
+    print(f"accuracy over {args.steps} steps ({operations})")
+    print(f"  Timer:                 max error {result['max_error_ns']:.2f} ns, wrong ms in {result['wrong_ms']} of {result['checks']} checks")
+    print(f"  float seconds formula: max error {result['max_float_error_ns']:.2f} ns, wrong ms in {result['float_wrong_ms']} of {result['checks']} checks")
+
+if __name__ == "__main__":
+    main()
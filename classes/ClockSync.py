@@ -0,0 +1,110 @@
+import collections
+import logging
+import time
+from typing import Callable
+
+from classes.Metrics import METRICS
+from classes.Timer import Timer
+
+class ClockSync:
+    """Keeps a Timer in step with the game clock. Feed it the play time reported by the game; it estimates offset and drift with a linear regression over the last samples and slews the timer towards the game by adjusting its speed. Only errors above jump_threshold_ms (e.g. after a seek) move the timer directly.
+    """
+    def __init__(self, timer: Timer, window: int = 20, slew_ms: int = 2000, max_slew: float = 0.05, jump_threshold_ms: int = 1000, clock: Callable[[], float] = time.perf_counter):
+        self.timer = timer
+        self.clock = clock
+        self.base_speed = timer.speed
+        self.window = window
+        self.slew_ms = slew_ms
+        self.max_slew = max_slew
+        self.jump_threshold_ms = jump_threshold_ms
+        # The last samples whose slope is taken as the new speed of the game when it is further than max_slew from base_speed
+        self.speed_change_samples = 5
+        # (local time in ms, game time in ms) pairs
+        self.samples = collections.deque(maxlen=window)
+        self.logger = logging.getLogger(__name__)
+
+    def reset(self) -> None:
+        """Forgets the samples and the slew, e.g. after a pause or a seek: they describe a timeline that no longer holds."""
+        self.samples.clear()
+        self.timer.set_speed(self.base_speed)
+
+    def set_base_speed(self, speed: float) -> None:
+        """Sets the nominal speed of the game (e.g. a speed modifier). The samples taken at the old speed are dropped."""
+        self.base_speed = speed
+        self.samples.clear()
+
+    def _fit(self, samples=None, clamp: bool = True) -> tuple:
+        """Returns (intercept, slope) of game time over local time, both in ms, for 'samples' (default: all of them). The slope is kept within max_slew of the base speed, unless 'clamp' is False."""
+        samples = self.samples if samples is None else samples
+        base_t, base_g = samples[0]
+        if len(samples) < 2:
+            return base_g - base_t * self.base_speed, self.base_speed
+        n = len(samples)
+        mean_t = sum(t - base_t for t, _ in samples) / n
+        mean_g = sum(g - base_g for _, g in samples) / n
+        var_t = sum((t - base_t - mean_t) ** 2 for t, _ in samples)
+        if var_t == 0:
+            slope = self.base_speed
+        else:
+            cov = sum((t - base_t - mean_t) * (g - base_g - mean_g) for t, g in samples)
+            slope = cov / var_t
+        # A fit over a few noisy samples can be far off, the game never runs faster or slower than this
+        if clamp:
+            slope = min(max(slope, self.base_speed * (1 - self.max_slew)), self.base_speed * (1 + self.max_slew))
+        intercept = (base_g + mean_g) - slope * (base_t + mean_t)
+        return intercept, slope
+
+    def add_sample(self, game_ms: int, received_at: float = None) -> bool:
+        """Adds a play time sample from the game.
+
+        Args:
+            game_ms (int): The play time reported by the game in milliseconds.
+            received_at (float, optional): Time of the clock (time.perf_counter() by default) when the sample was received. Defaults to now.
+
+        Returns:
+            bool: True if the timer was moved or its speed changed, so scheduled line changes have to be recomputed.
+        """
+        if not self.timer.is_running:
+            return False
+        now_ms = self.clock() * 1000
+        t = received_at * 1000 if received_at is not None else now_ms
+
+        if self.samples:
+            intercept, slope = self._fit()
+            if abs(intercept + slope * t - game_ms) > self.jump_threshold_ms:
+                # The game jumped (seek or restart), the old samples describe a different timeline
+                self.samples.clear()
+        self.samples.append((t, game_ms))
+
+        speed_changed = False
+        if len(self.samples) >= self.speed_change_samples:
+            recent = list(self.samples)[-self.speed_change_samples:]
+            _, measured = self._fit(recent, clamp=False)
+            if measured > 0 and abs(measured - self.base_speed) > self.max_slew * self.base_speed:
+                # More than drift: the game changed its speed (a speed modifier) without telling us, the older samples are from before that
+                self.logger.info(f"add_sample: the game runs at {measured:.3f}x instead of {self.base_speed:.3f}x")
+                self.base_speed = measured
+                self.samples = collections.deque(recent, maxlen=self.window)
+                speed_changed = True
+
+        intercept, slope = self._fit()
+        game_now = intercept + slope * now_ms
+        error = game_now - self.timer.get_time()
+        METRICS.observe("game_clock_error_ms", abs(error))
+
+        if abs(error) > self.jump_threshold_ms or speed_changed:
+            # Slewing would take long to catch up with a new speed, the lyrics jump right away
+            self.logger.info(f"add_sample: lyrics are {error:.0f} ms off, jumping to {game_now:.0f} ms")
+            METRICS.inc("game_clock_jumps_total")
+            self.timer.set_time(int(game_now))
+            self.timer.set_speed(slope)
+            return True
+
+        # Run slightly faster or slower so the error is gone after slew_ms
+        speed = slope + error / self.slew_ms
+        speed = min(max(speed, self.base_speed * (1 - self.max_slew)), self.base_speed * (1 + self.max_slew))
+        if abs(speed - self.timer.speed) < 1e-4:
+            return False
+        self.logger.debug(f"add_sample: error {error:.1f} ms, drift {slope:.4f}, slewing at speed {speed:.4f}")
+        self.timer.set_speed(speed)
+        return True
@@ -0,0 +1,275 @@
+import logging
+import re
+import sqlite3
+import unicodedata
+from typing import Callable, Iterable, List, Tuple
+
+from classes import LyricsBlob
+
+logger = logging.getLogger(__name__)
+
+# The query normalization of QueryNormalizer as each migration knew it. A migration has to produce the same keys
+# whenever it runs, also after QueryNormalizer changed again, so it never uses the live functions.
+_whitespace = re.compile(r"\s+")
+
+def _query_key_v2(title: str, main_artist: str) -> str:
+    """Casefolded title and artist with collapsed whitespace."""
+    def normalize(text: str) -> str:
+        return _whitespace.sub(" ", (text or "").casefold()).strip()
+    return normalize(title) + "\x1f" + normalize(main_artist)
+
+# Version 5: QueryNormalizer as it was when the key function changed to ignore decorations
+_brackets_v5 = re.compile(r"[\(\[\{][^\)\]\}]*[\)\]\}]")
+_dash_suffix_v5 = re.compile(r"\s+[-–—]\s+.*$")
+_featuring_v5 = re.compile(r"\s+(?:feat|ft|featuring|prod)\b\.?.*$")
+_artist_separators_v5 = re.compile(r"\s*(?:,|&|;)\s*")
+_punctuation_v5 = re.compile(r"[^\w\s]")
+
+def _normalize_v5(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _whitespace.sub(" ", text.casefold()).strip()
+
+def _normalize_title_v5(title: str) -> str:
+    text = _normalize_v5(title)
+    text = _brackets_v5.sub(" ", text)
+    text = _dash_suffix_v5.sub("", text)
+    text = _featuring_v5.sub("", text)
+    text = _punctuation_v5.sub(" ", text)
+    return _whitespace.sub(" ", text).strip() or _normalize_v5(title)
+
+def _normalize_artist_v5(artist: str) -> str:
+    text = _normalize_v5(artist)
+    text = _brackets_v5.sub(" ", text)
+    text = _featuring_v5.sub("", text)
+    text = _artist_separators_v5.split(text, maxsplit=1)[0]
+    text = _punctuation_v5.sub(" ", text)
+    return _whitespace.sub(" ", text).strip() or _normalize_v5(artist)
+
+def _query_key_v5(title: str, main_artist: str) -> str:
+    return _normalize_title_v5(title) + "\x1f" + _normalize_artist_v5(main_artist)
+
+def _first_per_key(rows: Iterable[tuple], key: Callable[[str, str], str], migration: str) -> Tuple[List[tuple], List[int]]:
+    """
+    Keys (id, title, artist, song_id) rows that are sorted by id. Returns (id, title, artist, song_id, key) of the first row of every key
+    and the ids of the later rows that share a key with it. Every collision is logged, so no query disappears unnoticed.
+    """
+    first = {}
+    kept, dropped = [], []
+    for id, title, artist, song_id in rows:
+        row_key = key(title, artist)
+        if row_key in first:
+            kept_id, kept_title, kept_artist, kept_song_id = first[row_key]
+            logger.warning(f"{migration}: query {title} - {artist} (song {song_id}) has the same key as the older {kept_title} - {kept_artist} (song {kept_song_id})")
+            dropped.append(id)
+        else:
+            first[row_key] = (id, title, artist, song_id)
+            kept.append((id, title, artist, song_id, row_key))
+    return kept, dropped
+
+def _initial_schema(cursor: sqlite3.Cursor) -> None:
+    """Version 1: the tables as they were before the database was versioned."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS songs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            artist TEXT,
+            cover_link TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lyrics_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            song_id INTEGER,
+            text TEXT,
+            startMs INTEGER,
+            endMs INTEGER,
+            durationMs INTEGER,
+            FOREIGN KEY(song_id) REFERENCES songs(id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS querys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query_title TEXT,
+            query_main_artist TEXT,
+            song_id INTEGER,
+            FOREIGN KEY(song_id) REFERENCES songs(id)
+        )
+    ''')
+
+def _indexes_and_cascades(cursor: sqlite3.Cursor) -> None:
+    """Version 2: cascading foreign keys, a unique normalized query key and indexes for every lookup."""
+    cursor.execute('''
+        CREATE TABLE lyrics_lines_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            song_id INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE,
+            text TEXT,
+            startMs INTEGER,
+            endMs INTEGER,
+            durationMs INTEGER
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO lyrics_lines_new (id, song_id, text, startMs, endMs, durationMs)
+        SELECT id, song_id, text, startMs, endMs, durationMs FROM lyrics_lines
+        WHERE song_id IN (SELECT id FROM songs)
+    ''')
+    cursor.execute('DROP TABLE lyrics_lines')
+    cursor.execute('ALTER TABLE lyrics_lines_new RENAME TO lyrics_lines')
+    cursor.execute('CREATE INDEX idx_lyrics_lines_song_start ON lyrics_lines (song_id, startMs)')
+
+    cursor.execute('''
+        CREATE TABLE querys_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            query_title TEXT,
+            query_main_artist TEXT,
+            song_id INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE,
+            query_key TEXT NOT NULL UNIQUE
+        )
+    ''')
+    # Older databases can contain the same query more than once, the first one wins
+    cursor.execute('''
+        SELECT id, query_title, query_main_artist, song_id FROM querys
+        WHERE song_id IN (SELECT id FROM songs)
+        ORDER BY id
+    ''')
+    kept, dropped = _first_per_key(cursor.fetchall(), _query_key_v2, "_indexes_and_cascades")
+    if dropped:
+        # The same query saved twice, the later copies add nothing
+        logger.warning(f"_indexes_and_cascades: dropped {len(dropped)} queries that repeat older ones")
+    cursor.executemany('''
+        INSERT INTO querys_new (id, query_title, query_main_artist, song_id, query_key)
+        VALUES (?, ?, ?, ?, ?)
+    ''', kept)
+    cursor.execute('DROP TABLE querys')
+    cursor.execute('ALTER TABLE querys_new RENAME TO querys')
+    cursor.execute('CREATE INDEX idx_querys_song ON querys (song_id)')
+
+def _lyrics_blobs(cursor: sqlite3.Cursor) -> None:
+    """Version 3: a table for songs whose whole timeline is stored as one packed blob (see LyricsBlob)."""
+    cursor.execute('''
+        CREATE TABLE lyrics_blobs (
+            song_id INTEGER PRIMARY KEY REFERENCES songs(id) ON DELETE CASCADE,
+            data BLOB NOT NULL
+        )
+    ''')
+
+def _negative_cache(cursor: sqlite3.Cursor) -> None:
+    """Version 4: queries whose online search failed, so they are not searched again before retry_after (a Unix timestamp)."""
+    cursor.execute('''
+        CREATE TABLE negative_cache (
+            query_key TEXT PRIMARY KEY,
+            reason TEXT NOT NULL,
+            failures INTEGER NOT NULL,
+            last_failure REAL NOT NULL,
+            retry_after REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+def _fuzzy_query_index(cursor: sqlite3.Cursor) -> None:
+    """Version 5: query keys ignore remix/feature decorations, and an FTS5 trigram index over normalized titles and artists finds near-duplicate queries."""
+    # The key function changed, recompute every key. Queries that differed only in decorations now share a key, the oldest one keeps it
+    cursor.execute('SELECT id, query_title, query_main_artist, song_id FROM querys ORDER BY id')
+    kept, dropped = _first_per_key(cursor.fetchall(), _query_key_v5, "_fuzzy_query_index")
+    if dropped:
+        logger.warning(f"_fuzzy_query_index: dropped {len(dropped)} queries whose key is now that of an older one")
+        cursor.executemany('DELETE FROM querys WHERE id = ?', ((id,) for id in dropped))
+    # Placeholder keys first, a new key may still be held by a row that is updated later
+    cursor.execute('UPDATE querys SET query_key = \'#\' || id')
+    cursor.executemany('UPDATE querys SET query_key = ? WHERE id = ?', ((row_key, id) for id, _, _, _, row_key in kept))
+    # The negative cache is keyed the old way as well, it is cheap to rebuild
+    cursor.execute('DELETE FROM negative_cache')
+
+    # The normalized queries live in an ordinary table, which cascades with its song and indexes song_id (FTS5 cannot index an UNINDEXED column)
+    cursor.execute('''
+        CREATE TABLE query_entries (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            song_id INTEGER NOT NULL REFERENCES songs(id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('CREATE INDEX idx_query_entries_song ON query_entries (song_id)')
+    try:
+        # An FTS5 index over query_entries (external content), kept in sync by the triggers below
+        cursor.execute("CREATE VIRTUAL TABLE query_index USING fts5(title, artist, song_id UNINDEXED, content = 'query_entries', content_rowid = 'id', tokenize = 'trigram')")
+    except sqlite3.OperationalError as e:
+        # SQLite without FTS5 or older than 3.34: the entries are kept, but there is no query_index and approximate matching is disabled
+        logger.warning(f"_fuzzy_query_index: FTS5 trigram index not available ({e}), near-duplicate queries will not be matched")
+    else:
+        cursor.execute('''
+            CREATE TRIGGER query_entries_insert AFTER INSERT ON query_entries BEGIN
+                INSERT INTO query_index (rowid, title, artist, song_id) VALUES (new.id, new.title, new.artist, new.song_id);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER query_entries_delete AFTER DELETE ON query_entries BEGIN
+                INSERT INTO query_index (query_index, rowid, title, artist, song_id) VALUES ('delete', old.id, old.title, old.artist, old.song_id);
+            END
+        ''')
+    # The normalized title and artist of every query and every song
+    cursor.execute('SELECT query_title, query_main_artist, song_id FROM querys')
+    entries = {(_normalize_title_v5(title), _normalize_artist_v5(artist), song_id) for title, artist, song_id in cursor.fetchall()}
+    cursor.execute('SELECT title, artist, id FROM songs')
+    entries.update((_normalize_title_v5(title), _normalize_artist_v5(artist), song_id) for title, artist, song_id in cursor.fetchall())
+    cursor.executemany('INSERT INTO query_entries (title, artist, song_id) VALUES (?, ?, ?)', entries)
+
+def _library_index(cursor: sqlite3.Cursor) -> None:
+    """Version 6: an FTS5 index over the title, artist and lyrics text of every song (rowid = song id) for the database viewer, and the index it pages the songs by."""
+    cursor.execute("CREATE INDEX idx_songs_title ON songs (ifnull(title, '') COLLATE NOCASE, id)")
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE library_index USING fts5(title, artist, lyrics, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+    except sqlite3.OperationalError as e:
+        # The viewer searches the plain table with LIKE instead
+        logger.warning(f"_library_index: FTS5 not available ({e}), the database viewer will search without an index")
+        cursor.execute('CREATE TABLE library_index (title TEXT, artist TEXT, lyrics TEXT)')
+    cursor.execute('SELECT id, title, artist FROM songs')
+    songs = cursor.fetchall()
+    for song_id, title, artist in songs:
+        cursor.execute('SELECT data FROM lyrics_blobs WHERE song_id = ?', (song_id,))
+        blob = cursor.fetchone()
+        if blob:
+            texts = LyricsBlob.decode(blob[0]).texts
+        else:
+            cursor.execute('SELECT text FROM lyrics_lines WHERE song_id = ? ORDER BY startMs', (song_id,))
+            texts = [text for text, in cursor.fetchall()]
+        cursor.execute('INSERT INTO library_index (rowid, title, artist, lyrics) VALUES (?, ?, ?, ?)', (song_id, title, artist, "\n".join(texts)))
+    cursor.execute('''
+        CREATE TRIGGER library_index_delete AFTER DELETE ON songs BEGIN
+            DELETE FROM library_index WHERE rowid = old.id;
+        END
+    ''')
+
+# MIGRATIONS[i] brings a database from user_version i to i + 1. Only ever append to this list.
+MIGRATIONS = [
+    _initial_schema,
+    _indexes_and_cascades,
+    _lyrics_blobs,
+    _negative_cache,
+    _fuzzy_query_index,
+    _library_index,
+]
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """Bring the database up to the latest schema version, one migration per transaction."""
+    # Tables are rebuilt by some migrations, which must not trigger the cascades
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            # Read the version inside the write lock, another process may have migrated in the meantime
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                break
+            logger.info(f"migrate: migrating database from version {version} to {version + 1}")
+            try:
+                MIGRATIONS[version](conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
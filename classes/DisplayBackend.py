@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import random
+from typing import Callable, List, Optional, Tuple
+
+from classes.Song import Song
+from classes.VirtualClock import VirtualClock
+
+class DisplayBackend:
+    """
+    What the LyricsPlayer needs from a display: drawing the lines and the progress within the active line, and scheduling callbacks.
+    after() and after_cancel() have the signature of the Tk widget methods.
+    """
+    def show_line(self, song: Song, i: int) -> None:
+        """Shows line i of the song as the active line."""
+        raise NotImplementedError
+
+    def update(self, time_ms: int) -> None:
+        """Shows the progress within the active line at time_ms."""
+        raise NotImplementedError
+
+    def next_change_ms(self, time_ms: int) -> Optional[int]:
+        """The song time of the next visual change within the active line, or None if the progress is drawn continuously."""
+        raise NotImplementedError
+
+    def after(self, delay_ms: int, callback: Callable[[], None]):
+        """Calls callback after delay_ms milliseconds and returns a handle for after_cancel()."""
+        raise NotImplementedError
+
+    def after_cancel(self, handle) -> None:
+        raise NotImplementedError
+
+class RecordingBackend(DisplayBackend):
+    """
+    Headless backend that runs the scheduled callbacks on a VirtualClock instead of a Tk main loop and records what would have been drawn.
+    Needs no display, so the player can be replayed at any speed on a CI machine.
+    """
+    def __init__(self, clock: VirtualClock, jitter_ms: float = 0, seed: int = 0):
+        """'jitter_ms' delays every callback by a random 0..jitter_ms milliseconds, like a busy event loop would."""
+        self.clock = clock
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        # (due time, handle, callback)
+        self.queue: List[Tuple[float, int, Callable[[], None]]] = []
+        self.cancelled = set()
+        self.handles = itertools.count()
+        # (clock time, line index) of every line change
+        self.line_changes: List[Tuple[float, int]] = []
+        self.updates = 0
+        self.song: Optional[Song] = None
+        self.line_index = -1
+        self.highlighted_words = 0
+
+    def show_line(self, song: Song, i: int) -> None:
+        self.line_changes.append((self.clock(), i))
+        self.song = song
+        self.line_index = i
+        self.highlighted_words = 0
+
+    def update(self, time_ms: int) -> None:
+        self.updates += 1
+        if self.song is not None and self.song.has_words:
+            self.highlighted_words = self.song.word_index_at(self.line_index, time_ms) + 1
+
+    def next_change_ms(self, time_ms: int) -> Optional[int]:
+        song, i = self.song, self.line_index
+        if song is None or not song.has_words or song.word_offsets[i] == song.word_offsets[i + 1]:
+            return None
+        next_word = song.word_offsets[i] + self.highlighted_words
+        return song.word_starts[next_word] if next_word < song.word_offsets[i + 1] else song.end_times[i]
+
+    def after(self, delay_ms: int, callback: Callable[[], None]) -> int:
+        handle = next(self.handles)
+        delay_ms += self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        heapq.heappush(self.queue, (self.clock() + delay_ms / 1000, handle, callback))
+        return handle
+
+    def after_cancel(self, handle: int) -> None:
+        self.cancelled.add(handle)
+
+    def next_due(self) -> Optional[float]:
+        """Clock time of the next scheduled callback, None if nothing is scheduled."""
+        while self.queue and self.queue[0][1] in self.cancelled:
+            self.cancelled.discard(heapq.heappop(self.queue)[1])
+        return self.queue[0][0] if self.queue else None
+
+    def run_next(self) -> bool:
+        """Advances the clock to the next scheduled callback and runs it. Returns False if nothing is scheduled."""
+        while self.queue:
+            due, handle, callback = heapq.heappop(self.queue)
+            if handle in self.cancelled:
+                self.cancelled.discard(handle)
+                continue
+            self.clock.set(due)
+            callback()
+            return True
+        return False
+
+    def run(self) -> int:
+        """Runs callbacks until nothing is scheduled anymore and returns how many ran."""
+        count = 0
+        while self.run_next():
+            count += 1
+        return count
@@ -0,0 +1,52 @@
+import gzip
+import json
+import time
+from typing import Iterator, Optional, Tuple
+
+EVENT_LOG_VERSION = 1
+
+class EventLogWriter:
+    """
+    Records websocket frames from a game to a gzip-compressed event log.
+    The first line is a JSON header, every following line is "<µs since the previous frame>\\t<frame as JSON string>".
+    """
+    def __init__(self, path: str, url: Optional[str] = None):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="\n")
+        # Offsets use the monotonic clock, the wall clock start is kept to map timestamps inside the frames
+        self.last_frame_at = time.perf_counter()
+        header = {"version": EVENT_LOG_VERSION, "url": url, "started_at": time.time()}
+        self.file.write(json.dumps(header) + "\n")
+
+    def write(self, frame: str, received_at: Optional[float] = None) -> None:
+        """Appends a frame. received_at is the time.perf_counter() timestamp of the frame, defaults to now."""
+        received_at = received_at if received_at is not None else time.perf_counter()
+        delta_us = max(0, round((received_at - self.last_frame_at) * 1e6))
+        self.last_frame_at = received_at
+        self.file.write(f"{delta_us}\t{json.dumps(frame, ensure_ascii=False)}\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "EventLogWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class EventLog:
+    """An event log written by EventLogWriter. Iterating yields (seconds since the start of the recording, frame) pairs."""
+    def __init__(self, path: str):
+        self.path = path
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.header = json.loads(f.readline())
+        if self.header.get("version") != EVENT_LOG_VERSION:
+            raise ValueError(f"Unsupported event log version {self.header.get('version')} in {path}")
+
+    def __iter__(self) -> Iterator[Tuple[float, str]]:
+        offset_us = 0
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                delta_us, _, frame = line.rstrip("\n").partition("\t")
+                offset_us += int(delta_us)
+                yield offset_us / 1e6, json.loads(frame)
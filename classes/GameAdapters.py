@@ -0,0 +1,237 @@
+import json
+import logging
+import time
+from typing import List, Optional
+
+from classes.GameEvent import GameEvent
+
+class GameAdapter:
+    """
+    Translates the websocket messages of one game into GameEvents.
+    Adapters keep whatever state they need to detect a song change, and are only ever called from the GameRuntime thread.
+    """
+    name = "game"
+    # Title of the game window, used to place the overlay underneath it
+    window_title: Optional[str] = None
+    default_url: str = ""
+    # Background of the overlay, the colour keyed out by the stream
+    overlay_color = "green"
+    # Seconds between idle() calls while no message arrives, None if the adapter does not need them
+    idle_check_interval: Optional[float] = None
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or self.default_url
+        self.logger = logging.getLogger(__name__)
+
+    def _event(self, kind: str, received_at: float, **kwargs) -> GameEvent:
+        return GameEvent(kind=kind, game=self.name, received_at=received_at, **kwargs)
+
+    def parse(self, message: str, received_at: float) -> List[GameEvent]:
+        """Returns the events in one websocket message. received_at is the time.perf_counter() timestamp of the message."""
+        raise NotImplementedError
+
+    def idle(self, now: float) -> List[GameEvent]:
+        """Called every idle_check_interval seconds without a message; returns the events that the silence implies."""
+        return []
+
+    @staticmethod
+    def _wall_to_local(timestamp: float, received_at: float) -> float:
+        """Converts a time.time() timestamp from the game into the time.perf_counter() timeline the timers run on."""
+        return received_at - max(0.0, time.time() - timestamp)
+
+class BeatSaberAdapter(GameAdapter):
+    """Beat Saber with the BSDataPuller mod, which sends the whole map state on every change."""
+    name = "Beat Saber"
+    window_title = "Beat Saber"
+    default_url = "ws://localhost:2946/BSDataPuller/MapData"
+    overlay_color = "green"
+
+    # Song speed of the modifiers that change it
+    speed_modifiers = {"SlowerSong": 0.85, "FasterSong": 1.2, "SuperFastSong": 1.5}
+
+    def __init__(self, url: Optional[str] = None):
+        super().__init__(url)
+        self.current_song_hash = None
+        self.is_paused = False
+        self.speed = 1.0
+
+    @staticmethod
+    def _practice_start_ms(data: dict) -> int:
+        """Where practice mode starts the song, 0 outside of practice mode."""
+        if not data.get("PracticeMode"):
+            return 0
+        modifiers = {key.lower(): value for key, value in (data.get("PracticeModeModifiers") or {}).items()}
+        return int((modifiers.get("songstarttime") or 0) * 1000)
+
+    @classmethod
+    def _speed(cls, data: dict) -> float:
+        """How fast the song plays: the speed of practice mode times that of the modifiers."""
+        speed = 1.0
+        if data.get("PracticeMode"):
+            modifiers = {key.lower(): value for key, value in (data.get("PracticeModeModifiers") or {}).items()}
+            speed = float(modifiers.get("songspeedmul") or 1.0)
+        modifiers = data.get("Modifiers") or {}
+        for modifier, factor in cls.speed_modifiers.items():
+            if modifiers.get(modifier):
+                speed *= factor
+        return speed
+
+    def parse(self, message: str, received_at: float) -> List[GameEvent]:
+        data = json.loads(message)
+
+        song_hash = data.get("Hash")
+        in_level = data.get("InLevel", False)
+        # BSDataPuller stamps every message with the time it was sent, which is closer to the event than the time we received it
+        unix_timestamp = data.get("UnixTimestamp")
+        sent_at = self._wall_to_local(unix_timestamp / 1000, received_at) if unix_timestamp else received_at
+
+        # Scenario 1: A new song starts
+        if in_level and song_hash and song_hash != self.current_song_hash:
+            self.current_song_hash = song_hash
+            self.is_paused = False
+            self.speed = self._speed(data)
+            events = [self._event(GameEvent.START, received_at, title=data.get("SongName"), artist=data.get("SongAuthor"), started_at=sent_at, time_ms=self._practice_start_ms(data), speed=self.speed)]
+            if data.get("LevelPaused", False):
+                self.is_paused = True
+                events.append(self._event(GameEvent.PAUSE, received_at, started_at=sent_at))
+            return events
+
+        # Scenario 2: The pause menu is opened or closed, or the speed changed
+        if in_level and song_hash == self.current_song_hash:
+            events = []
+            if (speed := self._speed(data)) != self.speed:
+                self.speed = speed
+                events.append(self._event(GameEvent.SPEED, received_at, started_at=sent_at, speed=speed))
+            if data.get("LevelPaused", False) != self.is_paused:
+                self.is_paused = not self.is_paused
+                events.append(self._event(GameEvent.PAUSE if self.is_paused else GameEvent.RESUME, received_at, started_at=sent_at))
+            return events
+
+        # Scenario 3: The song ends (finished, failed, or quit)
+        if not in_level and self.current_song_hash is not None:
+            if data.get("LevelFinished", False) or data.get("LevelFailed", False) or data.get("LevelQuit", False):
+                self.current_song_hash = None
+                self.is_paused = False
+                return [self._event(GameEvent.END, received_at)]
+        return []
+
+class SynthRidersAdapter(GameAdapter):
+    """
+    Synth Riders with the SynthRiders Websockets mod, which sends one event per message.
+    The mod has no pause event; the game is taken as paused when its PlayTime stops advancing or stops arriving, and as resumed when it moves again.
+    """
+    name = "Synth Riders"
+    window_title = "SynthRiders"
+    # Default port for Synth Riders is 9000
+    default_url = "ws://localhost:9000/"
+    overlay_color = "purple"
+    idle_check_interval = 0.25
+    # Silence that counts as a pause, at least this long and at least three times the usual PlayTime interval
+    min_pause_s = 0.75
+
+    # Event and field names of the mod, subclasses for other games' mods override them
+    start_events = ("SongStart",)
+    end_events = ("ReturnToMenu", "SongEnd")
+    play_time_events = ("PlayTime",)
+    title_fields = ("song",)
+    artist_fields = ("author",)
+    time_fields = ("playTimeMS",)
+
+    def __init__(self, url: Optional[str] = None):
+        super().__init__(url)
+        self.is_song_active = False
+        self.is_paused = False
+        # Last PlayTime, when it arrived, and when it last moved forward
+        self.last_play_time_ms = None
+        self.last_play_time_at = None
+        self.last_advance_at = None
+        # Smoothed interval between PlayTime messages in seconds
+        self.play_time_interval = None
+
+    def _reset_play_time(self) -> None:
+        self.is_paused = False
+        self.last_play_time_ms = None
+        self.last_play_time_at = None
+        self.last_advance_at = None
+        self.play_time_interval = None
+
+    def _pause_after(self) -> float:
+        return max(self.min_pause_s, 3 * (self.play_time_interval or 0))
+
+    def _play_time(self, play_time_ms: int, received_at: float) -> List[GameEvent]:
+        events = []
+        if self.last_play_time_at is not None:
+            interval = received_at - self.last_play_time_at
+            if not self.is_paused:
+                self.play_time_interval = interval if self.play_time_interval is None else 0.8 * self.play_time_interval + 0.2 * interval
+        advanced = self.last_play_time_ms is None or play_time_ms != self.last_play_time_ms
+        if advanced:
+            if self.is_paused:
+                self.is_paused = False
+                events.append(self._event(GameEvent.RESUME, received_at, time_ms=play_time_ms))
+            self.last_advance_at = received_at
+            events.append(self._event(GameEvent.PLAYTIME, received_at, time_ms=play_time_ms))
+        elif not self.is_paused and received_at - self.last_advance_at >= self._pause_after():
+            # Still sending, but the song does not move
+            events.extend(self._pause())
+        self.last_play_time_ms = play_time_ms
+        self.last_play_time_at = received_at
+        return events
+
+    def _pause(self) -> List[GameEvent]:
+        self.is_paused = True
+        # The song stopped right after the last PlayTime that moved
+        return [self._event(GameEvent.PAUSE, self.last_advance_at, started_at=self.last_advance_at, time_ms=self.last_play_time_ms)]
+
+    def idle(self, now: float) -> List[GameEvent]:
+        if self.is_song_active and not self.is_paused and self.last_advance_at is not None and now - self.last_advance_at >= self._pause_after():
+            return self._pause()
+        return []
+
+    @staticmethod
+    def _field(data: dict, names: tuple):
+        for name in names:
+            if name in data:
+                return data[name]
+        return None
+
+    def _is_end(self, event_type: str, data: dict) -> bool:
+        # song quit, failed, or finished
+        return event_type in self.end_events or (event_type == "SceneChange" and data.get("sceneName", None) == "3.GameEnd")
+
+    def parse(self, message: str, received_at: float) -> List[GameEvent]:
+        msg_data = json.loads(message)
+        event_type = msg_data.get("eventType")
+        data = msg_data.get("data") or {}
+
+        if event_type in self.start_events and not self.is_song_active:
+            self.is_song_active = True
+            self._reset_play_time()
+            return [self._event(GameEvent.START, received_at, title=self._field(data, self.title_fields), artist=self._field(data, self.artist_fields), started_at=received_at)]
+
+        if event_type in self.play_time_events and self.is_song_active:
+            play_time_ms = self._field(data, self.time_fields)
+            return self._play_time(int(play_time_ms or 0), received_at)
+
+        if self._is_end(event_type, data) and self.is_song_active:
+            self.is_song_active = False
+            self._reset_play_time()
+            return [self._event(GameEvent.END, received_at)]
+        return []
+
+class AudioTripAdapter(SynthRidersAdapter):
+    """
+    Template for AudioTrip, which has no live data API and no known mod that provides one. It expects a websocket of your own,
+    passed with --url, that sends the events of the SynthRiders Websockets mod; a subclass can override their event and field names.
+    Not in ADAPTERS, so lyrics-overlay.py does not try to connect to it.
+    """
+    name = "AudioTrip"
+    window_title = "AudioTrip"
+    # No default: there is no mod to take the port from
+    default_url = ""
+    overlay_color = "blue"
+
+ADAPTERS = {
+    "beatsaber": BeatSaberAdapter,
+    "synthriders": SynthRidersAdapter,
+}
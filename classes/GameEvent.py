@@ -0,0 +1,27 @@
+import dataclasses
+from typing import Optional
+
+@dataclasses.dataclass(slots=True)
+class GameEvent:
+    """A game message translated by a GameAdapter into something the overlay understands, the same for every game."""
+    START = "start"
+    PAUSE = "pause"
+    RESUME = "resume"
+    SEEK = "seek"
+    SPEED = "speed"
+    END = "end"
+    PLAYTIME = "playtime"
+
+    kind: str
+    # Name of the adapter that produced the event
+    game: str
+    # time.perf_counter() when the message arrived
+    received_at: float
+    # START: the song. START, PAUSE, RESUME: the time.perf_counter() timestamp the game says it happened at, which can be before received_at
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    started_at: Optional[float] = None
+    # START: where the song starts (practice mode). PLAYTIME, SEEK, and PAUSE/RESUME if the game reports it: position in the song in milliseconds
+    time_ms: Optional[int] = None
+    # START, SPEED: how fast the song plays (practice mode, speed modifiers), None if the game does not say
+    speed: Optional[float] = None
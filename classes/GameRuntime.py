@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+from classes.EventLog import EventLogWriter
+from classes.GameAdapters import GameAdapter
+from classes.GameEvent import GameEvent
+
+class GameRuntime:
+    """
+    Keeps a websocket connection to every game adapter open on one asyncio event loop in a background thread,
+    reconnects when a game is closed or not started yet, and hands the translated GameEvents to 'dispatch' (on the runtime thread).
+    """
+    def __init__(self, adapters: Sequence[GameAdapter], dispatch: Callable[[GameEvent], None], reconnect_delay: float = 5.0, recorders: Optional[Dict[str, EventLogWriter]] = None):
+        """
+        Args:
+            adapters (Sequence[GameAdapter]): The games to listen to, all at once.
+            dispatch (Callable[[GameEvent], None]): Called for every event; use root.after() in there to get onto the Tk thread.
+            reconnect_delay (float): Seconds between connection attempts.
+            recorders (Dict[str, EventLogWriter], optional): Event logs by adapter name, every received frame of that adapter is written to it.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.adapters = list(adapters)
+        self.dispatch = dispatch
+        self.reconnect_delay = reconnect_delay
+        self.recorders = recorders or {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="GameRuntime", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Closes all connections and waits for the runtime thread to end."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        if self.thread is not None:
+            self.thread.join(timeout)
+        for recorder in self.recorders.values():
+            recorder.close()
+
+    async def _main(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._ready.set()
+        tasks = [asyncio.create_task(self._connection(adapter)) for adapter in self.adapters]
+        await self._stopped.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _dispatch_all(self, adapter: GameAdapter, events: Callable[[], Sequence[GameEvent]]) -> None:
+        """Dispatches the events the adapter returns; a failing adapter or dispatch is logged and the connection keeps listening."""
+        try:
+            for event in events():
+                try:
+                    self.dispatch(event)
+                except Exception:
+                    self.logger.exception(f"_dispatch_all: Could not dispatch {adapter.name} event {event}")
+        except Exception:
+            self.logger.exception(f"_dispatch_all: {adapter.name} failed to produce events")
+
+    @staticmethod
+    async def _next_message(ws: ClientConnection) -> Optional[str]:
+        """The next text message, or None once the game closed the connection."""
+        try:
+            message = await ws.recv()
+        except ConnectionClosed:
+            return None
+        return message if isinstance(message, str) else message.decode("utf-8", errors="replace")
+
+    async def _recv(self, ws: ClientConnection, adapter: GameAdapter) -> Optional[str]:
+        """Waits for the next message, and dispatches the events of adapter.idle() every idle_check_interval until it arrives."""
+        if adapter.idle_check_interval is None:
+            return await self._next_message(ws)
+        # The read is never cancelled halfway, a timeout only stops waiting for it
+        recv = asyncio.ensure_future(self._next_message(ws))
+        try:
+            while not (await asyncio.wait({recv}, timeout=adapter.idle_check_interval))[0]:
+                self._dispatch_all(adapter, lambda: adapter.idle(time.perf_counter()))
+        except BaseException:
+            recv.cancel()
+            raise
+        return recv.result()
+
+    async def _connection(self, adapter: GameAdapter) -> None:
+        """Connects to one game, forever."""
+        recorder = self.recorders.get(adapter.name)
+        while True:
+            ws = None
+            try:
+                # The game mods do not all answer pings, a dead game shows up as a closed socket instead
+                ws = await connect(adapter.url, open_timeout=10, ping_interval=None, max_size=None)
+                self.logger.info(f"_connection: {adapter.name} connected ({adapter.url})")
+                while (message := await self._recv(ws, adapter)) is not None:
+                    received_at = time.perf_counter()
+                    if recorder is not None:
+                        recorder.write(message, received_at)
+                    try:
+                        events = adapter.parse(message, received_at)
+                    except Exception as e:
+                        self.logger.error(f"_connection: Could not process {adapter.name} message {message[:200]!r}: {e}")
+                        continue
+                    self._dispatch_all(adapter, lambda: events)
+                self.logger.warning(f"_connection: {adapter.name} closed the connection")
+            except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+                self.logger.debug(f"_connection: {adapter.name} not reachable: {e}")
+            finally:
+                if ws is not None:
+                    await ws.close()
+            await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,286 @@
+import email.utils
+import functools
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from classes.Metrics import METRICS
+
+class DeadlineExceeded(Exception):
+    """A request did not succeed within its deadline: the host was too slow or kept failing."""
+    def __init__(self, message: str, host: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.host = host
+        # Seconds the host asked to wait before the next request, if it did
+        self.retry_after = retry_after
+
+class RateLimited(DeadlineExceeded):
+    """The host answered 429 and asked to wait (Retry-After) longer than the deadline left, or kept answering 429 until the attempts ran out."""
+
+class TokenBucket:
+    """
+    Allows 'rate' requests per second on average and bursts of up to 'burst'. A Retry-After of the host blocks the bucket until then,
+    including the requests that already wait for a token, and it starts refilling from empty afterwards.
+    """
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        # Tokens at the time 'updated'. Below 0 while requests wait for tokens they already reserved
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self, deadline: float) -> bool:
+        """
+        Waits for a token. Returns False right away, without taking one, if there is none before the clock reaches 'deadline',
+        and returns False as well, handing back its token, if a Retry-After that arrives while it waits lasts past 'deadline'.
+        """
+        with self._lock:
+            self._refill(self.clock())
+            ready_at = max(self.blocked_until, self.updated + max(0.0, (1 - self.tokens) / self.rate))
+            if ready_at > deadline:
+                return False
+            self.tokens -= 1
+        while True:
+            delay = ready_at - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            # A Retry-After that came in meanwhile holds back the waiting requests as well
+            ready_at = self.blocked_until
+            if ready_at <= self.clock():
+                return True
+            if ready_at > deadline:
+                # Give back the token reserved above, or the requests after this one would wait for it as well
+                with self._lock:
+                    self.tokens = min(self.burst, self.tokens + 1)
+                return False
+
+    def block_until(self, until: float) -> None:
+        """No token is handed out before the clock reaches 'until'."""
+        with self._lock:
+            if until > self.blocked_until:
+                self.blocked_until = until
+            if until > self.updated:
+                self.tokens = min(self.tokens, 0.0)
+                self.updated = until
+
+class HostLimits:
+    """The limits of one host: how many requests may run at once, and how many may start per second."""
+    def __init__(self, max_concurrent: int, bucket: TokenBucket):
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.bucket = bucket
+
+@functools.lru_cache(maxsize=None)
+def _limited_adapter_class():
+    # requests is only imported with the first session, not at startup
+    from requests.adapters import HTTPAdapter
+
+    class LimitedAdapter(HTTPAdapter):
+        """Sends the requests of one session through the limits of an HttpClient, over the keep-alive connections all its sessions share."""
+        def __init__(self, client: "HttpClient", deadline: float, **kwargs):
+            self.client = client
+            self.deadline = deadline
+            super().__init__(max_retries=0, **kwargs)
+
+        def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+            with self.client._lock:
+                if self.client._pool_manager is None:
+                    super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+                    self.client._pool_manager = self.poolmanager
+                self.poolmanager = self.client._pool_manager
+
+        def send(self, request, timeout=None, **kwargs):
+            return self.client.send(super().send, request, self.deadline, timeout=timeout, **kwargs)
+
+    return LimitedAdapter
+
+class HttpClient:
+    """
+    One pool of keep-alive connections for all lookups, shared by every session it hands out (spotipy, the Spotify token, the lyrics providers).
+    Per host it limits the concurrent requests and the request rate, waits as long as a 429 or 503 asks in Retry-After,
+    and retries failed requests with jittered exponential back-off, all within a hard deadline per request.
+    """
+    # Answers that are worth another attempt
+    RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+    # (requests per second, burst) of the hosts the app talks to; the others get 'default_rate'
+    HOST_RATES = {
+        "api.spotify.com": (5.0, 10),
+        "accounts.spotify.com": (1.0, 2),
+        "lrclib.net": (4.0, 4),
+        "music.163.com": (2.0, 2),
+        "apic-desktop.musixmatch.com": (2.0, 2),
+    }
+
+    def __init__(self, max_per_host: int = 4, rates: Dict[str, Tuple[float, int]] = None, default_rate: Tuple[float, int] = (5.0, 5), timeout: Tuple[float, float] = (3.05, 10.0),
+                 deadline: float = 10.0, max_attempts: int = 4, backoff_base: float = 0.25, backoff_cap: float = 4.0, max_hosts: int = 10,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep, rng: random.Random = None):
+        """
+        Nothing is imported or connected here; requests is imported by the first session().
+
+        Args:
+            max_per_host (int): Requests to one host at the same time, also the number of connections kept open per host.
+            rates (dict, optional): Host name -> (requests per second, burst), replacing HOST_RATES.
+            default_rate (tuple): (requests per second, burst) of hosts not in 'rates'.
+            timeout (tuple): Default (connect, read) timeout of one attempt in seconds, if the caller passes none.
+            deadline (float): Default seconds a request may take from the first attempt to the last answer, waits included.
+            max_attempts (int): Attempts per request, the first one included.
+            backoff_base (float): Upper bound of the first back-off in seconds; it doubles with every attempt, up to backoff_cap.
+            backoff_cap (float): Upper bound of any back-off in seconds.
+            max_hosts (int): Hosts the pool keeps connections to.
+        """
+        self.max_per_host = max_per_host
+        self.rates = dict(self.HOST_RATES if rates is None else rates)
+        self.default_rate = default_rate
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_hosts = max_hosts
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostLimits] = {}
+        self._pool_manager = None
+
+    def limits(self, host: str) -> HostLimits:
+        """The limits of a host, created on its first request."""
+        limits = self._hosts.get(host)
+        if limits is None:
+            with self._lock:
+                limits = self._hosts.get(host)
+                if limits is None:
+                    rate, burst = self.rates.get(host, self.default_rate)
+                    limits = self._hosts[host] = HostLimits(self.max_per_host, TokenBucket(rate, burst, self.clock, self.sleep))
+        return limits
+
+    def session(self, deadline: float = None):
+        """
+        A new requests.Session whose requests go through this client. Sessions keep their own headers and cookies but share the connections and the limits.
+
+        Args:
+            deadline (float, optional): Seconds each request of the session may take in total, by default the deadline of the client.
+        """
+        import requests
+        adapter = _limited_adapter_class()(self, self.deadline if deadline is None else deadline, pool_connections=self.max_hosts, pool_maxsize=self.max_per_host)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        with self._lock:
+            if self._pool_manager is not None:
+                self._pool_manager.clear()
+
+    @staticmethod
+    def retry_after(response) -> Optional[float]:
+        """The seconds a response asks to wait in its Retry-After header (a number or an HTTP date), or None."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt (1 for the first): anything up to an exponentially growing bound ("full jitter"), so clients that failed together do not retry together."""
+        return self.rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _attempt_timeout(self, timeout, remaining: float):
+        if timeout is None:
+            timeout = self.timeout
+        if isinstance(timeout, tuple):
+            return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+    def send(self, send: Callable, request, deadline: float, timeout=None, **kwargs):
+        """
+        Sends a prepared request with 'send' (HTTPAdapter.send) within the limits of its host, retrying it if needed.
+
+        Returns:
+            requests.Response: The first answer that is not worth a retry, or the last one once the attempts are used up.
+
+        Raises:
+            RateLimited: The host asked to wait longer than the deadline allows, or still answered 429 at the last attempt.
+            DeadlineExceeded: The deadline passed before an answer came, or while waiting for a slot, a token or a retry.
+        """
+        from requests.exceptions import ConnectionError, Timeout
+        host = urlsplit(request.url).hostname or ""
+        limits = self.limits(host)
+        started = self.clock()
+        deadline_at = started + deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            if not limits.bucket.acquire(deadline_at):
+                wait = limits.bucket.blocked_until - self.clock()
+                if wait > 0:
+                    METRICS.inc("http_rate_limited_total", host=host)
+                    raise RateLimited(f"{host} asked to wait {wait:.1f} s, more than the deadline of {deadline} s allows", host, wait)
+                raise DeadlineExceeded(f"{host}: rate limit leaves no request within the deadline of {deadline} s", host)
+            if not limits.slots.acquire(timeout=max(0.0, deadline_at - self.clock())):
+                raise DeadlineExceeded(f"{host}: no free connection within the deadline of {deadline} s", host)
+            error = None
+            try:
+                remaining = deadline_at - self.clock()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"{host}: deadline of {deadline} s passed", host)
+                try:
+                    response = send(request, timeout=self._attempt_timeout(timeout, remaining), **kwargs)
+                    if not kwargs.get("stream"):
+                        # Read the body while holding the slot, so the connection is back in the pool before the next request takes the slot
+                        response.content
+                except (ConnectionError, Timeout) as e:
+                    error, response = e, None
+            finally:
+                limits.slots.release()
+            METRICS.inc("http_requests_total", host=host, outcome=str(response.status_code) if response is not None else type(error).__name__)
+
+            if response is not None and response.status_code not in self.RETRY_STATUSES:
+                if attempt > 1:
+                    self.logger.info(f"send: {request.method} {host} succeeded at attempt {attempt} after {self.clock() - started:.2f} s")
+                return response
+
+            now = self.clock()
+            retry_after = None
+            if response is not None:
+                retry_after = self.retry_after(response)
+                if retry_after is not None:
+                    # The host asks every request to wait, not just this one
+                    limits.bucket.block_until(now + retry_after)
+            wait = retry_after if retry_after is not None else self.backoff(attempt)
+            failure = f"status {response.status_code}" if response is not None else f"{type(error).__name__}: {error}"
+            if attempt >= self.max_attempts or now + wait >= deadline_at:
+                if response is not None and response.status_code == 429 and retry_after is not None:
+                    METRICS.inc("http_rate_limited_total", host=host)
+                    if now + wait >= deadline_at:
+                        raise RateLimited(f"{host} answered 429 and asked to wait {retry_after:.1f} s, more than the deadline of {deadline} s allows", host, retry_after)
+                    raise RateLimited(f"{host} still answered 429 after {attempt} attempts, asking to wait {retry_after:.1f} s", host, retry_after)
+                if response is not None:
+                    self.logger.warning(f"send: {request.method} {host} still failing after {attempt} attempts ({failure})")
+                    return response
+                raise DeadlineExceeded(f"{host}: no answer after {attempt} attempts within {deadline} s ({failure})", host) from error
+            self.logger.info(f"send: {request.method} {host} attempt {attempt} failed ({failure}), retrying in {wait:.2f} s")
+            METRICS.inc("http_retries_total", host=host)
+            if retry_after is None:
+                self.sleep(wait)
@@ -0,0 +1,131 @@
+import tkinter as tk
+import tkinter.font as tkfont
+from typing import Callable, List, Optional
+
+from classes.DisplayBackend import DisplayBackend
+from classes.Song import Song
+
+class KaraokeRenderer(DisplayBackend):
+    """
+    Draws the lyrics preview as text items on a canvas.
+    The items are laid out once per line change; while a line is sung only the colour of the newly started word
+    (enhanced LRC) or the length of a progress bar under the line (line-synced lyrics) changes.
+    """
+    def __init__(self, canvas: tk.Canvas, lines_to_show: int = 4, active_line_index_in_preview: int = 1, font=("Roboto", 42),
+                 active_color: str = "white", inactive_color: str = "black", sung_color: str = "gold", progress_height: int = 6):
+        self.canvas = canvas
+        self.lines_to_show = lines_to_show
+        self.active_line_index_in_preview = active_line_index_in_preview
+        self.font = tkfont.Font(root=canvas, font=font)
+        self.active_color = active_color
+        self.inactive_color = inactive_color
+        self.sung_color = sung_color
+        self.progress_height = progress_height
+        self.linespace = self.font.metrics("linespace")
+
+        # One text item per preview slot, reused for every line
+        self.slot_items = [canvas.create_text(0, 0, text="", font=self.font, fill=inactive_color) for _ in range(lines_to_show)]
+        canvas.itemconfigure(self.slot_items[active_line_index_in_preview], fill=active_color)
+        # The words of the active line, only used if the line has word timings
+        self.word_items: List[int] = []
+        self.highlighted_words = 0
+        self.progress_bar = canvas.create_rectangle(0, 0, 0, 0, fill=sung_color, width=0, state="hidden")
+        self.progress_width = 0
+        # Pixel width of the active line, measured once per line change
+        self.line_width = 0
+
+        self.song: Optional[Song] = None
+        self.line_index = -1
+        canvas.bind("<Configure>", lambda event: self._layout())
+
+    def _slot_y(self, j: int) -> float:
+        return max(self.canvas.winfo_height(), 1) * (j + 0.5) / self.lines_to_show
+
+    def _line_left(self) -> float:
+        """x of the left edge of the active line."""
+        return (max(self.canvas.winfo_width(), 1) - self.line_width) / 2
+
+    def _layout(self) -> None:
+        """Places the slot items, the words and the progress bar for the current canvas size."""
+        x = max(self.canvas.winfo_width(), 1) / 2
+        for j, item in enumerate(self.slot_items):
+            self.canvas.coords(item, x, self._slot_y(j))
+        y = self._slot_y(self.active_line_index_in_preview)
+        word_x = self._line_left()
+        for item in self.word_items:
+            self.canvas.coords(item, word_x, y)
+            word_x += self.font.measure(self.canvas.itemcget(item, "text") + " ")
+        self._place_progress_bar(self.progress_width)
+
+    def _place_progress_bar(self, width: float) -> None:
+        y = self._slot_y(self.active_line_index_in_preview) + self.linespace / 2
+        left = self._line_left()
+        self.canvas.coords(self.progress_bar, left, y, left + width, y + self.progress_height)
+        self.progress_width = width
+
+    def show_line(self, song: Song, i: int) -> None:
+        """
+        Lays out line i of the song on the active slot and its neighbours on the others.
+        'i' is the index of the line in the original song lyrics.
+        """
+        self.song = song
+        self.line_index = i
+        for j, item in enumerate(self.slot_items):
+            # Calculate the index of the song line to display
+            song_line_to_display_index = i + (j - self.active_line_index_in_preview)
+            text = song.texts[song_line_to_display_index] if 0 <= song_line_to_display_index < len(song.texts) else ""
+            self.canvas.itemconfigure(item, text=text)
+
+        for item in self.word_items:
+            self.canvas.delete(item)
+        self.word_items = []
+        self.highlighted_words = 0
+        active_item = self.slot_items[self.active_line_index_in_preview]
+        words = song.words(i) if 0 <= i < len(song.texts) else []
+        if words:
+            # The words replace the whole-line item, so each of them can change colour on its own
+            self.canvas.itemconfigure(active_item, state="hidden")
+            self.word_items = [self.canvas.create_text(0, 0, text=word, font=self.font, fill=self.active_color, anchor="w") for _, word in words]
+            self.canvas.itemconfigure(self.progress_bar, state="hidden")
+        else:
+            self.canvas.itemconfigure(active_item, state="normal")
+            self.canvas.itemconfigure(self.progress_bar, state="normal" if song.texts[i:i + 1] and song.texts[i] else "hidden")
+        self.progress_width = 0
+        self.line_width = self.font.measure(self.canvas.itemcget(active_item, "text"))
+        self._layout()
+
+    def update(self, time_ms: int) -> None:
+        """Shows the progress within the active line at time_ms. Only touches the words that started since the last call, or the progress bar."""
+        song, i = self.song, self.line_index
+        if song is None or not 0 <= i < len(song.texts):
+            return
+        if self.word_items:
+            sung = song.word_index_at(i, time_ms) + 1
+            while self.highlighted_words < sung:
+                self.canvas.itemconfigure(self.word_items[self.highlighted_words], fill=self.sung_color)
+                self.highlighted_words += 1
+            while self.highlighted_words > sung:
+                # Moved back within the line
+                self.highlighted_words -= 1
+                self.canvas.itemconfigure(self.word_items[self.highlighted_words], fill=self.active_color)
+        else:
+            start, end = song.start_times[i], song.end_times[i]
+            progress = min(max((time_ms - start) / (end - start), 0.0), 1.0) if end > start else 1.0
+            width = round(progress * self.line_width)
+            if width != self.progress_width:
+                self._place_progress_bar(width)
+
+    def next_change_ms(self, time_ms: int) -> Optional[int]:
+        """The song time of the next word start in the active line, or None if the line has no word timings (the progress bar changes continuously)."""
+        song, i = self.song, self.line_index
+        if not self.word_items:
+            return None
+        lo, hi = song.word_offsets[i], song.word_offsets[i + 1]
+        next_word = lo + self.highlighted_words
+        return song.word_starts[next_word] if next_word < hi else song.end_times[i]
+
+    def after(self, delay_ms: int, callback: Callable[[], None]) -> str:
+        return self.canvas.after(delay_ms, callback)
+
+    def after_cancel(self, handle: str) -> None:
+        self.canvas.after_cancel(handle)
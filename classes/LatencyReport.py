@@ -0,0 +1,67 @@
+import logging
+import statistics
+import threading
+import time
+from typing import List, Optional
+
+class SongLatency:
+    """Timestamps of one song, from the game announcing it to its first lyrics line on screen."""
+    __slots__ = ("title", "received_at", "resolved_ms", "tier", "first_line_late_ms")
+
+    def __init__(self, title: str, received_at: float):
+        self.title = title
+        # time.perf_counter() when the game event arrived
+        self.received_at = received_at
+        # ms from the game event until the lookup was done, and which tier served it
+        self.resolved_ms: Optional[float] = None
+        self.tier: Optional[str] = None
+        # ms of song time the first line was shown after its startMs
+        self.first_line_late_ms: Optional[int] = None
+
+class LatencyReport:
+    """End-to-end latency of the apps per song: game SongStart -> lyrics resolved -> first line shown."""
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.songs: List[SongLatency] = []
+        self.current: Optional[SongLatency] = None
+
+    def song_started(self, title: str, received_at: Optional[float] = None) -> None:
+        """Call when the game announces a new song. received_at is the time.perf_counter() timestamp of the event, defaults to now."""
+        with self.lock:
+            self.current = SongLatency(title, received_at if received_at is not None else time.perf_counter())
+            self.songs.append(self.current)
+
+    def lyrics_resolved(self, tier: Optional[str]) -> None:
+        """Call when the lyrics lookup of the current song is done."""
+        with self.lock:
+            if self.current is not None and self.current.resolved_ms is None:
+                self.current.resolved_ms = (time.perf_counter() - self.current.received_at) * 1000
+                self.current.tier = tier
+
+    def line_shown(self, index: int, late_ms: int) -> None:
+        """Call whenever a line is shown; only the first line of a song is recorded."""
+        with self.lock:
+            song = self.current
+            if song is None or song.first_line_late_ms is not None:
+                return
+            song.first_line_late_ms = late_ms
+        self.logger.info(f"line_shown: '{song.title}': resolved after {song.resolved_ms:.0f} ms ({song.tier}), first line shown {late_ms} ms late")
+
+    def summary(self) -> str:
+        with self.lock:
+            songs = list(self.songs)
+        resolved = [song.resolved_ms for song in songs if song.resolved_ms is not None]
+        late = [song.first_line_late_ms for song in songs if song.first_line_late_ms is not None]
+        lines = [f"{len(songs)} songs, {len(resolved)} resolved, {len(late)} shown"]
+        for name, values in (("resolve ms", resolved), ("first line late ms", late)):
+            if values:
+                values = sorted(values)
+                lines.append(f"{name}: p50 {statistics.median(values):.0f}, p90 {values[int(len(values) * 0.9)]:.0f}, max {values[-1]:.0f}")
+        tiers = {}
+        for song in songs:
+            if song.tier is not None:
+                tiers[song.tier] = tiers.get(song.tier, 0) + 1
+        if tiers:
+            lines.append("served by " + ", ".join(f"{tier}: {count}" for tier, count in sorted(tiers.items())))
+        return "\n".join(lines)
@@ -0,0 +1,210 @@
+from array import array
+import collections
+import concurrent.futures
+import gzip
+import itertools
+import json
+import logging
+import os
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from classes.LrcParser import format_lrc, parse_lrc
+from classes.LyricsManager import LyricsManager
+from classes.Song import Song
+
+# Characters that are not allowed in file names on Windows
+_unsafe_file_name = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def song_to_record(song: Song, queries: List[Tuple[str, str]]) -> dict:
+    """The JSONL record of a song: everything the database keeps of it, including the end of every line and the queries it answers."""
+    record = {
+        "title": song.title,
+        "artist": song.artist,
+        "cover_link": song.cover_link,
+        "queries": [list(query) for query in queries],
+        "lines": [[start, end, text] for start, end, text in zip(song.start_times, song.end_times, song.texts)],
+    }
+    if song.has_words:
+        record["words"] = [song.words(i) for i in range(len(song.start_times))]
+    return record
+
+def record_to_song(record: dict) -> Tuple[Song, List[Tuple[str, str]]]:
+    """The song and queries of a JSONL record written by song_to_record()."""
+    lines = record["lines"]
+    word_offsets = word_starts = word_texts = None
+    if record.get("words"):
+        word_offsets, word_starts, word_texts = array('i', [0]), array('i'), []
+        for words in record["words"]:
+            for start, word in words:
+                word_starts.append(start)
+                word_texts.append(word)
+            word_offsets.append(len(word_starts))
+    song = Song.from_arrays([line[0] for line in lines], [line[1] for line in lines], [line[2] for line in lines],
+                            cover_link=record.get("cover_link"), title=record.get("title"), artist=record.get("artist"),
+                            word_offsets=word_offsets, word_starts=word_starts, word_texts=word_texts)
+    queries = [(title, artist) for title, artist in record.get("queries") or ()]
+    if not queries and song.title:
+        queries = [(song.title, song.artist or "")]
+    return song, queries
+
+def _parse_jsonl_lines(lines: List[str]) -> List[Tuple[Optional[Song], object]]:
+    """Runs in the worker processes: (song, queries) per JSONL line, or (None, error message)."""
+    parsed = []
+    for line in lines:
+        try:
+            parsed.append(record_to_song(json.loads(line)))
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            parsed.append((None, f"{type(e).__name__}: {e}"))
+    return parsed
+
+def _parse_lrc_files(paths: List[str]) -> List[Tuple[Optional[Song], object]]:
+    """Runs in the worker processes: (song, queries) per LRC file, or (None, error message).
+    Title and artist come from the [ti:] and [ar:] tags, or else from a file name like "Artist - Title.lrc".
+    """
+    parsed = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8-sig", errors="replace") as f:
+                song = parse_lrc(f)
+        except OSError as e:
+            parsed.append((None, f"{path}: {e}"))
+            continue
+        if not song.start_times:
+            parsed.append((None, f"{path}: no timed lines"))
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        artist, separator, title = name.partition(" - ")
+        song.title = song.title or (title if separator else name).strip()
+        song.artist = song.artist or (artist.strip() if separator else "")
+        parsed.append((song, [(song.title, song.artist)]))
+    return parsed
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+class LibraryArchive:
+    """
+    Bulk import and export of the lyrics library, as a folder of LRC files or as a JSONL archive (one song per line, .jsonl.gz is compressed).
+    Both stream: the import parses chunks of files or lines in a process pool with a bounded number of chunks in flight, and saves
+    them through LyricsManager.save_songs_to_database in batches, one transaction each; the export reads the database a batch at a time.
+    Songs whose queries are already in the database are skipped, so importing the same archive twice adds nothing.
+    """
+    def __init__(self, lyrics_manager: LyricsManager, workers: int = None, chunk_size: int = 200, batch_size: int = 2000,
+                 progress_callback: Optional[Callable[[Dict[str, int]], None]] = None):
+        """
+        Args:
+            lyrics_manager (LyricsManager): The library to import into or export from.
+            workers (int, optional): Parsing processes, os.cpu_count() by default. 1 parses in this process.
+            chunk_size (int): Files or lines sent to a worker at a time.
+            batch_size (int): Songs saved per transaction.
+            progress_callback (callable, optional): Called with the counts so far after every saved batch.
+        """
+        self.lyrics_manager = lyrics_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_jsonl(path: str) -> bool:
+        return path.endswith((".jsonl", ".jsonl.gz"))
+
+    @staticmethod
+    def _open(path: str, mode: str):
+        if path.endswith(".gz"):
+            return gzip.open(path, mode + "t", encoding="utf-8", newline="\n")
+        return open(path, mode, encoding="utf-8", newline="\n")
+
+    def import_path(self, path: str) -> Dict[str, int]:
+        """
+        Imports a JSONL archive (.jsonl or .jsonl.gz) or every .lrc file below a folder.
+
+        Returns:
+            Dict[str, int]: How many songs were read, imported, skipped as duplicates and could not be parsed ("failed").
+        """
+        if os.path.isdir(path):
+            paths = (os.path.join(root, name) for root, _, names in os.walk(path) for name in sorted(names) if name.lower().endswith(".lrc"))
+            return self._import(_chunks(paths, self.chunk_size), _parse_lrc_files)
+        if self.is_jsonl(path):
+            with self._open(path, "r") as f:
+                return self._import(_chunks((line for line in f if line.strip()), self.chunk_size), _parse_jsonl_lines)
+        raise ValueError(f"{path} is neither a folder of LRC files nor a .jsonl or .jsonl.gz archive")
+
+    def _parsed_chunks(self, chunks: Iterator[list], parse: Callable[[list], list]) -> Iterator[list]:
+        """The parsed chunks in input order. With several workers at most two chunks per worker are in flight, which bounds the memory."""
+        if self.workers <= 1:
+            yield from map(parse, chunks)
+            return
+        with concurrent.futures.ProcessPoolExecutor(self.workers) as executor:
+            in_flight = collections.deque(executor.submit(parse, chunk) for chunk in itertools.islice(chunks, 2 * self.workers))
+            while in_flight:
+                parsed = in_flight.popleft().result()
+                for chunk in itertools.islice(chunks, 1):
+                    in_flight.append(executor.submit(parse, chunk))
+                yield parsed
+
+    def _import(self, chunks: Iterator[list], parse: Callable[[list], list]) -> Dict[str, int]:
+        counts = {"read": 0, "imported": 0, "duplicates": 0, "failed": 0}
+        batch = []
+
+        def save():
+            imported = self.lyrics_manager.save_songs_to_database(batch)
+            counts["imported"] += imported
+            counts["duplicates"] += len(batch) - imported
+            batch.clear()
+            if self.progress_callback:
+                self.progress_callback(dict(counts))
+
+        for parsed in self._parsed_chunks(chunks, parse):
+            for song, queries in parsed:
+                counts["read"] += 1
+                if song is None:
+                    counts["failed"] += 1
+                    self.logger.warning(f"import: skipping {queries}")
+                    continue
+                batch.append((song, queries))
+            if len(batch) >= self.batch_size:
+                save()
+        if batch:
+            save()
+        self.logger.info(f"import: done, {counts}")
+        return counts
+
+    def export_jsonl(self, path: str) -> int:
+        """Writes every song to a JSONL archive, gzip-compressed if the path ends in .gz. Returns the number of songs."""
+        exported = 0
+        with self._open(path, "w") as f:
+            for song, queries in self.lyrics_manager.iter_songs_from_database():
+                f.write(json.dumps(song_to_record(song, queries), ensure_ascii=False) + "\n")
+                exported += 1
+        self.logger.info(f"export_jsonl: wrote {exported} songs to {path}")
+        return exported
+
+    def export_lrc(self, directory: str) -> int:
+        """
+        Writes every song to "<artist> - <title>.lrc" in a folder. LRC keeps the lyrics and word timings, but not the cover link,
+        the queries or gaps between lines; export_jsonl() keeps everything. Returns the number of songs.
+        Songs with the same name get "<name> (2).lrc" and so on, in the order of their ids, so exporting into the same folder again
+        overwrites the files of the last export instead of adding copies.
+        """
+        os.makedirs(directory, exist_ok=True)
+        exported = 0
+        # Names written by this export, case-insensitive like the file systems of Windows and macOS
+        used = set()
+        for song, _ in self.lyrics_manager.iter_songs_from_database():
+            name = _unsafe_file_name.sub("_", f"{song.artist} - {song.title}" if song.artist else song.title or "untitled").strip(" .")[:150]
+            file_name = name + ".lrc"
+            number = 1
+            while file_name.casefold() in used:
+                number += 1
+                file_name = f"{name} ({number}).lrc"
+            used.add(file_name.casefold())
+            with open(os.path.join(directory, file_name), "w", encoding="utf-8", newline="\n") as f:
+                f.write(format_lrc(song))
+            exported += 1
+        self.logger.info(f"export_lrc: wrote {exported} songs to {directory}")
+        return exported
@@ -0,0 +1,74 @@
+import dataclasses
+import json
+import logging
+import os
+import zipfile
+from typing import Iterator, Optional
+
+@dataclasses.dataclass
+class LibrarySong:
+    title: str
+    artist: str
+    path: str
+
+class LibraryScanner:
+    """Finds the custom songs installed for Beat Saber and Synth Riders and reads their title and artist the same way the games report them over the websocket.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def _read_json(self, data: bytes) -> Optional[dict]:
+        try:
+            return json.loads(data.decode("utf-8-sig"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def scan_beat_saber(self, custom_levels_path: str) -> Iterator[LibrarySong]:
+        """Yield the songs in a Beat Saber CustomLevels folder (one folder with an Info.dat per level)."""
+        for entry in sorted(os.scandir(custom_levels_path), key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            info_path = next((os.path.join(entry.path, name) for name in ("Info.dat", "info.dat") if os.path.isfile(os.path.join(entry.path, name))), None)
+            if info_path is None:
+                continue
+            with open(info_path, "rb") as f:
+                info = self._read_json(f.read())
+            if not isinstance(info, dict):
+                self.logger.warning(f"scan_beat_saber: could not read {info_path}")
+                continue
+            if "_songName" in info:
+                # Info.dat v2, BSDataPuller reports _songName and _songAuthorName
+                title, artist = info.get("_songName"), info.get("_songAuthorName")
+            else:
+                # Info.dat v4
+                song = info.get("song", {})
+                title, artist = song.get("title"), song.get("author")
+            if title:
+                yield LibrarySong(title=title, artist=artist or "", path=entry.path)
+
+    def _read_synth_meta(self, path: str) -> Optional[dict]:
+        if os.path.isdir(path):
+            meta_path = os.path.join(path, "beatmap.meta.bin")
+            if not os.path.isfile(meta_path):
+                return None
+            with open(meta_path, "rb") as f:
+                return self._read_json(f.read())
+        try:
+            with zipfile.ZipFile(path) as archive:
+                return self._read_json(archive.read("beatmap.meta.bin"))
+        except (zipfile.BadZipFile, KeyError):
+            return None
+
+    def scan_synth_riders(self, custom_songs_path: str) -> Iterator[LibrarySong]:
+        """Yield the songs in a Synth Riders CustomSongs folder (.synth archives or extracted map folders)."""
+        for entry in sorted(os.scandir(custom_songs_path), key=lambda e: e.name):
+            if not (entry.is_dir() or entry.name.lower().endswith(".synth")):
+                continue
+            meta = self._read_synth_meta(entry.path)
+            if not isinstance(meta, dict):
+                self.logger.warning(f"scan_synth_riders: could not read the metadata of {entry.path}")
+                continue
+            # The websocket mod reports Name as "song" and Author as "author"
+            title, artist = meta.get("Name"), meta.get("Author")
+            if title:
+                yield LibrarySong(title=title, artist=artist or "", path=entry.path)
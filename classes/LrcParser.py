@@ -0,0 +1,170 @@
+from array import array
+import io
+import re
+from typing import Iterable, List, Optional, Union
+
+from classes.Song import Song
+
+# [mm:ss], [mm:ss.x], [mm:ss.xx], [mm:ss.xxx] and the [mm:ss:xx] variant some editors write
+_time_tag = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?\]")
+# <mm:ss.xx> word timings of enhanced LRC
+_word_tag = re.compile(r"<(\d+):(\d{1,2})(?:[.:](\d{1,3}))?>")
+# [ar:Artist], [offset:+250], ...
+_meta_tag = re.compile(r"\[([A-Za-z#]+):([^\]]*)\]")
+
+# Used as length of the last line when neither the song length nor a [length:] tag is known
+DEFAULT_LAST_LINE_MS = 5000
+
+def _to_ms(minutes: str, seconds: str, fraction: Optional[str]) -> int:
+    ms = (int(minutes) * 60 + int(seconds)) * 1000
+    if fraction:
+        # .5 is 500 ms, .05 is 50 ms, .005 is 5 ms
+        ms += int(fraction.ljust(3, "0"))
+    return ms
+
+class LrcParser:
+    """Single-pass parser for (enhanced) LRC lyrics. Feed it one line at a time and call finish() to get the Song.
+
+    Understands fractional seconds with one to three digits, several timestamps in front of one line, [offset:], [length:], [ti:] and [ar:] tags,
+    and <mm:ss.xx> word timings. Malformed lines are skipped.
+    """
+    def __init__(self, song_length_ms: Optional[int] = None):
+        self.song_length_ms = song_length_ms
+        self.offset_ms = 0
+        self.title: Optional[str] = None
+        self.artist: Optional[str] = None
+        self.starts = array('i')
+        self.texts: List[str] = []
+        # Word timings are stored relative to the line start, so lines repeated under several timestamps can share them
+        self.word_counts = array('i')
+        self.word_deltas = array('i')
+        self.word_texts: List[str] = []
+        self.has_words = False
+        self.is_sorted = True
+
+    def _parse_meta(self, line: str) -> None:
+        match = _meta_tag.fullmatch(line.strip())
+        if not match:
+            return
+        key, value = match.group(1).lower(), match.group(2).strip()
+        try:
+            if key == "offset":
+                # A positive offset makes the lyrics appear sooner
+                self.offset_ms = int(value)
+            elif key == "length" and self.song_length_ms is None:
+                # mm:ss(.xx) or plain seconds
+                minutes, _, seconds = value.rpartition(":")
+                self.song_length_ms = int((int(minutes or 0) * 60 + float(seconds)) * 1000)
+            elif key == "ti" and value:
+                self.title = value
+            elif key == "ar" and value:
+                self.artist = value
+        except ValueError:
+            pass
+
+    def feed(self, line: str) -> None:
+        """Parse one line of LRC."""
+        times = []
+        position = 0
+        while True:
+            match = _time_tag.match(line, position)
+            if not match:
+                break
+            times.append(_to_ms(*match.groups()))
+            position = match.end()
+        if not times:
+            self._parse_meta(line)
+            return
+
+        rest = line[position:]
+        words = []
+        if "<" in rest:
+            parts = _word_tag.split(rest)
+            # split() gives text, then (minutes, seconds, fraction, text) for every tag
+            text = parts[0]
+            for i in range(1, len(parts), 4):
+                word = parts[i + 3]
+                text += word
+                if word.strip():
+                    words.append((_to_ms(parts[i], parts[i + 1], parts[i + 2]), word.strip()))
+        else:
+            text = rest
+        text = text.strip()
+
+        first = times[0]
+        for time in times:
+            start = max(0, time - self.offset_ms)
+            if self.starts and start < self.starts[-1]:
+                self.is_sorted = False
+            self.starts.append(start)
+            self.texts.append(text)
+            self.word_counts.append(len(words))
+            for word_time, word in words:
+                # Word tags are absolute for the first timestamp of the line
+                self.word_deltas.append(word_time - first)
+                self.word_texts.append(word)
+        if words:
+            self.has_words = True
+
+    def finish(self) -> Song:
+        """Return the parsed lines as a Song. Every line ends where the next one starts, the last one at the end of the song."""
+        n = len(self.starts)
+        order = range(n)
+        word_first = array('i', [0]) * n
+        total = 0
+        for i, count in enumerate(self.word_counts):
+            word_first[i] = total
+            total += count
+        if not self.is_sorted:
+            # Lines with several timestamps; sorted() is stable, so lines with the same start keep their order
+            order = sorted(order, key=self.starts.__getitem__)
+
+        starts = array('i', (self.starts[i] for i in order))
+        texts = [self.texts[i] for i in order]
+        ends = array('i', starts[1:])
+        if n:
+            last = starts[-1]
+            ends.append(self.song_length_ms if self.song_length_ms and self.song_length_ms > last else last + DEFAULT_LAST_LINE_MS)
+
+        word_offsets = word_starts = word_texts = None
+        if self.has_words:
+            word_offsets = array('i', [0])
+            word_starts = array('i')
+            word_texts = []
+            for line_index, i in enumerate(order):
+                lo = word_first[i]
+                for j in range(lo, lo + self.word_counts[i]):
+                    word_starts.append(max(0, starts[line_index] + self.word_deltas[j]))
+                    word_texts.append(self.word_texts[j])
+                word_offsets.append(len(word_starts))
+        return Song.from_arrays(starts, ends, texts, title=self.title, artist=self.artist, word_offsets=word_offsets, word_starts=word_starts, word_texts=word_texts)
+
+def parse_lrc(lrc: Union[str, Iterable[str]], song_length_ms: Optional[int] = None) -> Song:
+    """Parse LRC lyrics given as one string or as an iterable of lines (e.g. an open file) into a Song."""
+    parser = LrcParser(song_length_ms)
+    for line in io.StringIO(lrc) if isinstance(lrc, str) else lrc:
+        parser.feed(line)
+    return parser.finish()
+
+def _format_time(ms: int) -> str:
+    minutes, ms = divmod(ms, 60000)
+    return f"{minutes:02d}:{ms // 1000:02d}.{ms % 1000:03d}"
+
+def format_lrc(song: Song) -> str:
+    """
+    Write a Song as (enhanced) LRC that parse_lrc reads back: [ti:], [ar:] and [length:] tags, millisecond timestamps and <mm:ss.xxx> word timings.
+    LRC has no end times, so a line ends where the next one starts; a gap before the next line is lost.
+    """
+    lines = []
+    if song.title:
+        lines.append(f"[ti:{song.title}]")
+    if song.artist:
+        lines.append(f"[ar:{song.artist}]")
+    if song.end_times:
+        lines.append(f"[length:{_format_time(song.end_times[-1])}]")
+    for i, (start, text) in enumerate(zip(song.start_times, song.texts)):
+        words = song.words(i)
+        if words:
+            text = " ".join(f"<{_format_time(word_start)}>{word}" for word_start, word in words)
+        lines.append(f"[{_format_time(start)}]{text}")
+    return "\n".join(lines) + "\n"
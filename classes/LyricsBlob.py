@@ -0,0 +1,108 @@
+from array import array
+import struct
+import sys
+import zlib
+
+from classes.Song import Song
+
+# Layout (all integers little-endian):
+#   magic "LYB1" | flags (uint8) | payload, zlib-compressed if flags & FLAG_ZLIB
+# payload:
+#   line count n (uint32)
+#   n x int32 start deltas (first one relative to 0)
+#   n x int32 line durations
+#   n x uint32 byte lengths of the texts, followed by the concatenated UTF-8 texts
+#   if flags & FLAG_WORDS, word timings:
+#     n x uint32 number of words per line
+#     w x int32 word starts relative to the start of their line
+#     w x uint32 byte lengths of the words, followed by the concatenated UTF-8 words
+MAGIC = b"LYB1"
+FLAG_ZLIB = 1
+FLAG_WORDS = 2
+_header = struct.Struct("<4sB")
+_count = struct.Struct("<I")
+
+def _to_le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_le(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def encode(song: Song, compress: bool = True) -> bytes:
+    """Pack the timeline of a song into one blob."""
+    starts = song.start_times
+    deltas = array('i', starts)
+    for i in range(len(deltas) - 1, 0, -1):
+        deltas[i] -= deltas[i - 1]
+    durations = array('i', (end - start for start, end in zip(starts, song.end_times)))
+    texts = [text.encode("utf-8") for text in song.texts]
+    lengths = array('I', (len(text) for text in texts))
+    sections = [_count.pack(len(starts)), _to_le(deltas), _to_le(durations), _to_le(lengths), *texts]
+    flags = 0
+    if song.has_words:
+        offsets = song.word_offsets
+        word_counts = array('I', (offsets[i + 1] - offsets[i] for i in range(len(starts))))
+        word_deltas = array('i', (song.word_starts[j] - starts[i] for i in range(len(starts)) for j in range(offsets[i], offsets[i + 1])))
+        words = [word.encode("utf-8") for word in song.word_texts]
+        word_lengths = array('I', (len(word) for word in words))
+        sections += [_to_le(word_counts), _to_le(word_deltas), _to_le(word_lengths), *words]
+        flags |= FLAG_WORDS
+    payload = b"".join(sections)
+    if compress:
+        payload = zlib.compress(payload, 6)
+        flags |= FLAG_ZLIB
+    return _header.pack(MAGIC, flags) + payload
+
+def decode(blob: bytes, title: str = None, artist: str = None, cover_link: str = None) -> Song:
+    """Unpack a blob created by encode() into a Song."""
+    magic, flags = _header.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError(f"not a lyrics blob: {magic!r}")
+    payload = memoryview(blob)[_header.size:]
+    if flags & FLAG_ZLIB:
+        payload = memoryview(zlib.decompress(payload))
+    n, = _count.unpack_from(payload)
+    offset = _count.size
+    starts = _from_le('i', payload[offset:offset + 4 * n])
+    offset += 4 * n
+    durations = _from_le('i', payload[offset:offset + 4 * n])
+    offset += 4 * n
+    lengths = _from_le('I', payload[offset:offset + 4 * n])
+    offset += 4 * n
+
+    for i in range(1, n):
+        starts[i] += starts[i - 1]
+    ends = array('i', (start + duration for start, duration in zip(starts, durations)))
+    texts = []
+    for length in lengths:
+        texts.append(str(payload[offset:offset + length], "utf-8"))
+        offset += length
+
+    word_offsets = word_starts = word_texts = None
+    if flags & FLAG_WORDS:
+        word_counts = _from_le('I', payload[offset:offset + 4 * n])
+        offset += 4 * n
+        w = sum(word_counts)
+        word_deltas = _from_le('i', payload[offset:offset + 4 * w])
+        offset += 4 * w
+        word_lengths = _from_le('I', payload[offset:offset + 4 * w])
+        offset += 4 * w
+        word_offsets = array('i', [0])
+        word_starts = array('i')
+        for i, count in enumerate(word_counts):
+            for j in range(word_offsets[-1], word_offsets[-1] + count):
+                word_starts.append(starts[i] + word_deltas[j])
+            word_offsets.append(word_offsets[-1] + count)
+        word_texts = []
+        for length in word_lengths:
+            word_texts.append(str(payload[offset:offset + length], "utf-8"))
+            offset += length
+    return Song.from_arrays(starts, ends, texts, cover_link=cover_link, title=title, artist=artist,
+                            word_offsets=word_offsets, word_starts=word_starts, word_texts=word_texts)
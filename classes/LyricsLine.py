@@ -1,11 +1,14 @@
 import dataclasses
+from typing import List, Optional, Tuple
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class LyricsLine:
     text: str
     startMs: int
     endMs: int
     durationMs: int
+    # Word-level timing (enhanced LRC): (startMs, word) pairs, None if the line is only synced as a whole
+    words: Optional[List[Tuple[int, str]]] = None
     
     def convert_ms_to_human_readable(self, ms: int) -> str:
         seconds = ms // 1000
@@ -1,173 +1,413 @@
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
-import requests
+import collections
 import json
 import os
 import logging
 import time
-from typing import List
-import re
+from typing import Iterator, List, Optional, Sequence, Tuple
 import sqlite3
-import syncedlyrics
+import threading
 
+from classes.DatabaseMigrations import migrate
+from classes import LyricsBlob
+from classes.HttpClient import DeadlineExceeded, HttpClient, RateLimited
+from classes.QueryNormalizer import fts_trigram_query, normalize_artist, normalize_title, query_key, similarity
 from classes.Song import Song
 from classes.LyricsLine import LyricsLine
+from classes.Metrics import METRICS
+from classes.LyricsProviders import LyricsProvider, LyricsProviderEngine, SyncedLyricsProvider
+from classes.SpotifyAppToken import SpotifyAppToken
 
 class LyricsManager:
     """LyricsManager class to manage lyrics from Spotify and Netease. Call search_on_spotify() or search_on_netease() to get lyrics for a song.
     """
-    def __init__(self, spotify_client_id: str, spotify_client_secret: str, spotify_dc_cookie: str):
+    STORAGE_ROWS = "rows"
+    STORAGE_BLOB = "blob"
+
+    # Reasons why a query is in the negative cache, and how long the first miss is remembered (doubled with every further miss)
+    MISS_NO_SPOTIFY_MATCH = "no_spotify_match"
+    MISS_NO_SYNCED_LYRICS = "no_synced_lyrics"
+    MISS_PROVIDER_ERROR = "provider_error"
+    MISS_BASE_TTL = {
+        MISS_NO_SPOTIFY_MATCH: 24 * 3600,
+        MISS_NO_SYNCED_LYRICS: 24 * 3600,
+        MISS_PROVIDER_ERROR: 5 * 60,
+    }
+    MISS_MAX_TTL = 30 * 24 * 3600
+
+    def __init__(self, spotify_client_id: str, spotify_client_secret: str, spotify_dc_cookie: str, db_path: str = None, storage_mode: str = STORAGE_ROWS, compress_blobs: bool = True, providers: Sequence[LyricsProvider] = None, token_cache_path: str = None, http: HttpClient = None):
+        """
+        Nothing here talks to the network or imports spotipy, so the apps start without waiting for Spotify: the client is created on the first search.
+        'token_cache_path' is where the Spotify token is kept between runs, by default .spotify_token.json next to the database.
+        'http' is the connection pool and rate limiter that Spotify and the default providers share, by default a new HttpClient.
+        """
         self.spotify_client_id = spotify_client_id
         self.spotify_client_secret = spotify_client_secret
         self.spotify_dc_cookie = spotify_dc_cookie
-        self.spotify = spotipy.Spotify(auth_manager = SpotifyOAuth(client_id = self.spotify_client_id,
-                                                                   client_secret = self.spotify_client_secret,
-                                                                   redirect_uri = "http://localhost:8080",
-                                                                   scope = "user-library-read")
-                                       )
-        self.db_path = os.path.join(os.path.dirname(__file__), "../lyrics.db")
+        self._spotify = None
+        self._spotify_lock = threading.Lock()
+        self.http = http or HttpClient()
+        # All lyrics providers are asked at once, the best synced lyrics win
+        if providers is None:
+            providers = [SyncedLyricsProvider(name, http=self.http) for name in ("Lrclib", "NetEase", "Musixmatch")]
+        self.lyrics_engine = LyricsProviderEngine(providers)
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), "../lyrics.db")
+        # A public track search only needs a token of the app, not a user login
+        self.spotify_token = SpotifyAppToken(spotify_client_id, spotify_client_secret, cache_path=token_cache_path or os.path.join(os.path.dirname(os.path.abspath(self.db_path)), ".spotify_token.json"), http=self.http)
+        # How new songs are stored: one row per line in lyrics_lines, or one packed blob per song in lyrics_blobs. Both are always readable.
+        self.storage_mode = storage_mode
+        self.compress_blobs = compress_blobs
+        # One long-lived connection per thread (Tk thread, resolver workers, ...), all of them are closed by close()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self._initialize_database()
         logging.basicConfig(level = logging.INFO, format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__) 
         
+    @property
+    def spotify(self):
+        """The spotipy client, created (and spotipy imported) on first use."""
+        if self._spotify is None:
+            with self._spotify_lock:
+                if self._spotify is None:
+                    import spotipy
+                    # Retries, back-off and timeouts are up to the shared session, not to spotipy
+                    self._spotify = spotipy.Spotify(auth_manager=self.spotify_token, requests_session=self.http.session(), retries=0, status_retries=0)
+        return self._spotify
+
+    def warm_up(self) -> threading.Thread:
+        """Gets the slow parts of the first search out of the way in the background: the Spotify token, and importing spotipy and the lyrics providers."""
+        def run():
+            self.spotify_token.prefetch()
+            self.spotify
+            self.lyrics_engine.warm_up()
+        thread = threading.Thread(target=run, name="LyricsManager.warm_up", daemon=True)
+        thread.start()
+        return thread
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the database connection of the calling thread, opening and tuning it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            # WAL lets the game apps read while the database viewer writes, and the other way round
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-16000")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close the database connections of all threads, the lyrics provider threads and the HTTP connections."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+        self.lyrics_engine.shutdown()
+        self.http.close()
+
     def _initialize_database(self):
-        """Create SQLite database tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS songs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                artist TEXT,
-                cover_link TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS lyrics_lines (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                song_id INTEGER,
-                text TEXT,
-                startMs INTEGER,
-                endMs INTEGER,
-                durationMs INTEGER,
-                FOREIGN KEY(song_id) REFERENCES songs(id)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS querys (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                query_title TEXT,
-                query_main_artist TEXT,
-                song_id INTEGER,
-                FOREIGN KEY(song_id) REFERENCES songs(id)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        """Create the SQLite database tables or migrate them to the latest schema version."""
+        migrate(self._connection())
         
     def save_song_to_database(self, song: Song, query_title: str, query_main_artist: str) -> None:
-        """Save a song and its lyrics to the SQLite database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # check if song is already in database
-        cursor.execute('''
-            SELECT * FROM querys
-            WHERE query_title = ? AND query_main_artist = ?
-        ''', (query_title, query_main_artist))
-        result = cursor.fetchone()
-        if result:
-            self.logger.info(f"save_song_to_database: {query_title} - {query_main_artist} already in database")
-        else:
-            self.logger.info(f"save_song_to_database: saving {query_title} - {query_main_artist} to database")
+        """Save a song and its lyrics to the SQLite database in a single transaction."""
+        conn = self._connection()
+        with conn:
+            cursor = conn.cursor()
+            # check if song is already in database
+            key = query_key(query_title, query_main_artist)
             cursor.execute('''
-                INSERT INTO songs (title, artist, cover_link)
-                VALUES (?, ?, ?)
-            ''', (song.title, song.artist, song.cover_link))
-            song_id = cursor.lastrowid
-            for line in song.lines:
-                cursor.execute('''
-                    INSERT INTO lyrics_lines (song_id, text, startMs, endMs, durationMs)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (song_id, line.text, line.startMs, line.endMs, line.durationMs))
+                SELECT song_id FROM querys
+                WHERE query_key = ?
+            ''', (key,))
+            result = cursor.fetchone()
+            if result:
+                self.logger.info(f"save_song_to_database: {query_title} - {query_main_artist} already in database")
+                return
+            self.logger.info(f"save_song_to_database: saving {query_title} - {query_main_artist} to database")
+            self._insert_song(cursor, song, [(query_title, query_main_artist, key)])
+
+    def save_songs_to_database(self, songs: Sequence[Tuple[Song, Sequence[Tuple[str, str]]]]) -> int:
+        """Save many songs in a single transaction, for bulk imports. Each song comes with the (title, main artist) queries it answers;
+        a song is skipped if any of its queries is already in the database (or earlier in 'songs').
+
+        Returns:
+            int: The number of songs saved.
+        """
+        conn = self._connection()
+        saved = 0
+        with conn:
+            cursor = conn.cursor()
+            keyed = [(song, [(title, artist, query_key(title, artist)) for title, artist in queries]) for song, queries in songs]
+            all_keys = [key for _, queries in keyed for _, _, key in queries]
+            known = set()
+            # SQLite allows 999 parameters per statement in older versions
+            for i in range(0, len(all_keys), 500):
+                chunk = all_keys[i:i + 500]
+                cursor.execute(f"SELECT query_key FROM querys WHERE query_key IN ({','.join('?' * len(chunk))})", chunk)
+                known.update(row[0] for row in cursor.fetchall())
+            for song, queries in keyed:
+                if not queries or any(key in known for _, _, key in queries):
+                    continue
+                known.update(key for _, _, key in queries)
+                self._insert_song(cursor, song, queries)
+                saved += 1
+        self.logger.info(f"save_songs_to_database: saved {saved} of {len(keyed)} songs")
+        return saved
+
+    def _insert_song(self, cursor: sqlite3.Cursor, song: Song, queries: Sequence[Tuple[str, str, str]]) -> int:
+        """Insert a song, its lyrics and its (title, main artist, key) queries, inside the caller's transaction. Returns the song id."""
+        cursor.execute('''
+            INSERT INTO songs (title, artist, cover_link)
+            VALUES (?, ?, ?)
+        ''', (song.title, song.artist, song.cover_link))
+        song_id = cursor.lastrowid
+        # lyrics_lines has no place for word timings, so those songs are always stored as blobs
+        if self.storage_mode == self.STORAGE_BLOB or song.has_words:
             cursor.execute('''
-                INSERT INTO querys (query_title, query_main_artist, song_id)
-                VALUES (?, ?, ?)
-            ''', (query_title, query_main_artist, song_id))
-            conn.commit()
-        self.logger.debug("save_song_to_database, closing connection to database")
-        conn.close()
-        self.logger.info(f"save_song_to_database: closed connection to database")
-        
+                INSERT INTO lyrics_blobs (song_id, data)
+                VALUES (?, ?)
+            ''', (song_id, LyricsBlob.encode(song, self.compress_blobs)))
+        else:
+            cursor.executemany('''
+                INSERT INTO lyrics_lines (song_id, text, startMs, endMs, durationMs)
+                VALUES (?, ?, ?, ?, ?)
+            ''', ((song_id, text, start, end, end - start) for text, start, end in zip(song.texts, song.start_times, song.end_times)))
+        cursor.execute('''
+            INSERT INTO library_index (rowid, title, artist, lyrics)
+            VALUES (?, ?, ?, ?)
+        ''', (song_id, song.title, song.artist, "\n".join(song.texts)))
+        cursor.executemany('''
+            INSERT INTO querys (query_title, query_main_artist, song_id, query_key)
+            VALUES (?, ?, ?, ?)
+        ''', ((title, artist, song_id, key) for title, artist, key in queries))
+        cursor.executemany('''
+            DELETE FROM negative_cache
+            WHERE query_key = ?
+        ''', ((key,) for _, _, key in queries))
+        index_rows = {(normalize_title(title), normalize_artist(artist), song_id) for title, artist, _ in queries}
+        index_rows.add((normalize_title(song.title), normalize_artist(song.artist), song_id))
+        cursor.executemany('''
+            INSERT INTO query_entries (title, artist, song_id)
+            VALUES (?, ?, ?)
+        ''', index_rows)
+        return song_id
+
+    def has_query(self, title: str, main_artist: str) -> bool:
+        """Check whether the lyrics for a query are already in the database, without loading them."""
+        cursor = self._connection().execute('''
+            SELECT 1 FROM querys
+            WHERE query_key = ?
+        ''', (query_key(title, main_artist),))
+        return cursor.fetchone() is not None
+
     def search_in_database(self, title: str, main_artist: str) -> Song:
         """Search for a song in the SQLite database and return it if found."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._connection().cursor()
         cursor.execute('''
-            SELECT * FROM querys
-            WHERE query_title = ? AND query_main_artist = ?
-        ''', (title, main_artist))
+            SELECT song_id FROM querys
+            WHERE query_key = ?
+        ''', (query_key(title, main_artist),))
         result = cursor.fetchone()
         if not result:
-            self.logger.error(f"search_in_database: failed to find {title} - {main_artist} when searching in query table")
+            self.logger.info(f"search_in_database: {title} - {main_artist} not in query table")
             return None
-        querys_id, query_title, query_main_artist, song_id = result
+        song_id, = result
         self.logger.info(f"search_in_database: found {title} - {main_artist} in query table with song_id {song_id}")
+        return self._load_song(cursor, song_id)
+
+    def search_in_database_fuzzy(self, title: str, main_artist: str, threshold: float = 0.9) -> Tuple[Song, float]|None:
+        """Find a song in the database whose normalized title and artist are close to the query, using the trigram index.
+        A match with a confidence of at least threshold is stored as an alias of the query, so the next lookup is exact.
+
+        Returns:
+            Tuple[Song, float]|None: The song and the confidence of the match between 0 and 1, or None.
+        """
+        wanted_title, wanted_artist = normalize_title(title), normalize_artist(main_artist)
+        if len(wanted_title) < 3:
+            return None
+        cursor = self._connection().cursor()
+        try:
+            cursor.execute('''
+                SELECT title, artist, song_id FROM query_index
+                WHERE query_index MATCH ?
+                ORDER BY rank
+                LIMIT 50
+            ''', ("title : (" + fts_trigram_query(wanted_title) + ")",))
+            candidates = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            self.logger.debug(f"search_in_database_fuzzy: trigram index not usable, error: {e}")
+            return None
+        best, best_confidence = None, 0.0
+        for candidate_title, candidate_artist, song_id in candidates:
+            confidence = 0.7 * similarity(wanted_title, candidate_title) + 0.3 * similarity(wanted_artist, candidate_artist)
+            if confidence > best_confidence:
+                best, best_confidence = song_id, confidence
+        if best is None or best_confidence < threshold:
+            self.logger.info(f"search_in_database_fuzzy: no close match for {title} - {main_artist} (best confidence {best_confidence:.2f})")
+            return None
+        song = self._load_song(cursor, best)
+        if song is None:
+            return None
+        self.logger.info(f"search_in_database_fuzzy: matched {title} - {main_artist} to song_id {best} with confidence {best_confidence:.2f}")
+        conn = self._connection()
+        with conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO querys (query_title, query_main_artist, song_id, query_key)
+                VALUES (?, ?, ?, ?)
+            ''', (title, main_artist, best, query_key(title, main_artist)))
+        return song, best_confidence
+
+    def _load_song(self, cursor: sqlite3.Cursor, song_id: int) -> Song|None:
+        """Load a song and its lyrics by id."""
         cursor.execute('''
-            SELECT * FROM songs
+            SELECT id, title, artist, cover_link FROM songs
             WHERE id = ?
         ''', (song_id,))
         result = cursor.fetchone()
         if not result:
-            self.logger.error(f"search_in_database: failed to find {title} - {main_artist} when searching in songs table with song_id {song_id}")
+            self.logger.error(f"_load_song: failed to find song_id {song_id} in songs table")
             return None
         song_id, title, artist, cover_link = result
-        self.logger.info(f"search_in_database: found {title} - {artist} in songs table with song_id {song_id}")
+        self.logger.info(f"_load_song: found {title} - {artist} in songs table with song_id {song_id}")
+        cover_link = cover_link if cover_link != 'None' else None
         cursor.execute('''
-            SELECT * FROM lyrics_lines
+            SELECT data FROM lyrics_blobs
+            WHERE song_id = ?
+        ''', (song_id,))
+        result = cursor.fetchone()
+        if result:
+            return LyricsBlob.decode(result[0], title=title, artist=artist, cover_link=cover_link)
+        cursor.execute('''
+            SELECT startMs, endMs, text FROM lyrics_lines
             WHERE song_id = ?
             ORDER BY startMs ASC
         ''', (song_id,))
-        lyrics_lines = []
-        for line_data in cursor.fetchall():
-            lyrics_lines.append(LyricsLine(
-                text=line_data[2],
-                startMs=line_data[3],
-                endMs=line_data[4],
-                durationMs=line_data[5]
-            ))
-        conn.close()
-        return Song(title=title, artist=artist, cover_link=cover_link if cover_link != 'None' else None, lines=lyrics_lines)
+        rows = cursor.fetchall()
+        return Song.from_arrays([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows], title=title, artist=artist, cover_link=cover_link)
+
+    def iter_songs_from_database(self, batch_size: int = 500) -> Iterator[Tuple[Song, List[Tuple[str, str]]]]:
+        """Yield every song in the database with the (title, main artist) queries that point to it, in id order.
+        Songs are read batch_size at a time, so memory stays the same however large the library is.
+        """
+        cursor = self._connection().cursor()
+        last_id = 0
+        while True:
+            cursor.execute('''
+                SELECT id, title, artist, cover_link FROM songs
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            marks = ",".join("?" * len(rows))
+            song_ids = [row[0] for row in rows]
+            cursor.execute(f"SELECT song_id, data FROM lyrics_blobs WHERE song_id IN ({marks})", song_ids)
+            blobs = dict(cursor.fetchall())
+            lines = collections.defaultdict(list)
+            cursor.execute(f"SELECT song_id, startMs, endMs, text FROM lyrics_lines WHERE song_id IN ({marks}) ORDER BY song_id, startMs", song_ids)
+            for song_id, start, end, text in cursor.fetchall():
+                lines[song_id].append((start, end, text))
+            queries = collections.defaultdict(list)
+            cursor.execute(f"SELECT song_id, query_title, query_main_artist FROM querys WHERE song_id IN ({marks}) ORDER BY id", song_ids)
+            for song_id, title, artist in cursor.fetchall():
+                queries[song_id].append((title, artist))
+            for song_id, title, artist, cover_link in rows:
+                cover_link = cover_link if cover_link != 'None' else None
+                if song_id in blobs:
+                    song = LyricsBlob.decode(blobs[song_id], title=title, artist=artist, cover_link=cover_link)
+                else:
+                    song_lines = lines.pop(song_id, ())
+                    song = Song.from_arrays([line[0] for line in song_lines], [line[1] for line in song_lines], [line[2] for line in song_lines], title=title, artist=artist, cover_link=cover_link)
+                yield song, queries.pop(song_id, [])
+
+    def convert_lines_to_blobs(self, batch_size: int = 500) -> int:
+        """Move every song that is still stored in lyrics_lines into lyrics_blobs, batch_size songs per transaction. Returns the number of converted songs."""
+        conn = self._connection()
+        converted = 0
+        while True:
+            with conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT DISTINCT song_id FROM lyrics_lines
+                    ORDER BY song_id
+                    LIMIT ?
+                ''', (batch_size,))
+                song_ids = [row[0] for row in cursor.fetchall()]
+                if not song_ids:
+                    break
+                blobs = []
+                for song_id in song_ids:
+                    cursor.execute('''
+                        SELECT startMs, endMs, text FROM lyrics_lines
+                        WHERE song_id = ?
+                        ORDER BY startMs ASC
+                    ''', (song_id,))
+                    rows = cursor.fetchall()
+                    song = Song.from_arrays([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+                    blobs.append((song_id, LyricsBlob.encode(song, self.compress_blobs)))
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO lyrics_blobs (song_id, data)
+                    VALUES (?, ?)
+                ''', blobs)
+                cursor.executemany('''
+                    DELETE FROM lyrics_lines
+                    WHERE song_id = ?
+                ''', ((song_id,) for song_id in song_ids))
+            converted += len(song_ids)
+            self.logger.info(f"convert_lines_to_blobs: converted {converted} songs")
+        return converted
     
+    def get_negative_cache(self, title: str, main_artist: str) -> Optional[str]:
+        """Return the reason why the last online search for a query failed, or None if it may be searched again."""
+        cursor = self._connection().execute('''
+            SELECT reason FROM negative_cache
+            WHERE query_key = ? AND retry_after > ?
+        ''', (query_key(title, main_artist), time.time()))
+        result = cursor.fetchone()
+        return result[0] if result else None
+
+    def record_miss(self, title: str, main_artist: str, reason: str) -> None:
+        """Remember that the online search for a query failed. The query is skipped for a time that doubles with every miss."""
+        conn = self._connection()
+        with conn:
+            key = query_key(title, main_artist)
+            cursor = conn.execute('''
+                SELECT failures FROM negative_cache
+                WHERE query_key = ?
+            ''', (key,))
+            result = cursor.fetchone()
+            failures = (result[0] if result else 0) + 1
+            ttl = min(self.MISS_BASE_TTL.get(reason, self.MISS_BASE_TTL[self.MISS_PROVIDER_ERROR]) * 2 ** (failures - 1), self.MISS_MAX_TTL)
+            now = time.time()
+            conn.execute('''
+                INSERT OR REPLACE INTO negative_cache (query_key, reason, failures, last_failure, retry_after)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (key, reason, failures, now, now + ttl))
+        METRICS.inc("lyrics_misses_total", reason=reason)
+        self.logger.info(f"record_miss: {title} - {main_artist} failed {failures} times ({reason}), retrying in {ttl / 3600:.1f} h")
+
     def get_lyrics_from_syncedlyrics(self, title: str, main_artist: str, song_length_in_ms: int) -> List[LyricsLine]|None:
-        """Search for lyrics with Python package syncedlyrics (https://github.com/moehmeni/syncedlyrics) and return them as a list of LyricsLine objects."""
-        query = title + " " + main_artist
-        lyrics_text = syncedlyrics.search(query, allow_plain_format=False, providers=['Lrclib'])
-        if lyrics_text is None:
+        """Search for synced lyrics with all configured providers (by default the ones of https://github.com/moehmeni/syncedlyrics) and return the best ones as a list of LyricsLine objects."""
+        song = self.get_synced_song(title, main_artist, song_length_in_ms)
+        return list(song.lines) if song is not None else None
+
+    def get_synced_song(self, title: str, main_artist: str, song_length_in_ms: int) -> Song|None:
+        """Like get_lyrics_from_syncedlyrics(), but returns the lyrics as a Song, including word timings if the provider has them."""
+        result = self.lyrics_engine.search(title, main_artist, song_length_in_ms)
+        if result is None:
             return None
-        
-        pattern = re.compile(r'\[(\d{2}):(\d{2})\.(\d{2})\] (.+)')
-        matches = pattern.findall(lyrics_text)
-        lyrics_lines = []
-
-        def timestamp_to_ms(minutes: int, seconds: int, milliseconds: int) -> int:
-            """Convert timestamp to milliseconds."""
-            return (minutes * 60 * 1000) + (seconds * 1000) + milliseconds * 10
-
-        for i, match in enumerate(matches):
-            minutes, seconds, centiseconds, text = match
-            start_ms = timestamp_to_ms(int(minutes), int(seconds), int(centiseconds))
-            
-            # Determine end time or use a default for the last line
-            if i + 1 < len(matches):
-                next_minutes, next_seconds, next_centiseconds, _ = matches[i + 1]
-                end_ms = timestamp_to_ms(int(next_minutes), int(next_seconds), int(next_centiseconds))
-            else:
-                end_ms = song_length_in_ms
-            
-            duration_ms = end_ms - start_ms
-            lyrics_lines.append(LyricsLine(text=text, startMs=start_ms, endMs=end_ms, durationMs=duration_ms))
-        
-        return lyrics_lines
+        self.logger.info(f"get_synced_song: using lyrics from {result.provider} for {title} - {main_artist}")
+        return result.song
 
     def search_on_spotify_with_syncedlyrics_provider(self, title: str, main_artist: str, limit: int = 1) -> Song|None:
         """Search for a song on Spotify and get the song with lyrics, cover link, title and artist. The best match is selected based on popularity from the <limit> best matches. The lyrics comes from the syncedlyrics package.
@@ -179,29 +419,49 @@ class LyricsManager:
         Returns:
             Song|None: A Song object or None if the song could not be found.
         """
+        return self.search_on_spotify_with_reason(title, main_artist, limit)[0]
+
+    def search_on_spotify_with_reason(self, title: str, main_artist: str, limit: int = 1) -> Tuple[Song|None, str|None]:
+        """Like search_on_spotify_with_syncedlyrics_provider(), but also tells why nothing was found.
+
+        Returns:
+            Tuple[Song|None, str|None]: The song and None, or None and one of the MISS_* reasons.
+        """
         query = title + " " + main_artist
         self.logger.info(f"search_on_spotify_with_syncedlyrics_provider: searching for {query}")
         try:
-            result = self.spotify.search(query, limit = limit, type = "track")
+            with METRICS.span("spotify.search"):
+                result = self.spotify.search(query, limit = limit, type = "track")
             if len(result["tracks"]["items"]) == 0:
                 self.logger.error(f"search_on_spotify_with_syncedlyrics_provider: failed to find {query}")
-                return None
+                return None, self.MISS_NO_SPOTIFY_MATCH
             # sort result by popularity - best match has highest popularity
             result["tracks"]["items"].sort(key = lambda x: x["popularity"], reverse = True)
             title = result["tracks"]["items"][0]["name"].split("(")[0].split(" - ")[0]
             artists = [artist["name"] for artist in result["tracks"]["items"][0]["artists"]]
             coverLink = result["tracks"]["items"][0]["album"]["images"][0]["url"]
             self.logger.info(f"search_on_spotify_with_syncedlyrics_provider: found {title} by {artists[0]} with cover link {coverLink}")
-            lyrics_lines = self.get_lyrics_from_syncedlyrics(title, artists[0], result["tracks"]["items"][0]["duration_ms"])
-            if not lyrics_lines:
+            with METRICS.span("providers.search"):
+                found, failed = self.lyrics_engine.search_with_failures(title, artists[0], result["tracks"]["items"][0]["duration_ms"])
+            song = found.song if found is not None else None
+            if song is None or not song.start_times:
+                if failed:
+                    # A provider that failed or was too slow may have them next time, which is not worth a day in the negative cache
+                    self.logger.error(f"search_on_spotify_with_syncedlyrics_provider: no lyrics for {query}, {', '.join(failed)} failed")
+                    return None, self.MISS_PROVIDER_ERROR
                 self.logger.error(f"search_on_spotify_with_syncedlyrics_provider: failed to get lyrics for {query}")
-                return None
-            return Song(
-                lines = lyrics_lines, 
-                cover_link = coverLink, 
-                title = title, 
-                artist = ", ".join(artists)
-            )
+                return None, self.MISS_NO_SYNCED_LYRICS
+            self.logger.info(f"search_on_spotify_with_syncedlyrics_provider: using lyrics from {found.provider} for {query}")
+            song.cover_link = coverLink
+            song.title = title
+            song.artist = ", ".join(artists)
+            return song, None
+        except RateLimited as e:
+            self.logger.warning(f"search_on_spotify_with_syncedlyrics_provider: {e.host} is rate limiting, giving up on {query} for now")
+            return None, self.MISS_PROVIDER_ERROR
+        except DeadlineExceeded as e:
+            self.logger.warning(f"search_on_spotify_with_syncedlyrics_provider: gave up on {query}: {e}")
+            return None, self.MISS_PROVIDER_ERROR
         except Exception as e:
             self.logger.error(f"search_on_spotify_with_syncedlyrics_provider: failed to search for {query}, error: {e}")
-            return None
\ No newline at end of file
+            return None, self.MISS_PROVIDER_ERROR
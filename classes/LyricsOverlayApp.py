@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import tkinter as tk
+from typing import List, Sequence, Type
+
+from classes.EventLog import EventLogWriter
+from classes.GameAdapters import GameAdapter
+from classes.GameEvent import GameEvent
+from classes.GameRuntime import GameRuntime
+from classes.LatencyReport import LatencyReport
+from classes.LyricsDisplay import LyricsDisplay
+from classes.LyricsManager import LyricsManager
+from classes.LyricsResolver import LookupResult, LyricsResolver
+from classes.Metrics import METRICS
+from classes.MetricsServer import MetricsServer, Profiler
+from classes.WindowPositioner import load_window_positioner
+
+logger = logging.getLogger(__name__)
+
+class LyricsOverlayApp:
+    """The overlay window: listens to the games through their adapters and shows the lyrics of the song that is playing."""
+    def __init__(self, adapters: Sequence[GameAdapter], record_path: str = None, wait_for_window: bool = True, secrets_path: str = None, db_path: str = None, metrics_port: int = None):
+        """
+        Args:
+            adapters (Sequence[GameAdapter]): The games to listen to, all of them at once.
+            record_path (str, optional): Write the websocket frames of the (single) game to this event log, for replay-events.py.
+            wait_for_window (bool): Place the overlay over the game window once it opens (if the platform supports it).
+            secrets_path (str, optional): The Spotify credentials, secrets.json in the repository by default.
+            db_path (str, optional): The lyrics database, lyrics.db in the repository by default.
+            metrics_port (int, optional): Serve the metrics and the profiler on this local port (see MetricsServer); without it they stay off.
+        """
+        self.root = tk.Tk()
+        self.adapters = list(adapters)
+        self.is_running = True
+        self.lyrics_frame = None
+        self.pending_lyrics = None
+        self.active_game = None
+        # time.perf_counter() at which the active game paused, None while it plays
+        self.game_paused_at = None
+        # Speed of the song in the active game
+        self.game_speed = 1.0
+        self.latency_report = LatencyReport()
+        self.window_positioner = load_window_positioner() if wait_for_window else None
+
+        # Load secrets and initialize LyricsManager
+        secrets_path = secrets_path or os.path.join(os.path.dirname(__file__), "../secrets.json")
+        secrets = json.load(open(secrets_path))
+        self.lyrics_manager = LyricsManager(secrets['spotify_client_id'], secrets['spotify_client_secret'], secrets.get('spotify_dc_cookie', ''), db_path=db_path)
+        self.lyrics_resolver = LyricsResolver(self.lyrics_manager)
+
+        recorders = {self.adapters[0].name: EventLogWriter(record_path, self.adapters[0].url)} if record_path else None
+        # The events arrive on the runtime thread, everything that touches Tk happens on the Tk thread
+        # cProfile has to run on the Tk thread, where the lyrics are drawn
+        self.metrics_server = MetricsServer(metrics_port, profiler=Profiler(run_on_thread=lambda function: self.root.after(0, function))) if metrics_port is not None else None
+        self.runtime = GameRuntime(self.adapters, dispatch=lambda event: self.root.after(0, self.handle_event, event), recorders=recorders)
+
+        self._setup_gui()
+
+    def _setup_gui(self):
+        """Sets up the main GUI window."""
+        self.root.title(f"{self.adapters[0].name} Lyrics" if len(self.adapters) == 1 else "VR Games Lyrics")
+        self.root.attributes('-alpha', 0.5)
+        self.root.attributes('-topmost', 1)
+        # self.root.overrideredirect(True) # Enable for borderless window
+
+        # Set a callback for closing the window
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
+
+    def _position_window(self):
+        """Looks for the window of any of the games every 2 seconds and positions the overlay in its bottom third once found."""
+        if not self.is_running:
+            return
+        for adapter in self.adapters:
+            rect = self.window_positioner.find_window(adapter.window_title) if adapter.window_title else None
+            if rect:
+                x, y, w, h = rect
+                self.root.geometry(f'{w}x{int(0.33 * h)}+{x}+{y + int(0.67 * h)}')
+                logger.info(f"{adapter.name} found, overlay positioned.")
+                return
+        self.root.after(2000, self._position_window)
+
+    def handle_event(self, event: GameEvent):
+        """Reacts to an event of one of the games. Runs on the Tk thread."""
+        METRICS.inc("game_events_total", game=event.game, kind=event.kind)
+        METRICS.observe("tk_event_delay_ms", (time.perf_counter() - event.received_at) * 1000)
+        if event.kind == GameEvent.START:
+            logger.info(f"{event.game}: new song detected: '{event.title}' by '{event.artist}'")
+            self.active_game = event.game
+            self.game_paused_at = None
+            self.game_speed = event.speed or 1.0
+            self.latency_report.song_started(event.title, event.received_at)
+            self.display_lyrics(event.title, event.artist, event.started_at, next(a for a in self.adapters if a.name == event.game).overlay_color, event.time_ms or 0)
+        elif event.game != self.active_game:
+            # Another game that is open in the background
+            return
+        elif event.kind == GameEvent.PLAYTIME:
+            # Keep the lyrics in sync with the game, the timestamp was taken on arrival so the Tk queue delay does not count
+            if self.lyrics_frame:
+                self.lyrics_frame.sync_to_game_time(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.PAUSE:
+            logger.info(f"{event.game}: paused")
+            self.game_paused_at = event.started_at if event.started_at is not None else event.received_at
+            if self.lyrics_frame:
+                self.lyrics_frame.pause(self.game_paused_at, event.time_ms)
+        elif event.kind == GameEvent.RESUME:
+            logger.info(f"{event.game}: resumed")
+            resumed_at = event.started_at if event.started_at is not None else event.received_at
+            self.game_paused_at = None
+            if self.lyrics_frame:
+                self.lyrics_frame.resume(resumed_at)
+                if event.time_ms is not None:
+                    self.lyrics_frame.seek(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.SPEED:
+            logger.info(f"{event.game}: song speed {event.speed}x")
+            self.game_speed = event.speed
+            if self.lyrics_frame:
+                self.lyrics_frame.set_speed(event.speed, event.started_at if event.started_at is not None else event.received_at)
+        elif event.kind == GameEvent.SEEK:
+            if self.lyrics_frame:
+                self.lyrics_frame.seek(event.time_ms, event.received_at)
+        elif event.kind == GameEvent.END:
+            logger.info(f"{event.game}: song ended. Clearing lyrics display.")
+            self.active_game = None
+            self.game_paused_at = None
+            self.clear_lyrics_display()
+
+    def display_lyrics(self, song_name, song_author, song_started_at, color, position_ms=0):
+        """Starts a background lookup for the lyrics of a song. The display is created by _on_lyrics_ready once they are found."""
+        self.clear_lyrics_display()
+
+        logger.info(f"Searching lyrics for '{song_name}' by '{song_author}'")
+        future = self.lyrics_resolver.resolve_async(song_name, song_author)
+        self.pending_lyrics = future
+        future.add_done_callback(lambda f: self._lookup_done(f, song_name, song_started_at, color, position_ms))
+
+    def _lookup_done(self, future, *args):
+        """Hands a finished lookup to the Tk thread. Runs on a worker thread; once shutting down, the window is going away and the result is dropped."""
+        if self.is_running:
+            self.root.after(0, self._on_lyrics_ready, future, *args)
+
+    def _on_lyrics_ready(self, future, song_name, song_started_at, color, position_ms):
+        """Creates the lyrics display once the lookup is done, backdated to the moment the song started (at position_ms), and paused if the game is."""
+        if future is not self.pending_lyrics:
+            logger.info(f"Discarding lyrics for '{song_name}', the song is no longer playing.")
+            return
+        self.pending_lyrics = None
+
+        try:
+            result = future.result()
+        except Exception as e:
+            # E.g. a database error while looking up or saving the song, which would otherwise be lost in the Tk callback
+            logger.error(f"Lyrics lookup for '{song_name}' failed: {e!r}")
+            result = LookupResult(None, None)
+        lyrics = result.song
+        self.latency_report.lyrics_resolved(result.tier)
+
+        if lyrics:
+            logger.info(f"Lyrics found ({result}). Creating display.")
+            with METRICS.span("create_display", histogram="render_ms"):
+                self.lyrics_frame = LyricsDisplay(container=self.root, song=lyrics, color=color, speed=self.game_speed, on_line_shown=self.latency_report.line_shown)
+                self.lyrics_frame.pack(fill="both", expand=True)
+            self.lyrics_frame.start_lyrics(started_at=song_started_at, position_ms=position_ms)
+            if self.game_paused_at is not None:
+                self.lyrics_frame.pause(self.game_paused_at)
+        else:
+            logger.error(f"No lyrics found for '{song_name}'.")
+
+    def clear_lyrics_display(self):
+        """Removes the current lyrics frame and drops any lookup that is still running."""
+        self.pending_lyrics = None
+        if self.lyrics_frame:
+            self.lyrics_frame.stop_lyrics()
+            self.lyrics_frame.destroy()
+            self.lyrics_frame = None
+
+    def run(self):
+        """Starts the main application."""
+        logger.info(f"Waiting for {', '.join(adapter.name for adapter in self.adapters)}...")
+        self.runtime.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.window_positioner:
+            self._position_window()
+        # Once the window is up, get the token and the network libraries ready before the first song
+        self.root.after_idle(self.lyrics_manager.warm_up)
+        self.root.mainloop()
+
+    def shutdown(self):
+        """Shuts down the application cleanly."""
+        if not self.is_running:
+            # Closing the window again while waiting for the lookups below
+            return
+        logger.info("Shutting down application...")
+        self.is_running = False
+        self.pending_lyrics = None
+        if self.lyrics_frame:
+            self.lyrics_frame.stop_lyrics()
+        self.runtime.stop()
+        # A running lookup still writes to the database, so wait for it before closing the connections. Tk keeps
+        # serving meanwhile: a done-callback that got past the is_running check may be waiting in root.after
+        waiting = threading.Thread(target=self.lyrics_resolver.shutdown, kwargs={"wait": True}, name="resolver-shutdown")
+        waiting.start()
+        while waiting.is_alive():
+            self.root.update()
+            waiting.join(0.01)
+        self.lyrics_manager.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        logger.info(f"Latency report:\n{self.latency_report.summary()}")
+        self.root.destroy()
+        logger.info("Application closed.")
+
+def main(adapter_types: List[Type[GameAdapter]], description: str):
+    """Command line entry point shared by the game scripts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--url", help="websocket to read the game events from, e.g. a replay-events.py server (only with a single game)")
+    parser.add_argument("--record", metavar="FILE", help="write the received websocket frames to an event log (only with a single game)")
+    parser.add_argument("--no-window", action="store_true", help="don't place the overlay over the game window, e.g. when replaying an event log")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="serve metrics (/metrics, /metrics.json) and a profiler toggle (/profile/start, /profile/stop) on localhost:PORT")
+    args = parser.parse_args()
+    if (args.url or args.record) and len(adapter_types) != 1:
+        parser.error("--url and --record need a single game")
+    if not args.url and any(not adapter_type.default_url for adapter_type in adapter_types):
+        parser.error(f"{', '.join(t.name for t in adapter_types if not t.default_url)} has no default websocket, pass it with --url")
+
+    adapters = [adapter_type(args.url) for adapter_type in adapter_types]
+    app = LyricsOverlayApp(adapters, record_path=args.record, wait_for_window=not args.no_window, metrics_port=args.metrics_port)
+    app.run()
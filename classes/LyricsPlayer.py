@@ -0,0 +1,175 @@
+import logging
+import math
+from typing import Callable
+
+from classes.ClockSync import ClockSync
+from classes.DisplayBackend import DisplayBackend
+from classes.Metrics import METRICS
+from classes.Song import Song
+from classes.Timer import Timer
+
+class LyricsPlayer:
+    """
+    Plays a song on a DisplayBackend: keeps the timer, decides which line is active and schedules the next change.
+    Knows nothing about Tk, so it runs on the KaraokeRenderer in the apps and on a RecordingBackend in benchmarks.
+    """
+    def __init__(self, song: Song, backend: DisplayBackend, speed: float = 1, clock: Callable[[], float] = None, on_line_shown: Callable[[int, int], None] = None):
+        """
+        'clock' replaces time.perf_counter() in both the timer and the clock sync, e.g. with a VirtualClock.
+        'on_line_shown' is called with the index of every line that becomes active and how many ms (song time) after its start it was shown.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.song = song
+        self.backend = backend
+        self.on_line_shown = on_line_shown
+        self.speed = speed if speed != 0 else 1
+
+        self.timer = Timer(speed=self.speed) if clock is None else Timer(speed=self.speed, clock=clock)
+        self.clock_sync = ClockSync(self.timer) if clock is None else ClockSync(self.timer, clock=clock)
+
+        self.current_song_line_index = -1
+        # Redraw interval of the progress bar under line-synced lyrics (about 30 fps)
+        self.frame_ms = 33
+
+        # Handle of the next scheduled update, None if nothing is scheduled
+        self.scheduled_update = None
+
+    def start_lyrics(self, started_at: float = None, position_ms: int = 0) -> None:
+        """
+        Starts the timer at position_ms, and the lyrics will start scrolling.
+        If started_at (a timestamp of the clock) is given, the lyrics start as if they had been started at that moment.
+        """
+        self.logger.debug("Lyrics starting")
+        self.timer.start(started_at, position_ms)
+        self._reschedule()
+        self.logger.info("Lyrics started")
+
+    def stop_lyrics(self) -> None:
+        """Stops the timer, and the lyrics will stop scrolling."""
+        self.logger.debug("Lyrics stopping")
+        self._cancel_scheduled_update()
+        self.timer.stop()
+        self.logger.info("Lyrics stopped")
+
+    def pause_lyrics(self) -> None:
+        """Pauses or unpauses the timer."""
+        if self.timer.is_running:
+            self.timer.pause()
+            self.logger.info("Lyrics paused")
+        elif self.timer.is_started: # only unpause if it was started before
+            self.timer.unpause()
+            self.logger.info("Lyrics unpaused")
+        self._reschedule()
+
+    def pause(self, at: float = None, position_ms: int = None) -> None:
+        """
+        Pauses the lyrics because the game paused. 'at' is the timestamp of the clock the game paused at,
+        'position_ms' where the game says it stopped, if it does.
+        """
+        self.timer.pause(at)
+        if position_ms is not None:
+            self.timer.set_time(position_ms)
+        self.clock_sync.reset()
+        self._reschedule()
+        self.logger.info(f"Lyrics paused at {self.timer.get_time()} ms")
+
+    def resume(self, at: float = None) -> None:
+        """Continues after pause(). 'at' is the timestamp of the clock the game continued at."""
+        self.timer.unpause(at)
+        self.clock_sync.reset()
+        self._reschedule()
+        self.logger.info(f"Lyrics resumed at {self.timer.get_time()} ms")
+
+    def seek(self, position_ms: int, at: float = None) -> None:
+        """Moves to position_ms, which the game was at at the timestamp 'at' of the clock. Keeps a pause."""
+        if at is not None and self.timer.is_running:
+            # The game has moved on since it reported the position
+            position_ms += int((self.timer.clock() - at) * self.timer.speed * 1000)
+        self.timer.set_time(position_ms)
+        self.clock_sync.reset()
+        self._reschedule()
+        self.logger.info(f"Seeked to {position_ms} ms")
+
+    def set_speed(self, speed: float, at: float = None) -> None:
+        """Changes the playback speed from the timestamp 'at' of the clock on (defaults to now) without changing the position reached there."""
+        self.speed = speed if speed != 0 else 1
+        self.timer.set_speed(self.speed, at)
+        self.clock_sync.set_base_speed(self.speed)
+        self._reschedule()
+        self.logger.info(f"Speed set to {self.speed}")
+
+    def show_ith_line(self, i: int) -> None:
+        """
+        Shows the ith line of the lyrics, centered on the active preview line.
+        'i' is the index of the line in the original song lyrics.
+        """
+        if i < 0 or i >= len(self.song.start_times):
+            self.logger.error(f"Invalid line number: i={i}")
+            return
+        with METRICS.span("show_line", histogram="render_ms", trace=False):
+            self.backend.show_line(self.song, i)
+
+    def _cancel_scheduled_update(self) -> None:
+        if self.scheduled_update is not None:
+            self.backend.after_cancel(self.scheduled_update)
+            self.scheduled_update = None
+
+    def _reschedule(self) -> None:
+        """
+        Shows the line that is active right now and its progress, and arms a single after() for the next change:
+        the next line, the next word of the line, or the next frame of the progress bar.
+        Has to be called on the thread of the backend whenever the timer is started, paused, unpaused, moved or sped up.
+        While paused the current position is shown but nothing is scheduled.
+        """
+        self._cancel_scheduled_update()
+        if not self.timer.is_started:
+            return
+
+        song = self.song
+        current_time = self.timer.get_time()
+        current_index = song.line_index_at(current_time, self.current_song_line_index)
+
+        if current_index != self.current_song_line_index:
+            self.current_song_line_index = current_index
+            if current_index >= 0:
+                self.show_ith_line(current_index)
+                METRICS.observe("lyrics_line_late_ms", current_time - song.start_times[current_index])
+                self.logger.debug(f"Line {current_index} shown {current_time - song.start_times[current_index]} ms after its start")
+                if self.on_line_shown is not None:
+                    self.on_line_shown(current_index, current_time - song.start_times[current_index])
+        if current_index >= 0:
+            with METRICS.span("update", histogram="render_ms", trace=False):
+                self.backend.update(current_time)
+        if not self.timer.is_running:
+            return
+
+        if current_index + 1 < len(song.start_times):
+            next_event_ms = song.start_times[current_index + 1]
+        elif not song.start_times or current_time >= song.end_times[-1]:
+            self.logger.info("Lyrics ended")
+            self.stop_lyrics()
+            return
+        else:
+            next_event_ms = song.end_times[-1]
+
+        if current_index >= 0:
+            next_change_ms = self.backend.next_change_ms(current_time)
+            if next_change_ms is None and current_time < song.end_times[current_index]:
+                next_change_ms = current_time + self.frame_ms * self.timer.speed
+            if next_change_ms is not None and current_time < next_change_ms < next_event_ms:
+                next_event_ms = next_change_ms
+
+        # Round up so we never wake before the line starts, then the line is shown on the first wakeup
+        delay = max(1, math.ceil((next_event_ms - current_time) / self.timer.speed))
+        self.scheduled_update = self.backend.after(delay, self._reschedule)
+
+    def jump_to_time(self, time_in_ms: int) -> None:
+        """Jumps to the specified time in milliseconds."""
+        self.timer.set_time(time_in_ms)
+        self._reschedule()
+        self.logger.info(f"Jumped to time {time_in_ms} ms")
+
+    def sync_to_game_time(self, game_time_ms: int, received_at: float = None) -> None:
+        """Feeds the play time reported by the game into the clock sync, which slews the lyrics towards it. received_at is the time.perf_counter() timestamp of the message."""
+        if self.clock_sync.add_sample(game_time_ms, received_at):
+            self._reschedule()
@@ -0,0 +1,211 @@
+import abc
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from classes.HttpClient import HttpClient
+from classes.LrcParser import parse_lrc
+from classes.Metrics import METRICS
+from classes.QueryNormalizer import normalize
+from classes.Song import Song
+
+@dataclasses.dataclass
+class ProviderResult:
+    provider: str
+    song: Song
+    score: float
+    elapsed_ms: float
+
+class LyricsProvider(abc.ABC):
+    """A source of synced lyrics. Subclasses implement fetch_lrc() and may be called from several threads at once."""
+    name = "provider"
+    # Seconds the engine waits for this provider before ignoring it
+    timeout = 5.0
+
+    @abc.abstractmethod
+    def fetch_lrc(self, title: str, main_artist: str, duration_ms: int, cancelled: threading.Event) -> Optional[str]:
+        """Return the synced lyrics of a song in LRC format, or None. Long-running providers should give up once 'cancelled' is set."""
+
+    def warm_up(self) -> None:
+        """Does the slow one-time setup (imports, connections) ahead of the first fetch. Optional."""
+
+class SyncedLyricsProvider(LyricsProvider):
+    """One provider of the Python package syncedlyrics (https://github.com/moehmeni/syncedlyrics), e.g. "Lrclib", "NetEase" or "Musixmatch"."""
+    def __init__(self, provider_name: str, timeout: float = 5.0, http: Optional[HttpClient] = None):
+        """'http' is the client whose connections and limits the provider uses, with 'timeout' as its deadline; None keeps the plain sessions of syncedlyrics."""
+        self.name = provider_name
+        self.timeout = timeout
+        self.http = http
+        # syncedlyrics.search() creates every provider and its session anew; here each thread keeps one instance, since NetEase and Musixmatch keep cookies and tokens in it
+        self._local = threading.local()
+
+    def warm_up(self) -> None:
+        # syncedlyrics pulls in requests, BeautifulSoup and all of its providers, which takes a while
+        import syncedlyrics
+
+    def _provider(self):
+        """The syncedlyrics provider object of this thread, or None if this version of syncedlyrics has no provider class of that name with get_lrc()."""
+        provider = getattr(self._local, "provider", None)
+        if provider is None:
+            # syncedlyrics.providers is not part of the documented API of syncedlyrics (requirements.txt pins the versions it was tested with)
+            try:
+                from syncedlyrics import providers
+                provider = getattr(providers, self.name)()
+            except (ImportError, AttributeError, TypeError) as e:
+                logging.getLogger(__name__).warning(f"_provider: syncedlyrics has no usable provider class {self.name} ({e}), searching through syncedlyrics.search()")
+                provider = False
+            if provider and not callable(getattr(provider, "get_lrc", None)):
+                logging.getLogger(__name__).warning(f"_provider: syncedlyrics provider {self.name} has no get_lrc(), searching through syncedlyrics.search()")
+                provider = False
+            if provider and self.http is not None and hasattr(provider, "session"):
+                provider.session = self.http.session(deadline=self.timeout)
+            self._local.provider = provider
+        return provider or None
+
+    def fetch_lrc(self, title: str, main_artist: str, duration_ms: int, cancelled: threading.Event) -> Optional[str]:
+        provider = self._provider()
+        if provider is None:
+            # The public function only knows the provider's name; it uses its own sessions and logs errors instead of raising them
+            import syncedlyrics
+            return syncedlyrics.search(title + " " + main_artist, synced_only=True, providers=[self.name])
+        lrc = provider.get_lrc(title + " " + main_artist)
+        # Newer versions of syncedlyrics return synced and plain lyrics in one object
+        return getattr(lrc, "synced", lrc)
+
+class LocalLrcProvider(LyricsProvider):
+    """Synced lyrics from a local directory of .lrc files named "<artist> - <title>.lrc" or "<title>.lrc"."""
+    name = "local"
+    timeout = 1.0
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch_lrc(self, title: str, main_artist: str, duration_ms: int, cancelled: threading.Event) -> Optional[str]:
+        if not os.path.isdir(self.directory):
+            return None
+        wanted = {normalize(f"{main_artist} - {title}"), normalize(title)}
+        for entry in os.scandir(self.directory):
+            stem, extension = os.path.splitext(entry.name)
+            if extension.lower() == ".lrc" and normalize(stem) in wanted:
+                with open(entry.path, encoding="utf-8-sig") as f:
+                    return f.read()
+        return None
+
+class LyricsProviderEngine:
+    """Asks all providers concurrently and returns the best result. As soon as a result scores at least 'good_enough' the remaining providers are cancelled; otherwise the engine waits until every provider answered or ran out of its timeout.
+    """
+    def __init__(self, providers: Sequence[LyricsProvider], good_enough: float = 0.8):
+        self.providers = list(providers)
+        self.good_enough = good_enough
+        # Providers that ignore cancellation keep their thread until they return, so leave room for a few stragglers
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, 2 * len(self.providers)), thread_name_prefix="lyrics-provider")
+        self.logger = logging.getLogger(__name__)
+
+    def warm_up(self) -> None:
+        for provider in self.providers:
+            provider.warm_up()
+
+    @staticmethod
+    def score(song: Song, duration_ms: int) -> float:
+        """Rate synced lyrics between 0 and 1 by the quality of their timestamps and how well they fit the length of the song."""
+        starts = song.start_times
+        if not starts:
+            return 0.0
+        # Lyrics with many lines sharing a timestamp or only a handful of lines are badly synced
+        timing = len(set(starts)) / len(starts) * min(1.0, len(starts) / 10)
+        if song.has_words:
+            timing = min(1.0, timing + 0.1)
+        if not duration_ms:
+            fit = 0.5
+        else:
+            coverage = starts[-1] / duration_ms
+            # Lines after the end of the track mean a different version of the song (extended mix, live, ...)
+            fit = 0.0 if coverage > 1.02 else min(1.0, coverage / 0.6)
+        return 0.5 * timing + 0.5 * fit
+
+    def _fetch(self, provider: LyricsProvider, title: str, main_artist: str, duration_ms: int, cancelled: threading.Event) -> Optional[ProviderResult]:
+        start = time.perf_counter()
+        with METRICS.span("provider.fetch", provider=provider.name):
+            lyrics_text = provider.fetch_lrc(title, main_artist, duration_ms, cancelled)
+        if not lyrics_text:
+            return None
+        song = parse_lrc(lyrics_text, duration_ms)
+        return ProviderResult(provider=provider.name, song=song, score=self.score(song, duration_ms), elapsed_ms=(time.perf_counter() - start) * 1000)
+
+    def search(self, title: str, main_artist: str, duration_ms: int) -> Optional[ProviderResult]:
+        """Search all providers for the synced lyrics of a song.
+
+        Args:
+            title (str): The title of the song.
+            main_artist (str): The main artist of the song.
+            duration_ms (int): The length of the song in milliseconds, used for scoring and as end of the last line.
+
+        Returns:
+            ProviderResult|None: The best scored result, or None if no provider had lyrics in time.
+        """
+        return self.search_with_failures(title, main_artist, duration_ms)[0]
+
+    def search_with_failures(self, title: str, main_artist: str, duration_ms: int) -> Tuple[Optional[ProviderResult], List[str]]:
+        """Like search(), but also returns the names of the providers that failed or ran out of time, and so may still have lyrics."""
+        cancelled = threading.Event()
+        started = time.monotonic()
+        futures: Dict[concurrent.futures.Future, LyricsProvider] = {
+            self.executor.submit(self._fetch, provider, title, main_artist, duration_ms, cancelled): provider for provider in self.providers
+        }
+        deadlines = {future: started + provider.timeout for future, provider in futures.items()}
+        pending = set(futures)
+        timed_out = set()
+        best = None
+        failed = []
+        try:
+            while pending:
+                timeout = max(deadlines[future] for future in pending) - time.monotonic()
+                if timeout <= 0:
+                    break
+                done, pending = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    provider = futures[future]
+                    if time.monotonic() > deadlines[future]:
+                        self.logger.info(f"search: {provider.name} answered after its timeout of {provider.timeout} s, ignoring it")
+                        METRICS.inc("lyrics_provider_results_total", provider=provider.name, outcome="late")
+                        failed.append(provider.name)
+                        continue
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"search: {provider.name} failed for {title} - {main_artist}, error: {e}")
+                        METRICS.inc("lyrics_provider_results_total", provider=provider.name, outcome="error")
+                        failed.append(provider.name)
+                        continue
+                    if result is None:
+                        self.logger.info(f"search: {provider.name} has no synced lyrics for {title} - {main_artist}")
+                        METRICS.inc("lyrics_provider_results_total", provider=provider.name, outcome="none")
+                        continue
+                    self.logger.info(f"search: {provider.name} returned {len(result.song.start_times)} lines in {result.elapsed_ms:.0f} ms, score {result.score:.2f}")
+                    METRICS.inc("lyrics_provider_results_total", provider=provider.name, outcome="lyrics")
+                    if best is None or result.score > best.score:
+                        best = result
+                if best is not None and best.score >= self.good_enough:
+                    break
+                # Stop waiting for providers whose time is up
+                now = time.monotonic()
+                timed_out.update(future for future in pending if deadlines[future] <= now)
+                pending -= timed_out
+        finally:
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+        # Providers still pending ran out of time, unless the search stopped early with good enough lyrics
+        if best is None or best.score < self.good_enough:
+            for future, provider in futures.items():
+                if future in timed_out or future in pending:
+                    failed.append(provider.name)
+                    METRICS.inc("lyrics_provider_results_total", provider=provider.name, outcome="timeout")
+        return best, failed
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,161 @@
+import collections
+import concurrent.futures
+import dataclasses
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from classes.LyricsManager import LyricsManager
+from classes.Metrics import METRICS
+from classes.QueryNormalizer import query_key
+from classes.Song import Song
+
+@dataclasses.dataclass
+class LookupResult:
+    song: Optional[Song]
+    tier: Optional[str]
+    timings: Dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values())
+
+    def __str__(self) -> str:
+        tiers = ", ".join(f"{tier}={ms:.1f} ms" for tier, ms in self.timings.items())
+        return f"served by {self.tier or 'nobody'} in {self.total_ms:.1f} ms ({tiers})"
+
+class LyricsResolver:
+    """Resolves lyrics for a game query by asking an in-process LRU cache first, then the SQLite database (exact, then approximate match) and only then the network.
+    """
+    TIER_MEMORY = "memory"
+    TIER_DATABASE = "database"
+    TIER_FUZZY = "fuzzy"
+    TIER_NETWORK = "network"
+    # Not a source of lyrics: the query failed recently and is not searched again yet
+    TIER_NEGATIVE = "negative"
+
+    def __init__(self, lyrics_manager: LyricsManager, cache_size: int = 64, max_workers: int = 2, fuzzy_threshold: float = 0.9):
+        self.lyrics_manager = lyrics_manager
+        # Minimum confidence for a near-duplicate query in the database to be used instead of searching online
+        self.fuzzy_threshold = fuzzy_threshold
+        self.cache_size = cache_size
+        self.cache: "collections.OrderedDict[str, Song]" = collections.OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lyrics-resolver")
+        self.in_flight: Dict[str, concurrent.futures.Future] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def _cache_get(self, key: str) -> Song|None:
+        with self.cache_lock:
+            song = self.cache.get(key)
+            if song is not None:
+                self.cache.move_to_end(key)
+            return song
+
+    def _cache_put(self, key: str, song: Song) -> None:
+        with self.cache_lock:
+            self.cache[key] = song
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def resolve(self, title: str, main_artist: str) -> LookupResult:
+        """Look up the lyrics for a song, stopping at the first tier that has them.
+
+        Args:
+            title (str): The song title as reported by the game.
+            main_artist (str): The song author as reported by the game.
+
+        Returns:
+            LookupResult: The song (or None), the tier that served it (TIER_NEGATIVE if the query is in the negative cache) and the time spent in each tier in milliseconds.
+        """
+        key = query_key(title, main_artist)
+        result = LookupResult(song=None, tier=None)
+
+        start = time.perf_counter()
+        song = self._cache_get(key)
+        result.timings[self.TIER_MEMORY] = (time.perf_counter() - start) * 1000
+        if song is not None:
+            result.song, result.tier = song, self.TIER_MEMORY
+            self.logger.info(f"resolve: {title} - {main_artist} {result}")
+            return self._record(result)
+
+        start = time.perf_counter()
+        song = self.lyrics_manager.search_in_database(title, main_artist)
+        result.timings[self.TIER_DATABASE] = (time.perf_counter() - start) * 1000
+        if song is not None:
+            self._cache_put(key, song)
+            result.song, result.tier = song, self.TIER_DATABASE
+            self.logger.info(f"resolve: {title} - {main_artist} {result}")
+            return self._record(result)
+
+        start = time.perf_counter()
+        match = self.lyrics_manager.search_in_database_fuzzy(title, main_artist, self.fuzzy_threshold)
+        result.timings[self.TIER_FUZZY] = (time.perf_counter() - start) * 1000
+        if match is not None:
+            song, confidence = match
+            self._cache_put(key, song)
+            result.song, result.tier = song, self.TIER_FUZZY
+            self.logger.info(f"resolve: {title} - {main_artist} {result}, confidence {confidence:.2f}")
+            return self._record(result)
+
+        start = time.perf_counter()
+        reason = self.lyrics_manager.get_negative_cache(title, main_artist)
+        result.timings[self.TIER_NEGATIVE] = (time.perf_counter() - start) * 1000
+        if reason is not None:
+            result.tier = self.TIER_NEGATIVE
+            self.logger.info(f"resolve: {title} - {main_artist} {result}, last search failed with {reason}")
+            return self._record(result)
+
+        start = time.perf_counter()
+        song, reason = self.lyrics_manager.search_on_spotify_with_reason(title, main_artist)
+        if song is not None:
+            self.lyrics_manager.save_song_to_database(song, title, main_artist)
+            self._cache_put(key, song)
+            result.song, result.tier = song, self.TIER_NETWORK
+        else:
+            self.lyrics_manager.record_miss(title, main_artist, reason)
+        result.timings[self.TIER_NETWORK] = (time.perf_counter() - start) * 1000
+        self.logger.info(f"resolve: {title} - {main_artist} {result}")
+        return self._record(result)
+
+    @staticmethod
+    def _record(result: LookupResult) -> LookupResult:
+        tier = result.tier or "none"
+        METRICS.inc("lyrics_lookups_total", tier=tier)
+        METRICS.observe("lyrics_lookup_ms", result.total_ms, tier=tier)
+        # Every tier the lookup went through, also those that did not answer, shows where the time of a miss went
+        for tier_name, ms in result.timings.items():
+            METRICS.observe("lyrics_tier_ms", ms, tier=tier_name)
+        return result
+
+    def resolve_async(self, title: str, main_artist: str) -> "concurrent.futures.Future[LookupResult]":
+        """Look up the lyrics for a song on a background thread. Concurrent requests for the same query share one future.
+
+        Args:
+            title (str): The song title as reported by the game.
+            main_artist (str): The song author as reported by the game.
+
+        Returns:
+            Future[LookupResult]: Completes with the result of resolve() once the lookup is done.
+        """
+        key = query_key(title, main_artist)
+        with self.cache_lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                return future
+            future = self.executor.submit(self.resolve, title, main_artist)
+            self.in_flight[key] = future
+
+        def forget(done: concurrent.futures.Future) -> None:
+            with self.cache_lock:
+                if self.in_flight.get(key) is done:
+                    del self.in_flight[key]
+
+        future.add_done_callback(forget)
+        return future
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the background workers, dropping lookups that have not started yet. With 'wait', returns once the running ones are done."""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
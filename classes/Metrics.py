@@ -0,0 +1,236 @@
+import bisect
+import collections
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (ms) of the histogram buckets, the last bucket has no bound
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Render spans and clock errors are much shorter than lookups
+FINE_BUCKETS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_MS = {
+    "span_ms": DEFAULT_BUCKETS_MS,
+    "render_ms": FINE_BUCKETS_MS,
+    "lyrics_line_late_ms": FINE_BUCKETS_MS,
+    "game_clock_error_ms": FINE_BUCKETS_MS,
+    "tk_event_delay_ms": FINE_BUCKETS_MS,
+    # From a cache hit in microseconds to a network search in seconds
+    "lyrics_tier_ms": FINE_BUCKETS_MS + DEFAULT_BUCKETS_MS[-4:],
+}
+
+# What the metrics of the app mean, for the # HELP lines of the Prometheus text
+DESCRIPTIONS = {
+    "lyrics_lookups_total": "Lyrics lookups by the tier that answered (memory = in-process cache hit, negative = skipped because it failed recently, none = not found)",
+    "lyrics_lookup_ms": "Duration of a lyrics lookup over all tiers it went through, by the tier that answered",
+    "lyrics_tier_ms": "Time a lyrics lookup spent in each tier it went through, whether or not that tier answered",
+    "lyrics_misses_total": "Online searches that found no lyrics, by reason",
+    "lyrics_provider_results_total": "Answers of the lyrics providers by outcome (lyrics, none, error, late = after its timeout, timeout = no answer)",
+    "http_requests_total": "HTTP attempts by host and outcome (status code or exception)",
+    "http_retries_total": "HTTP attempts that were retried, by host",
+    "http_rate_limited_total": "HTTP requests given up because the host asked to wait longer than the deadline",
+    "span_ms": "Duration of timed operations, by span",
+    "render_ms": "Duration of drawing on the overlay, by operation",
+    "lyrics_line_late_ms": "How long after its start (song time) a line was shown",
+    "game_clock_error_ms": "Distance between the lyrics position and the game clock at each play time sample",
+    "game_clock_jumps_total": "Times the lyrics jumped to the game clock instead of slewing towards it",
+    "game_events_total": "Game events handled by the overlay, by game and kind",
+    "tk_event_delay_ms": "Time a game event waited for the Tk thread",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Counts of observations per bucket, their sum and count; quantiles are estimated from the buckets."""
+    __slots__ = ("bounds", "counts", "count", "sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # counts[i] are the observations <= bounds[i] and > bounds[i - 1], counts[-1] the ones above all bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the q-quantile, interpolated linearly within its bucket. None without observations."""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+class _NoSpan:
+    """What span() returns while the metrics are off: entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ("metrics", "name", "histogram", "labels", "trace", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, histogram: str, labels: dict, trace: bool):
+        self.metrics = metrics
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.metrics.observe(self.histogram, elapsed_ms, span=self.name, **self.labels)
+        if self.trace:
+            self.metrics.traces.append({"span": self.name, **self.labels, "start": self.start, "ms": round(elapsed_ms, 3),
+                                        "thread": threading.current_thread().name, "error": exc_type.__name__ if exc_type else None})
+        return False
+
+class Metrics:
+    """
+    Counters, histograms and timed spans of the lyrics pipeline, kept in memory and exposed by MetricsServer.
+    Off by default: every call then returns right away, so the instrumentation can stay in the hot paths.
+    Metrics are created on first use, identified by their name and labels.
+    """
+    def __init__(self, trace_size: int = 256):
+        self.enabled = False
+        self.started = time.time()
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+        # The most recent spans, newest last
+        self.traces = collections.deque(maxlen=trace_size)
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.traces.clear()
+            self.started = time.time()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Adds to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        counter.inc(amount)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Records a value (usually ms) in a histogram, with the buckets of BUCKETS_MS for the name."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(BUCKETS_MS.get(name, DEFAULT_BUCKETS_MS)))
+        histogram.observe(value)
+
+    def span(self, name: str, histogram: str = "span_ms", trace: bool = True, **labels):
+        """
+        Times the block of a with statement into the histogram (label span=name), and keeps it in the recent traces unless trace is False
+        (for spans that run every frame and would push out everything else).
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, histogram, labels, trace)
+
+    def snapshot(self) -> dict:
+        """All metrics as plain data, for the JSON endpoint."""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+            traces = list(self.traces)
+        return {
+            "enabled": self.enabled,
+            "uptime_s": round(time.time() - self.started, 3),
+            "counters": [{"name": name, "labels": dict(labels), "value": counter.value} for (name, labels), counter in sorted(counters)],
+            "histograms": [{
+                "name": name, "labels": dict(labels), "count": histogram.count, "sum": round(histogram.sum, 3),
+                "p50": histogram.quantile(0.5), "p90": histogram.quantile(0.9), "p99": histogram.quantile(0.99),
+                "buckets": {str(bound): count for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts)},
+            } for (name, labels), histogram in sorted(histograms, key=lambda item: item[0])],
+            "traces": traces,
+        }
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines: List[str] = []
+        described = set()
+
+        def header(name: str, kind: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            if name in DESCRIPTIONS:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counter in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {counter.value}")
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+# The metrics of the whole process; the instrumented classes report here
+METRICS = Metrics()
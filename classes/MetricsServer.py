@@ -0,0 +1,168 @@
+import concurrent.futures
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from classes.Metrics import METRICS, Metrics
+
+class Profiler:
+    """
+    cProfile switched on and off while the app runs. cProfile only sees the thread it was enabled on,
+    so enabling and disabling happen through 'run_on_thread' (e.g. root.after for the Tk thread); without it, on the calling thread.
+    """
+    # What sort_stats() takes: the values of pstats.SortKey and their aliases (tottime, cumtime, ...)
+    SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+
+    def __init__(self, run_on_thread: Callable[[Callable[[], None]], None] = None, timeout: float = 5.0):
+        self.run_on_thread = run_on_thread
+        self.timeout = timeout
+        self.profile: Optional[cProfile.Profile] = None
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def is_running(self) -> bool:
+        return self.profile is not None
+
+    def _call(self, function: Callable[[], None]) -> None:
+        if self.run_on_thread is None:
+            function()
+            return
+        done = concurrent.futures.Future()
+
+        def run():
+            try:
+                function()
+                done.set_result(None)
+            except Exception as e:
+                done.set_exception(e)
+
+        self.run_on_thread(run)
+        # Raises TimeoutError if the thread is stuck, which is worth knowing as well
+        done.result(timeout=self.timeout)
+
+    def start(self) -> bool:
+        """Starts profiling. False if it already runs."""
+        with self.lock:
+            if self.profile is not None:
+                return False
+            profile = self.profile = cProfile.Profile()
+            try:
+                self._call(profile.enable)
+            except concurrent.futures.TimeoutError:
+                # The thread still runs the enable once it gets to it; the disable queued behind it undoes it
+                self.profile = None
+                self.run_on_thread(profile.disable)
+                raise
+            except Exception:
+                self.profile = None
+                raise
+        self.logger.info("start: profiling")
+        return True
+
+    def stop(self, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """
+        Stops profiling and returns the pstats report of the 'limit' functions with the highest 'sort', None if it was not running.
+        Raises ValueError for a 'sort' not in SORT_KEYS or a 'limit' below 1, before the profiler is touched.
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"unknown sort {sort!r}, use one of {', '.join(sorted(self.SORT_KEYS))}")
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, not {limit}")
+        with self.lock:
+            profile = self.profile
+            if profile is None:
+                return None
+            self._call(profile.disable)
+            self.profile = None
+        self.logger.info("stop: profiling stopped")
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+class MetricsServer:
+    """
+    Serves the metrics on a local HTTP port:
+
+        /metrics        Prometheus text format
+        /metrics.json   the same as JSON, with quantiles and the most recent spans
+        /profile/start  starts the profiler
+        /profile/stop   stops it and returns the report (?sort=tottime&limit=60)
+
+    Starting the server enables the metrics, stopping it disables them again.
+    """
+    def __init__(self, port: int, host: str = "127.0.0.1", metrics: Metrics = METRICS, profiler: Profiler = None):
+        self.metrics = metrics
+        self.profiler = profiler or Profiler()
+        self.logger = logging.getLogger(__name__)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                server.logger.debug(f"{self.address_string()} {format % args}")
+
+            def _send(self, status: int, body: str, content_type: str = "text/plain; charset=utf-8") -> None:
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/metrics":
+                    self._send(200, server.metrics.prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+                elif url.path == "/metrics.json":
+                    self._send(200, json.dumps(server.metrics.snapshot()), "application/json")
+                elif url.path in ("/profile/start", "/profile/stop"):
+                    try:
+                        if url.path == "/profile/start":
+                            self._send(200, "profiling\n" if server.profiler.start() else "already profiling\n")
+                        else:
+                            try:
+                                sort, limit = query.get("sort", ["cumulative"])[0], int(query.get("limit", ["40"])[0])
+                                report = server.profiler.stop(sort, limit)
+                            except ValueError as e:
+                                # Checked before the profiler is stopped, so it keeps running and the report is not lost
+                                self._send(400, f"{e}\n")
+                                return
+                            self._send(200, report if report is not None else "not profiling\n")
+                    except concurrent.futures.TimeoutError:
+                        self._send(503, "the profiled thread did not respond\n")
+                else:
+                    self._send(404, "try /metrics, /metrics.json, /profile/start or /profile/stop\n")
+
+            do_POST = do_GET
+
+        return Handler
+
+    def start(self) -> None:
+        self.metrics.enable()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+        self.logger.info(f"start: metrics on {self.url}/metrics")
+
+    def stop(self) -> None:
+        self.metrics.disable()
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread = None
+        self.httpd.server_close()
@@ -0,0 +1,90 @@
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from classes.LibraryScanner import LibrarySong
+from classes.LyricsManager import LyricsManager
+from classes.LyricsResolver import LyricsResolver, LookupResult
+from classes.QueryNormalizer import query_key
+
+class Prefetcher:
+    """Resolves the lyrics of many songs into lyrics.db ahead of time, with a bounded worker pool and a limit on network lookups per second.
+    Songs that are already in the database or failed recently (negative cache) are skipped, so an interrupted run simply continues where it stopped when started again.
+    """
+    SKIPPED = "skipped"
+    MISSED = "missed"
+    FAILED = "failed"
+
+    def __init__(self, lyrics_manager: LyricsManager, resolver: LyricsResolver, max_workers: int = 4, requests_per_second: float = 2.0,
+                 progress_callback: Optional[Callable[[int, int, LibrarySong, str], None]] = None):
+        self.lyrics_manager = lyrics_manager
+        self.resolver = resolver
+        self.max_workers = max_workers
+        self.request_interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self.progress_callback = progress_callback
+        self.next_request_at = 0.0
+        self.rate_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def stop(self) -> None:
+        """Let the running lookups finish and skip all others."""
+        self.stopped.set()
+
+    def _wait_for_rate_limit(self) -> None:
+        with self.rate_lock:
+            now = time.monotonic()
+            wait = self.next_request_at - now
+            self.next_request_at = max(now, self.next_request_at) + self.request_interval
+        if wait > 0:
+            self.stopped.wait(wait)
+
+    def _prefetch_one(self, song: LibrarySong) -> str:
+        if self.stopped.is_set() or self.lyrics_manager.has_query(song.title, song.artist):
+            return self.SKIPPED
+        if self.lyrics_manager.get_negative_cache(song.title, song.artist) is not None:
+            return self.MISSED
+        self._wait_for_rate_limit()
+        if self.stopped.is_set():
+            return self.SKIPPED
+        result: LookupResult = self.resolver.resolve(song.title, song.artist)
+        return result.tier if result.song is not None else self.MISSED
+
+    def run(self, songs: Iterable[LibrarySong]) -> Dict[str, int]:
+        """Prefetch the lyrics of the given songs.
+
+        Args:
+            songs (Iterable[LibrarySong]): The songs to prefetch, e.g. from LibraryScanner. Duplicates are only looked up once.
+
+        Returns:
+            Dict[str, int]: How many songs ended up in each state: a resolver tier, "skipped", "missed" or "failed".
+        """
+        unique = {}
+        for song in songs:
+            unique.setdefault(query_key(song.title, song.artist), song)
+        total = len(unique)
+        counts = collections.Counter()
+        self.logger.info(f"run: prefetching lyrics for {total} songs")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch") as executor:
+            futures = {executor.submit(self._prefetch_one, song): song for song in unique.values()}
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                    song = futures[future]
+                    try:
+                        state = future.result()
+                    except Exception as e:
+                        self.logger.error(f"run: failed to prefetch {song.title} - {song.artist}, error: {e}")
+                        state = self.FAILED
+                    counts[state] += 1
+                    if self.progress_callback:
+                        self.progress_callback(done, total, song, state)
+            except KeyboardInterrupt:
+                self.stop()
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+        self.logger.info(f"run: done, {dict(counts)}")
+        return dict(counts)
@@ -0,0 +1,67 @@
+import difflib
+import re
+import unicodedata
+
+_whitespace = re.compile(r"\s+")
+# (Extended Mix), [Radio Edit], {feat. Someone}, ...
+_brackets = re.compile(r"[\(\[\{][^\)\]\}]*[\)\]\}]")
+# "Song - Remastered 2011", "Song - From the Movie"
+_dash_suffix = re.compile(r"\s+[-–—]\s+.*$")
+_featuring = re.compile(r"\s+(?:feat|ft|featuring|prod)\b\.?.*$")
+# Everything after the first artist: "A & B", "A, B", "A; B". Not "x" or "and", which are part of names like "Lil Nas X" or "Simon and Garfunkel"
+_artist_separators = re.compile(r"\s*(?:,|&|;)\s*")
+_punctuation = re.compile(r"[^\w\s]")
+
+def normalize(text: str) -> str:
+    """Casefold a title or artist, strip accents and collapse whitespace, so trivially different spellings share a cache key."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _whitespace.sub(" ", text.casefold()).strip()
+
+def normalize_title(title: str) -> str:
+    """Normalize a song title and drop the decorations games and mappers add to it: bracketed remix or version notes, dash suffixes and featured artists."""
+    text = normalize(title)
+    text = _brackets.sub(" ", text)
+    text = _dash_suffix.sub("", text)
+    text = _featuring.sub("", text)
+    text = _punctuation.sub(" ", text)
+    return _whitespace.sub(" ", text).strip() or normalize(title)
+
+def normalize_artist(artist: str) -> str:
+    """Normalize an artist field and keep only the first artist."""
+    text = normalize(artist)
+    text = _brackets.sub(" ", text)
+    text = _featuring.sub("", text)
+    text = _artist_separators.split(text, maxsplit=1)[0]
+    text = _punctuation.sub(" ", text)
+    return _whitespace.sub(" ", text).strip() or normalize(artist)
+
+def query_key(title: str, main_artist: str) -> str:
+    """Return the key under which a (title, artist) query from a game is stored in the querys table."""
+    return normalize_title(title) + "\x1f" + normalize_artist(main_artist)
+
+_numbers = re.compile(r"\d+")
+
+def similarity(a: str, b: str) -> float:
+    """Similarity of two normalized strings between 0 and 1. Strings with different numbers ("Part 1", "Part 2") never match."""
+    if a == b:
+        return 1.0
+    if _numbers.findall(a) != _numbers.findall(b):
+        return 0.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+def fts_trigram_query(text: str) -> str:
+    """Build an FTS5 trigram MATCH expression that finds rows sharing any trigram with text."""
+    trigrams = {text[i:i + 3] for i in range(len(text) - 2)}
+    return " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in sorted(trigrams))
+
+_words = re.compile(r"\w+")
+
+def fts_prefix_query(text: str) -> str:
+    """Build an FTS5 MATCH expression for search-as-you-type: every word of text must occur, the last one may still be incomplete. Empty if text has no words."""
+    words = _words.findall(normalize(text))
+    if not words:
+        return ""
+    terms = ['"' + word + '"' for word in words[:-1]]
+    terms.append('"' + words[-1] + '"*')
+    return " AND ".join(terms)
@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Optional
+
+from classes.EventLog import EventLog
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class ReplayServer:
+    """
+    Stand-in for the websocket server of a game (BSDataPuller, Synth Riders): replays an event log to every client that connects,
+    with the recorded timing divided by 'speed'. Only the server side of the websocket handshake and unfragmented text frames are implemented,
+    which is all the lyrics apps need.
+    """
+    def __init__(self, log: EventLog, host: str = "localhost", port: int = 0, speed: float = 1.0, loop: bool = False, rewrite_timestamps: bool = True):
+        """
+        Args:
+            log (EventLog): The recording to replay.
+            port (int): Port to listen on, 0 picks a free one (see self.port).
+            speed (float): Replay speed, 10 replays a recording ten times faster.
+            loop (bool): Start over at the end of the log instead of closing the connection.
+            rewrite_timestamps (bool): Move the "UnixTimestamp" of BSDataPuller frames to the time of the replay.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.log = log
+        self.speed = speed
+        self.loop = loop
+        self.rewrite_timestamps = rewrite_timestamps
+        self.server = socket.create_server((host, port))
+        self.port = self.server.getsockname()[1]
+        self.is_running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ReplayServer":
+        """Serves in a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.is_running = True
+        self.logger.info(f"serve_forever: Replaying {self.log.path} on port {self.port} at {self.speed}x")
+        while self.is_running:
+            try:
+                conn, address = self.server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_client, args=(conn, address), daemon=True).start()
+
+    def stop(self) -> None:
+        self.is_running = False
+        self.server.close()
+
+    def _handshake(self, conn: socket.socket) -> bool:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        key = None
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            conn.sendall(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    @staticmethod
+    def _frame(payload: bytes, opcode: int = 0x1) -> bytes:
+        """Builds a final, unmasked websocket frame, as servers send them."""
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        return header + payload
+
+    def _rewrite(self, frame: str, shift_ms: float, recorded_at_ms: float) -> str:
+        if not self.rewrite_timestamps or "UnixTimestamp" not in frame:
+            return frame
+        try:
+            data = json.loads(frame)
+            data["UnixTimestamp"] = int(shift_ms + (data["UnixTimestamp"] - recorded_at_ms) / self.speed)
+            return json.dumps(data)
+        except (ValueError, TypeError, KeyError):
+            return frame
+
+    def _serve_client(self, conn: socket.socket, address) -> None:
+        with conn:
+            try:
+                if not self._handshake(conn):
+                    return
+                self.logger.info(f"_serve_client: Client {address} connected")
+                while self.is_running:
+                    started = time.monotonic()
+                    replay_started_ms = time.time() * 1000
+                    recorded_at_ms = self.log.header.get("started_at", 0) * 1000
+                    for offset, frame in self.log:
+                        delay = started + offset / self.speed - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        if not self.is_running:
+                            break
+                        conn.sendall(self._frame(self._rewrite(frame, replay_started_ms, recorded_at_ms).encode("utf-8")))
+                    if not self.loop:
+                        break
+                conn.sendall(self._frame(struct.pack("!H", 1000), opcode=0x8))
+                self.logger.info(f"_serve_client: Replay to {address} finished")
+            except OSError as e:
+                self.logger.info(f"_serve_client: Client {address} disconnected: {e}")
@@ -1,18 +1,126 @@
-import dataclasses
-from typing import List, Optional
+from array import array
+import bisect
+from collections.abc import Sequence
+import sys
+from typing import Iterable, List, Optional, Tuple
 
 from classes.LyricsLine import LyricsLine
 
-@dataclasses.dataclass
+class _LinesView(Sequence):
+    """Read-only list of LyricsLine objects that are created on access from the columns of a Song."""
+    __slots__ = ("_song",)
+
+    def __init__(self, song: "Song"):
+        self._song = song
+
+    def __len__(self) -> int:
+        return len(self._song.start_times)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        song = self._song
+        if i < 0:
+            i += len(self)
+        start, end = song.start_times[i], song.end_times[i]
+        return LyricsLine(text=song.texts[i], startMs=start, endMs=end, durationMs=end - start, words=song.words(i) if song.has_words else None)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
 class Song:
-    lines: List[LyricsLine]
-    cover_link: Optional[str] = None
-    title: Optional[str] = None
-    artist: Optional[str] = None
-    
+    """The synced lyrics of a song. The lines are stored column-wise (start times, end times, texts) sorted by start time; song.lines gives LyricsLine objects on access."""
+    __slots__ = ("start_times", "end_times", "texts", "word_offsets", "word_starts", "word_texts", "cover_link", "title", "artist", "durationMs")
+
+    def __init__(self, lines: Iterable[LyricsLine] = (), cover_link: Optional[str] = None, title: Optional[str] = None, artist: Optional[str] = None, presorted: bool = False):
+        self.cover_link = cover_link
+        self.title = title
+        self.artist = artist
+        lines = list(lines)
+        if not presorted and any(lines[i].startMs > lines[i + 1].startMs for i in range(len(lines) - 1)):
+            lines.sort(key=lambda x: x.startMs)
+        self._set_columns(array('i', (line.startMs for line in lines)),
+                          array('i', (line.endMs for line in lines)),
+                          [line.text for line in lines])
+        if any(line.words for line in lines):
+            word_offsets = array('i', [0])
+            word_starts = array('i')
+            word_texts = []
+            for line in lines:
+                for start, word in line.words or ():
+                    word_starts.append(start)
+                    word_texts.append(word)
+                word_offsets.append(len(word_starts))
+            self._set_word_columns(word_offsets, word_starts, word_texts)
+        else:
+            self._set_word_columns(None, None, None)
+
+    @classmethod
+    def from_arrays(cls, starts: Iterable[int], ends: Iterable[int], texts: Iterable[str], cover_link: Optional[str] = None, title: Optional[str] = None, artist: Optional[str] = None,
+                    word_offsets: Optional[array] = None, word_starts: Optional[array] = None, word_texts: Optional[List[str]] = None) -> "Song":
+        """Builds a song from parallel columns of start times, end times and texts, sorted by start time, without creating LyricsLine objects.
+        Word timings are optional: the words of line i are word_starts/word_texts[word_offsets[i]:word_offsets[i + 1]].
+        """
+        song = cls.__new__(cls)
+        song.cover_link = cover_link
+        song.title = title
+        song.artist = artist
+        song._set_columns(starts if isinstance(starts, array) else array('i', starts),
+                          ends if isinstance(ends, array) else array('i', ends),
+                          list(texts))
+        song._set_word_columns(word_offsets, word_starts, word_texts)
+        return song
+
+    def _set_columns(self, starts: array, ends: array, texts: List[str]) -> None:
+        # Sorted start times, used to find the active line with bisect instead of scanning all lines
+        self.start_times = starts
+        self.end_times = ends
+        # Choruses repeat, interning stores every distinct line only once
+        self.texts = [sys.intern(text) for text in texts]
+        self.durationMs = ends[-1] - starts[0] if starts else 0
+
+    def _set_word_columns(self, word_offsets: Optional[array], word_starts: Optional[array], word_texts: Optional[List[str]]) -> None:
+        self.word_offsets = word_offsets
+        self.word_starts = word_starts
+        self.word_texts = word_texts
+
+    @property
+    def has_words(self) -> bool:
+        """True if the song has word-level timings."""
+        return self.word_offsets is not None
+
+    def words(self, i: int) -> List[Tuple[int, str]]:
+        """Returns the (startMs, word) pairs of line i, empty if the song or the line has no word timings."""
+        if self.word_offsets is None:
+            return []
+        lo, hi = self.word_offsets[i], self.word_offsets[i + 1]
+        return list(zip(self.word_starts[lo:hi], self.word_texts[lo:hi]))
+
+    def word_index_at(self, i: int, time_ms: int) -> int:
+        """Returns the index (within line i) of the word that is active at time_ms, or -1 if no word of the line has started yet."""
+        if self.word_offsets is None:
+            return -1
+        lo, hi = self.word_offsets[i], self.word_offsets[i + 1]
+        return bisect.bisect_right(self.word_starts, time_ms, lo, hi) - 1 - lo
+
+    @property
+    def lines(self) -> _LinesView:
+        return _LinesView(self)
+
     def __str__(self) -> str:
         return f"Song: {self.title} by {self.artist} \nCoverlink: {self.cover_link} \n" + "\n".join([str(line) for line in self.lines])
-    
-    def __post_init__(self):
-        self.lines.sort(key=lambda x: x.startMs)
-        self.durationMs = self.lines[-1].endMs - self.lines[0].startMs
\ No newline at end of file
+
+    def line_index_at(self, time_ms: int, hint: int = -1) -> int:
+        """Returns the index of the line that is active at time_ms, or -1 if the first line has not started yet.
+        'hint' is the previously active index; if time only moved forward a little, the answer is found in O(1) from there, otherwise by bisection.
+        """
+        starts = self.start_times
+        n = len(starts)
+        for i in (hint, hint + 1):
+            if 0 <= i < n and starts[i] <= time_ms and (i + 1 == n or starts[i + 1] > time_ms):
+                return i
+        return bisect.bisect_right(starts, time_ms) - 1
@@ -0,0 +1,198 @@
+import collections
+import dataclasses
+import logging
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from classes import LyricsBlob
+from classes.DatabaseMigrations import migrate
+from classes.QueryNormalizer import fts_prefix_query
+
+# Position of a song in the list: (title as sorted, song id)
+SortKey = Tuple[str, int]
+
+@dataclasses.dataclass(frozen=True)
+class StoredSong:
+    song_id: int
+    title: str
+    artist: str
+
+    @property
+    def key(self) -> SortKey:
+        return (self.title, self.song_id)
+
+class SongLibrary:
+    """
+    The songs of lyrics.db as the database viewer sees them: sorted by title, read a page at a time with keyset pagination
+    (the next page starts after the sort key of the last song, so no page costs more than its own rows), searched through the
+    library_index FTS5 index over titles, artists and lyrics text, and deleted many at once in one transaction.
+    Every thread gets its own connection, so lyrics can be loaded in the background while the list is paged.
+    """
+    # The sort order of the list, matching the index idx_songs_title
+    _ORDER = "ifnull(title, '') COLLATE NOCASE"
+    # Songs per DELETE statement. Most of the cost of a delete is starting the cascades and FTS5 triggers of each statement, not the rows
+    _DELETE_CHUNK = 500
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.has_fts = self._connection().execute('''
+            SELECT sql LIKE '%fts5%' FROM sqlite_master
+            WHERE name = 'library_index'
+        ''').fetchone()[0] == 1
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Deleting a song cascades to its lines, blob and queries
+            conn.execute("PRAGMA foreign_keys=ON")
+            with self._connections_lock:
+                if not self._connections:
+                    migrate(conn)
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _filter(self, query: str) -> Tuple[str, tuple]:
+        """SQL condition on songs for a search text, and its parameters. Matches everything for an empty text."""
+        if not query.strip():
+            return "1", ()
+        if self.has_fts:
+            match = fts_prefix_query(query)
+            if not match:
+                return "0", ()
+            return "id IN (SELECT rowid FROM library_index WHERE library_index MATCH ?)", (match,)
+        pattern = "%" + query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return "id IN (SELECT rowid FROM library_index WHERE title LIKE ? ESCAPE '\\' OR artist LIKE ? ESCAPE '\\' OR lyrics LIKE ? ESCAPE '\\')", (pattern,) * 3
+
+    def count(self, query: str = "") -> int:
+        """Number of songs matching the search text, all songs for an empty one."""
+        condition, parameters = self._filter(query)
+        return self._connection().execute(f"SELECT count(*) FROM songs WHERE {condition}", parameters).fetchone()[0]
+
+    def page(self, query: str = "", after: Optional[SortKey] = None, limit: int = 100) -> List[StoredSong]:
+        """
+        The next songs in the list.
+
+        Args:
+            query (str): Search text, every word must occur in the title, artist or lyrics; the last word may be the beginning of one.
+            after (SortKey, optional): Key of the song before the page, None for the first page.
+            limit (int): Maximum number of songs.
+
+        Returns:
+            List[StoredSong]: The songs, in list order.
+        """
+        condition, parameters = self._filter(query)
+        if after is not None:
+            # Written out instead of a row value, so SQLite seeks the index instead of scanning it up to the key
+            condition += f" AND {self._ORDER} >= ? AND ({self._ORDER} > ? OR id > ?)"
+            parameters += (after[0], after[0], after[1])
+        cursor = self._connection().execute(f'''
+            SELECT id, ifnull(title, ''), ifnull(artist, '') FROM songs
+            WHERE {condition}
+            ORDER BY {self._ORDER}, id
+            LIMIT ?
+        ''', parameters + (limit,))
+        return [StoredSong(*row) for row in cursor.fetchall()]
+
+    def key_at(self, index: int, query: str = "") -> Optional[SortKey]:
+        """Sort key of the song at a position of the list, to start a page there when the list jumps. Walks the index up to it, unlike page()."""
+        condition, parameters = self._filter(query)
+        row = self._connection().execute(f'''
+            SELECT ifnull(title, ''), id FROM songs
+            WHERE {condition}
+            ORDER BY {self._ORDER}, id
+            LIMIT 1 OFFSET ?
+        ''', parameters + (index,)).fetchone()
+        return tuple(row) if row else None
+
+    def lyrics(self, song_id: int) -> List[str]:
+        """The text of every line of a song."""
+        cursor = self._connection().cursor()
+        cursor.execute('''
+            SELECT data FROM lyrics_blobs
+            WHERE song_id = ?
+        ''', (song_id,))
+        blob = cursor.fetchone()
+        if blob:
+            return list(LyricsBlob.decode(blob[0]).texts)
+        cursor.execute('''
+            SELECT text FROM lyrics_lines
+            WHERE song_id = ?
+            ORDER BY startMs
+        ''', (song_id,))
+        return [text for text, in cursor.fetchall()]
+
+    def delete(self, song_ids: Iterable[int]) -> int:
+        """Delete songs with their lyrics, queries and index entries, all in one transaction. Returns the number of deleted songs."""
+        song_ids = list(song_ids)
+        conn = self._connection()
+        deleted = 0
+        with conn:
+            for first in range(0, len(song_ids), self._DELETE_CHUNK):
+                chunk = song_ids[first:first + self._DELETE_CHUNK]
+                deleted += conn.execute(f'''
+                    DELETE FROM songs
+                    WHERE id IN ({", ".join("?" * len(chunk))})
+                ''', chunk).rowcount
+        self.logger.info(f"delete: deleted {deleted} songs")
+        return deleted
+
+class SongPages:
+    """
+    The songs matching one search as a list addressed by position, for a view that only shows a window of it.
+    Pages are read from the library when the window reaches them and the most recently used ones are cached;
+    a page right after a cached one starts at its last key, only a jump needs SongLibrary.key_at().
+    """
+    def __init__(self, library: SongLibrary, query: str = "", page_size: int = 100, max_pages: int = 32):
+        self.library = library
+        self.query = query
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages: "collections.OrderedDict[int, List[StoredSong]]" = collections.OrderedDict()
+        self.total = library.count(query)
+
+    def _page(self, number: int) -> List[StoredSong]:
+        page = self._pages.get(number)
+        if page is not None:
+            self._pages.move_to_end(number)
+            return page
+        if number == 0:
+            after = None
+        elif number - 1 in self._pages and self._pages[number - 1]:
+            after = self._pages[number - 1][-1].key
+        else:
+            after = self.library.key_at(number * self.page_size - 1, self.query)
+        page = self.library.page(self.query, after, self.page_size) if number == 0 or after is not None else []
+        self._pages[number] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def rows(self, start: int, count: int) -> List[StoredSong]:
+        """The songs at the positions start to start + count (fewer at the end of the list)."""
+        songs = []
+        end = min(start + count, self.total)
+        position = max(0, start)
+        while position < end:
+            number, offset = divmod(position, self.page_size)
+            page = self._page(number)
+            if offset >= len(page):
+                break
+            taken = page[offset:offset + end - position]
+            songs.extend(taken)
+            position += len(taken)
+        return songs
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from classes.HttpClient import HttpClient
+
+class SpotifyAppToken:
+    """
+    Spotify access token of the app itself (client credentials flow), which is all a public track search needs: no user login, no browser, no redirect.
+    The token is cached on disk so a restart within its hour of validity needs no request at all, and renewed in the background
+    once it is within refresh_ahead seconds of expiring, so a search never waits for it. Passed to spotipy.Spotify as auth_manager.
+    """
+    TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+    def __init__(self, client_id: str, client_secret: str, cache_path: Optional[str] = None, refresh_ahead: float = 300, timeout: float = 10, http: Optional[HttpClient] = None):
+        """
+        Args:
+            client_id (str): Client ID of the Spotify app.
+            client_secret (str): Client secret of the Spotify app.
+            cache_path (str, optional): JSON file the token is kept in between runs, None to keep it in memory only.
+            refresh_ahead (float): Seconds before the expiry at which the token is renewed in the background.
+            timeout (float): Seconds to wait for the token endpoint.
+            http (HttpClient, optional): Client whose connections and limits the token requests use, None for plain requests.
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path
+        self.refresh_ahead = refresh_ahead
+        self.timeout = timeout
+        self.http = http
+        self._session = None
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # Held while a search waits for a token, so parallel searches share one request
+        self._fetch_lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+        # {"access_token": ..., "expires_at": time.time() of the expiry}
+        self._token = self._load()
+
+    def _load(self) -> Optional[dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                token = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"_load: ignoring unreadable token cache {self.cache_path}: {e}")
+            return None
+        # A token of another app (the secrets changed) is no use
+        if token.get("client_id") != self.client_id or "access_token" not in token:
+            return None
+        return token
+
+    def _save(self, token: dict) -> None:
+        if not self.cache_path:
+            return
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            # Only the user may read the token, and readers never see a half-written file
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(token, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            self.logger.warning(f"_save: could not cache the token in {self.cache_path}: {e}")
+
+    def _request(self) -> dict:
+        """Fetches a new token from Spotify."""
+        # requests is only needed once an hour at most, it is not imported at startup
+        import requests
+        if self._session is None:
+            self._session = self.http.session() if self.http is not None else requests.Session()
+        started = time.perf_counter()
+        response = self._session.post(self.TOKEN_URL, data={"grant_type": "client_credentials"}, auth=(self.client_id, self.client_secret), timeout=self.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        token = {"client_id": self.client_id, "access_token": payload["access_token"], "expires_at": time.time() + payload.get("expires_in", 3600)}
+        self.logger.info(f"_request: new Spotify token in {(time.perf_counter() - started) * 1000:.0f} ms, valid for {payload.get('expires_in', 3600)} s")
+        return token
+
+    def _refresh(self) -> dict:
+        token = self._request()
+        with self._lock:
+            self._token = token
+        self._save(token)
+        return token
+
+    def _refresh_in_background(self) -> None:
+        def run():
+            try:
+                with self._fetch_lock:
+                    self._refresh()
+            except Exception as e:
+                # The old token is still valid for a while, the next call tries again
+                self.logger.warning(f"_refresh_in_background: could not renew the Spotify token: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = None
+
+        with self._lock:
+            if self._refreshing is not None:
+                return
+            self._refreshing = threading.Thread(target=run, name="SpotifyAppToken", daemon=True)
+            self._refreshing.start()
+
+    def prefetch(self) -> None:
+        """Makes sure a token is ready or on its way, without waiting for it. Call at startup, so the first search finds one."""
+        token = self._token
+        if token is None or token["expires_at"] - time.time() < self.refresh_ahead:
+            self._refresh_in_background()
+
+    def get_access_token(self, as_dict: bool = False):
+        """The current token, in the form spotipy asks its auth_manager for. Only waits for Spotify if there is no valid token at all."""
+        token = self._token
+        remaining = token["expires_at"] - time.time() if token else 0
+        if remaining <= 30:
+            # Expired (or almost): nothing to use meanwhile, fetch it now
+            with self._fetch_lock:
+                token = self._token
+                if token is None or token["expires_at"] - time.time() <= 30:
+                    token = self._refresh()
+        elif remaining < self.refresh_ahead:
+            self._refresh_in_background()
+        return token if as_dict else token["access_token"]
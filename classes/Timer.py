@@ -1,52 +1,114 @@
+import math
 import time
 import logging
+from typing import Callable
+
+NS_PER_S = 1_000_000_000
+NS_PER_MS = 1_000_000
 
 class Timer:
-    def __init__(self, speed: float = 1):
-        self.start_time = None
-        self.pause_time = None
-        self.paused_duration = 0
+    """
+    The position in the song as a piecewise-linear function of the clock, in integer nanoseconds.
+    Every start, pause, unpause, seek and speed change begins a new segment at the position the previous one had reached,
+    so the position stays exact to the nanosecond however many there are; only the current segment is kept.
+    Timestamps passed in are seconds of the same clock, time.perf_counter() by default.
+    """
+    def __init__(self, speed: float = 1, clock: Callable[[], float] = None, clock_ns: Callable[[], int] = time.perf_counter_ns):
+        """'clock' returns the current time in seconds, e.g. a VirtualClock to run the timer without waiting in real time; it replaces 'clock_ns'.
+        The default is time.perf_counter_ns(), which has the best resolution available and does not jump when the system clock is adjusted.
+        """
+        if clock is not None:
+            clock_ns = lambda: round(clock() * NS_PER_S)
+        self.clock = clock if clock is not None else time.perf_counter
+        self.clock_ns = clock_ns
         self.is_running = False
+        self.is_paused = False
         self.speed = speed
-        
+        # The current segment: position (ns of song time) at the clock time 'segment_start_ns', advancing 'rate' ns per ns (0 while paused).
+        # 'carry' is the fraction of a ns (0..1) the position had at the end of the previous segment
+        self.segment_start_ns = None
+        self.segment_position_ns = 0
+        self.carry = 0.0
+        self.rate = 0
+
         logging.basicConfig(level = logging.INFO, format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
 
-    def start(self):
+    @property
+    def is_started(self) -> bool:
+        """True from start() to stop(), also while paused."""
+        return self.segment_start_ns is not None
+
+    def _to_ns(self, at: float) -> int:
+        return self.clock_ns() if at is None else round(at * NS_PER_S)
+
+    def _begin_segment(self, at_ns: int, rate: float) -> None:
+        """Ends the current segment at at_ns and starts one from the position it reached there."""
+        # Fractions of a ns move to the next segment, so they do not add up over many segments.
+        # A hair below a whole ns is the float error of a speed like 0.85 and counts as the whole ns
+        elapsed = (at_ns - self.segment_start_ns) * self.rate + self.carry
+        whole = math.floor(elapsed + 1e-6)
+        self.segment_position_ns += whole
+        self.carry = max(0.0, elapsed - whole)
+        self.segment_start_ns = at_ns
+        self.rate = rate
+
+    def start(self, start_time: float = None, position_ms: int = 0):
+        """Starts the timer at position_ms. Pass a timestamp of the clock as start_time to start it retroactively."""
         self.logger.debug("Timer starting")
-        if not self.is_running:
-            self.logger.debug("Timer is not running, starting it")
-            self.start_time = time.time()
+        if not self.is_started:
+            self.segment_start_ns = self._to_ns(start_time)
+            self.segment_position_ns = int(position_ms * NS_PER_MS)
+            self.carry = 0.0
+            self.rate = self.speed
             self.is_running = True
+            self.is_paused = False
             self.logger.debug("Timer started")
 
     def stop(self):
         self.logger.debug("Timer stopping")
-        if self.is_running:
-            self.logger.debug("Timer is running, stopping it")
+        if self.is_started:
             self.is_running = False
-            self.start_time = None
-            self.pause_time = None
-            self.paused_duration = 0
+            self.is_paused = False
+            self.segment_start_ns = None
+            self.segment_position_ns = 0
+            self.carry = 0.0
+            self.rate = 0
             self.logger.debug("Timer stopped")
 
-    def pause(self):
-        if self.is_running and self.pause_time is None:
-            self.pause_time = time.time()
+    def pause(self, at: float = None):
+        """Pauses the timer. 'at' is the timestamp of the clock the pause began at, defaults to now."""
+        if self.is_running:
+            self._begin_segment(self._to_ns(at), 0)
             self.is_running = False
+            self.is_paused = True
 
-    def unpause(self):
-        if not self.is_running and self.pause_time is not None:
-            self.paused_duration += time.time() - self.pause_time
-            self.pause_time = None
+    def unpause(self, at: float = None):
+        """Continues after a pause. 'at' is the timestamp of the clock the pause ended at, defaults to now."""
+        if self.is_paused:
+            self._begin_segment(self._to_ns(at), self.speed)
             self.is_running = True
+            self.is_paused = False
+
+    def get_time_ns(self):
+        """Returns the current position in ns, also while paused, or None if the timer was not started."""
+        if self.segment_start_ns is not None:
+            return self.segment_position_ns + math.floor((self.clock_ns() - self.segment_start_ns) * self.rate + self.carry)
 
     def get_time(self):
-        if self.is_running:
-            elapsed_time = (time.time() - self.start_time) * self.speed
-            paused_time = self.paused_duration * self.speed
-            return int((elapsed_time - paused_time) * 1000)
+        """Returns the current position in ms, also while paused, or None if the timer was not started."""
+        if self.segment_start_ns is not None:
+            return (self.segment_position_ns + math.floor((self.clock_ns() - self.segment_start_ns) * self.rate + self.carry)) // NS_PER_MS
 
     def set_time(self, milliseconds: int):
-        if self.is_running:
-            self.start_time = time.time() - milliseconds/self.speed / 1000 - self.paused_duration
\ No newline at end of file
+        """Moves the timer to the given position. Works while running and while paused."""
+        if self.is_started:
+            self.segment_start_ns = self.clock_ns()
+            self.segment_position_ns = int(milliseconds * NS_PER_MS)
+            self.carry = 0.0
+
+    def set_speed(self, speed: float, at: float = None):
+        """Changes the speed from the timestamp 'at' of the clock on (defaults to now), keeping the position reached there. Works while running and while paused."""
+        if self.is_started:
+            self._begin_segment(self._to_ns(at), 0 if self.is_paused else speed)
+        self.speed = speed
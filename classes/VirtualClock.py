@@ -0,0 +1,14 @@
+class VirtualClock:
+    """A clock that only moves when told to. Can be passed wherever a time.time()/time.monotonic() style callable is expected."""
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+    def set(self, now: float) -> None:
+        """Moves the clock to 'now'. The clock never goes backwards."""
+        self.now = max(self.now, now)
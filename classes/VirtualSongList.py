@@ -0,0 +1,131 @@
+import tkinter as tk
+from tkinter import font as tkfont
+import logging
+from typing import Callable, List, Set
+
+from classes.SongLibrary import StoredSong, SongLibrary, SongPages
+
+class VirtualSongList(tk.Frame):
+    """
+    A list of all songs of the library (or of a search) that only ever holds the rows it shows: the listbox is refilled from SongPages
+    whenever the list scrolls, and the scrollbar stands for the whole list. The selection is kept by song id, so it survives scrolling.
+    """
+    def __init__(self, container, library: SongLibrary, on_select: Callable[[List[int]], None] = None, page_size: int = 100, **kwargs):
+        super().__init__(container, **kwargs)
+        self.logger = logging.getLogger(__name__)
+        self.library = library
+        self.on_select = on_select
+        self.page_size = page_size
+        self.pages = SongPages(library, page_size=page_size)
+        # Position of the first row shown, the rows shown and how many fit
+        self.top = 0
+        self.shown: List[StoredSong] = []
+        self.visible_rows = 1
+        self.selected: Set[int] = set()
+
+        self.listbox = tk.Listbox(self, selectmode=tk.EXTENDED, exportselection=False, activestyle="none")
+        self.linespace = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Button-1>", self._on_click)
+        self.listbox.bind("<Configure>", self._on_resize)
+        # Windows and macOS send MouseWheel, X11 buttons 4 and 5
+        self.listbox.bind("<MouseWheel>", lambda event: self._scroll_by(-3 if event.delta > 0 else 3))
+        self.listbox.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.listbox.bind("<Up>", lambda event: self._on_arrow(-1))
+        self.listbox.bind("<Down>", lambda event: self._on_arrow(1))
+        self.listbox.bind("<Prior>", lambda event: self._scroll_by(-self.visible_rows) or "break")
+        self.listbox.bind("<Next>", lambda event: self._scroll_by(self.visible_rows) or "break")
+
+    @property
+    def total(self) -> int:
+        return self.pages.total
+
+    @property
+    def selected_ids(self) -> List[int]:
+        return sorted(self.selected)
+
+    def set_query(self, query: str) -> None:
+        """Shows the songs matching a search text, all songs for an empty one, from the top and with nothing selected."""
+        self.pages = SongPages(self.library, query, page_size=self.page_size)
+        self.top = 0
+        self.selected.clear()
+        self.render()
+        self._notify()
+
+    def refresh(self) -> None:
+        """Reads the list again after the database changed, at the same position. Songs that are gone are unselected."""
+        self.pages = SongPages(self.library, self.pages.query, page_size=self.page_size)
+        self.selected.clear()
+        self.render()
+        self._notify()
+
+    def render(self) -> None:
+        """Fills the listbox with the rows at the current position."""
+        self.top = max(0, min(self.top, self.total - self.visible_rows))
+        self.shown = self.pages.rows(self.top, self.visible_rows)
+        self.listbox.delete(0, tk.END)
+        if self.shown:
+            self.listbox.insert(tk.END, *(f"{song.title} - {song.artist}" if song.artist else song.title for song in self.shown))
+        for row, song in enumerate(self.shown):
+            if song.song_id in self.selected:
+                self.listbox.selection_set(row)
+        if self.total:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + len(self.shown)) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _scroll_by(self, rows: int) -> None:
+        self.top += rows
+        self.render()
+
+    def _on_scrollbar(self, action: str, amount: str, unit: str = None) -> None:
+        if action == tk.MOVETO:
+            self.top = int(float(amount) * self.total)
+        elif unit == tk.PAGES:
+            self.top += int(amount) * self.visible_rows
+        else:
+            self.top += int(amount)
+        self.render()
+
+    def _on_arrow(self, step: int):
+        # Inside the window the listbox moves the cursor itself, at its edges the window moves instead
+        row = self.listbox.index(tk.ACTIVE)
+        if (step < 0 and row > 0) or (step > 0 and row < len(self.shown) - 1):
+            return None
+        self._scroll_by(step)
+        self.selected.clear()
+        self.listbox.activate(row)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(row)
+        self._on_listbox_select()
+        return "break"
+
+    def _on_resize(self, event) -> None:
+        # Each row is the line height plus one pixel of spacing; the border and highlight take the rest
+        inner = event.height - 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        visible_rows = max(1, inner // (self.linespace + 1))
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.render()
+
+    def _on_click(self, event) -> None:
+        # A click without Shift or Control starts a new selection, also of the songs scrolled out of view
+        if not event.state & (0x0001 | 0x0004):
+            self.selected.clear()
+
+    def _on_listbox_select(self, event=None) -> None:
+        chosen = set(self.listbox.curselection())
+        for row, song in enumerate(self.shown):
+            if row in chosen:
+                self.selected.add(song.song_id)
+            else:
+                self.selected.discard(song.song_id)
+        self._notify()
+
+    def _notify(self) -> None:
+        if self.on_select is not None:
+            self.on_select(self.selected_ids)
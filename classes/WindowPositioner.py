@@ -0,0 +1,37 @@
+import logging
+import sys
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class WindowPositioner:
+    """Finds the window of a game, so the overlay can be placed over its bottom third."""
+    def find_window(self, title: str) -> Optional[Tuple[int, int, int, int]]:
+        """Returns (x, y, width, height) of the window with the given title, or None if it is not open."""
+        raise NotImplementedError
+
+class Win32WindowPositioner(WindowPositioner):
+    def __init__(self):
+        # Only imported here, so the apps start on platforms without pywin32
+        import win32gui
+        self.win32gui = win32gui
+
+    def find_window(self, title: str) -> Optional[Tuple[int, int, int, int]]:
+        try:
+            hwnd = self.win32gui.FindWindow(None, title)
+            if not hwnd:
+                return None
+            rect = self.win32gui.GetWindowRect(hwnd)
+            return rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1]
+        except Exception as e:
+            logger.error(f"find_window: Error finding window '{title}': {e}")
+            return None
+
+def load_window_positioner() -> Optional[WindowPositioner]:
+    """Returns the window positioner of this platform, or None if there is none (the overlay then stays where the user puts it)."""
+    if sys.platform == "win32":
+        try:
+            return Win32WindowPositioner()
+        except ImportError:
+            logger.warning("load_window_positioner: pywin32 is not installed, the overlay is not positioned automatically")
+    return None
@@ -1,66 +1,110 @@
+import argparse
+import concurrent.futures
+import logging
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
+
+from classes.SongLibrary import SongLibrary
+from classes.VirtualSongList import VirtualSongList
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 class LyricsApp:
-    def __init__(self, root):
+    # Milliseconds without typing before the search runs
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, root, db_path: str = "lyrics.db"):
         self.root = root
         self.root.title("Lyrics Viewer and Deleter")
-        
-        self.conn = sqlite3.connect('lyrics.db')
-        self.cursor = self.conn.cursor()
-        
+
+        self.library = SongLibrary(db_path)
+        # Lyrics are decoded on this thread, so the list keeps scrolling while a long song loads
+        self.preview_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="lyrics-preview")
+        self.pending_preview = None
+        self.pending_search = None
+
         self.create_widgets()
-        self.populate_song_list()
-    
+        self.song_list.set_query("")
+
     def create_widgets(self):
-        # Song list
-        self.song_listbox = tk.Listbox(self.root)
-        self.song_listbox.pack(fill=tk.BOTH, expand=True)
-        self.song_listbox.bind('<<ListboxSelect>>', self.on_song_select)
-        
-        # Delete button
-        self.delete_button = tk.Button(self.root, text="Delete Song", command=self.delete_song)
+        # Search field, searches titles, artists and lyrics as you type
+        self.search_text = tk.StringVar()
+        self.search_entry = tk.Entry(self.root, textvariable=self.search_text)
+        self.search_entry.pack(fill=tk.X)
+        self.search_text.trace_add("write", lambda *args: self.schedule_search())
+
+        # Song list, only the visible rows are loaded
+        self.song_list = VirtualSongList(self.root, self.library, on_select=self.on_song_select)
+        self.song_list.pack(fill=tk.BOTH, expand=True)
+
+        # Status and delete button
+        self.status_label = tk.Label(self.root, anchor=tk.W)
+        self.status_label.pack(fill=tk.X)
+        self.delete_button = tk.Button(self.root, text="Delete Selected", command=self.delete_songs)
         self.delete_button.pack()
-        
+
         # Lyrics text
         self.lyrics_text = tk.Text(self.root)
         self.lyrics_text.pack(fill=tk.BOTH, expand=True)
-    
-    def populate_song_list(self):
-        self.cursor.execute("SELECT id, title FROM songs")
-        songs = self.cursor.fetchall()
-        for song in songs:
-            self.song_listbox.insert(tk.END, f"{song[1]} (ID: {song[0]})")
-    
-    def on_song_select(self, event):
-        selected_index = self.song_listbox.curselection()
-        if selected_index:
-            song_id = int(self.song_listbox.get(selected_index).split("ID: ")[1][:-1])
-            self.show_lyrics(song_id)
-    
-    def show_lyrics(self, song_id):
-        self.cursor.execute("SELECT text FROM lyrics_lines WHERE song_id=?", (song_id,))
-        lyrics = self.cursor.fetchall()
-        self.lyrics_text.delete(1.0, tk.END)
-        for line in lyrics:
-            self.lyrics_text.insert(tk.END, line[0] + "\n")
-    
-    def delete_song(self):
-        selected_index = self.song_listbox.curselection()
-        if selected_index:
-            song_id = int(self.song_listbox.get(selected_index).split("ID: ")[1][:-1])
-            self.cursor.execute("DELETE FROM songs WHERE id=?", (song_id,))
-            self.cursor.execute("DELETE FROM lyrics_lines WHERE song_id=?", (song_id,))
-            self.cursor.execute("DELETE FROM querys WHERE song_id=?", (song_id,))
-            self.conn.commit()
-            self.song_listbox.delete(selected_index)
+
+    def schedule_search(self):
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+        self.pending_search = self.root.after(self.SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.pending_search = None
+        self.song_list.set_query(self.search_text.get())
+
+    def update_status(self, selected: int):
+        noun = "matches" if self.search_text.get().strip() else "songs"
+        self.status_label.config(text=f"{self.song_list.total} {noun}" + (f", {selected} selected" if selected else ""))
+
+    def on_song_select(self, song_ids):
+        self.update_status(len(song_ids))
+        if len(song_ids) != 1:
+            self.pending_preview = None
             self.lyrics_text.delete(1.0, tk.END)
-            messagebox.showinfo("Success", "Song and lyrics deleted successfully")
-        else:
+            return
+        song_id = song_ids[0]
+        future = self.preview_executor.submit(self.library.lyrics, song_id)
+        self.pending_preview = future
+        future.add_done_callback(lambda f: self.root.after(0, self.show_lyrics, f))
+
+    def show_lyrics(self, future):
+        # Another song was selected meanwhile
+        if future is not self.pending_preview:
+            return
+        self.pending_preview = None
+        self.lyrics_text.delete(1.0, tk.END)
+        try:
+            lyrics = future.result()
+        except Exception as e:
+            self.lyrics_text.insert(tk.END, f"Could not load the lyrics: {e}")
+            return
+        self.lyrics_text.insert(tk.END, "\n".join(lyrics) + "\n")
+
+    def delete_songs(self):
+        song_ids = self.song_list.selected_ids
+        if not song_ids:
             messagebox.showwarning("Warning", "Please select a song to delete")
+            return
+        if len(song_ids) > 1 and not messagebox.askyesno("Delete songs", f"Delete {len(song_ids)} songs and their lyrics?"):
+            return
+        deleted = self.library.delete(song_ids)
+        self.song_list.refresh()
+        messagebox.showinfo("Success", f"{deleted} song{'s' if deleted != 1 else ''} and lyrics deleted successfully")
+
+    def close(self):
+        self.preview_executor.shutdown(wait=False, cancel_futures=True)
+        self.library.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Browse, search and delete the songs in the lyrics database.")
+    parser.add_argument("--db", default="lyrics.db", help="path of the lyrics database (default: lyrics.db)")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = LyricsApp(root)
+    app = LyricsApp(root, args.db)
+    root.protocol("WM_DELETE_WINDOW", app.close)
     root.mainloop()
@@ -0,0 +1,49 @@
+import argparse
+import logging
+import os
+import time
+
+from classes.LibraryArchive import LibraryArchive
+from classes.LyricsManager import LyricsManager
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import lyrics into lyrics.db or export them, as a folder of LRC files or a JSONL archive (.jsonl or .jsonl.gz).")
+    parser.add_argument("--db", default=None, help="path of the lyrics database (default: lyrics.db in the repository)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="add the songs of LRC folders or JSONL archives, skipping songs that are already in the database")
+    import_parser.add_argument("paths", nargs="+", metavar="PATH", help="folder of .lrc files (searched recursively) or .jsonl/.jsonl.gz archive")
+    import_parser.add_argument("--workers", type=int, default=None, help="parsing processes (default: one per CPU)")
+    import_parser.add_argument("--batch-size", type=int, default=2000, help="songs saved per transaction")
+    export_parser = commands.add_parser("export", help="write every song of the database")
+    export_parser.add_argument("path", metavar="PATH", help="a .jsonl/.jsonl.gz archive (keeps everything) or a folder for .lrc files")
+    args = parser.parse_args()
+
+    # Importing and exporting never search online, so no Spotify credentials are needed
+    lyrics_manager = LyricsManager("", "", "", db_path=args.db)
+    start = time.perf_counter()
+    try:
+        if args.command == "import":
+            archive = LibraryArchive(lyrics_manager, workers=args.workers, batch_size=args.batch_size,
+                                     progress_callback=lambda counts: logger.info(f"{counts['read']} songs read, {counts['imported']} imported"))
+            for path in args.paths:
+                if not os.path.isdir(path) and not archive.is_jsonl(path):
+                    parser.error(f"{path} is neither a folder nor a .jsonl or .jsonl.gz archive")
+            for path in args.paths:
+                counts = archive.import_path(path)
+                logger.info(f"Imported {path}: {counts}")
+        else:
+            archive = LibraryArchive(lyrics_manager)
+            exported = archive.export_jsonl(args.path) if archive.is_jsonl(args.path) else archive.export_lrc(args.path)
+            logger.info(f"Exported {exported} songs to {args.path}")
+        logger.info(f"Done in {time.perf_counter() - start:.1f} s")
+    except KeyboardInterrupt:
+        logger.info("Interrupted, the batches saved so far are kept; importing again skips them.")
+    finally:
+        lyrics_manager.close()
+
+if __name__ == "__main__":
+    main()
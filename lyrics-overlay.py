@@ -0,0 +1,11 @@
+import logging
+
+from classes.GameAdapters import ADAPTERS
+from classes.LyricsOverlayApp import main
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+if __name__ == "__main__":
+    # One overlay for all supported games, whichever of them is started
+    main(list(ADAPTERS.values()), "Shows the lyrics of the song playing in any of the supported games.")
@@ -0,0 +1,57 @@
+import argparse
+import json
+import logging
+import os
+
+from classes.LibraryScanner import LibraryScanner
+from classes.LyricsManager import LyricsManager
+from classes.LyricsResolver import LyricsResolver
+from classes.Prefetcher import Prefetcher
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STEAM_COMMON = r"C:\Program Files (x86)\Steam\steamapps\common"
+DEFAULT_BEAT_SABER_PATH = os.path.join(STEAM_COMMON, "Beat Saber", "Beat Saber_Data", "CustomLevels")
+DEFAULT_SYNTH_RIDERS_PATH = os.path.join(STEAM_COMMON, "SynthRiders", "SynthRidersUC", "CustomSongs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the lyrics of all installed custom songs into lyrics.db, so they are available instantly in game.")
+    parser.add_argument("--beat-saber", metavar="PATH", help=f"Beat Saber CustomLevels folder (default: {DEFAULT_BEAT_SABER_PATH} if it exists)")
+    parser.add_argument("--synth-riders", metavar="PATH", help=f"Synth Riders CustomSongs folder (default: {DEFAULT_SYNTH_RIDERS_PATH} if it exists)")
+    parser.add_argument("--workers", type=int, default=4, help="number of parallel lookups")
+    parser.add_argument("--rate", type=float, default=2.0, help="maximum number of network lookups per second")
+    args = parser.parse_args()
+
+    scanner = LibraryScanner()
+    songs = []
+    beat_saber_path = args.beat_saber or (DEFAULT_BEAT_SABER_PATH if os.path.isdir(DEFAULT_BEAT_SABER_PATH) else None)
+    synth_riders_path = args.synth_riders or (DEFAULT_SYNTH_RIDERS_PATH if os.path.isdir(DEFAULT_SYNTH_RIDERS_PATH) else None)
+    if beat_saber_path:
+        songs.extend(scanner.scan_beat_saber(beat_saber_path))
+    if synth_riders_path:
+        songs.extend(scanner.scan_synth_riders(synth_riders_path))
+    if not songs:
+        parser.error("no custom songs found, pass --beat-saber and/or --synth-riders")
+
+    secrets_path = os.path.join(os.path.dirname(__file__), "secrets.json")
+    secrets = json.load(open(secrets_path))
+    lyrics_manager = LyricsManager(secrets['spotify_client_id'], secrets['spotify_client_secret'], secrets.get('spotify_dc_cookie', ''))
+    resolver = LyricsResolver(lyrics_manager, cache_size=0)
+
+    def report_progress(done, total, song, state):
+        logger.info(f"[{done}/{total}] {song.title} - {song.artist}: {state}")
+
+    prefetcher = Prefetcher(lyrics_manager, resolver, max_workers=args.workers, requests_per_second=args.rate, progress_callback=report_progress)
+    try:
+        counts = prefetcher.run(songs)
+        logger.info(f"Prefetch finished: {counts}")
+    except KeyboardInterrupt:
+        logger.info("Prefetch interrupted, run it again to continue.")
+    finally:
+        resolver.shutdown()
+        lyrics_manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+import logging
+from urllib.parse import urlparse
+
+from classes.EventLog import EventLog
+from classes.ReplayServer import ReplayServer
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an event log recorded with --record, so beatsaber.py or synthriders.py can run without the game.")
+    parser.add_argument("log", help="event log written by beatsaber.py/synthriders.py --record")
+    parser.add_argument("--port", type=int, help="port to listen on (default: the port of the recorded game websocket)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, e.g. 10 for ten times faster")
+    parser.add_argument("--loop", action="store_true", help="start over at the end of the log")
+    args = parser.parse_args()
+
+    log = EventLog(args.log)
+    port = args.port or urlparse(log.header.get("url") or "").port
+    if not port:
+        parser.error("the log does not name the game websocket, pass --port")
+    server = ReplayServer(log, port=port, speed=args.speed, loop=args.loop)
+    logger.info(f"Connect with: --url ws://localhost:{server.port}{urlparse(log.header.get('url') or '').path or '/'} --no-window")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Replay stopped.")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()